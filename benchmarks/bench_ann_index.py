@@ -0,0 +1,91 @@
+"""
+Benchmark: recall@k vs. latencia de los índices de modules/vector_index.py
+frente a la búsqueda exacta (Flat), sobre un corpus sintético.
+
+El corpus es una mezcla de gaussianas (más parecido a embeddings reales que el
+ruido uniforme). Para cada tipo se barre su parámetro de búsqueda (nprobe en IVF,
+efSearch en HNSW).
+
+    python benchmarks/bench_ann_index.py --vectors 100000 --dim 384 --k 10
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.vector_index import build_index, apply_search_params, auto_nlist
+
+
+def synthetic_corpus(n_vectors, n_queries, dim, n_clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype('float32')
+    labels = rng.integers(0, n_clusters, size=n_vectors + n_queries)
+    data = centers[labels] + 0.35 * rng.normal(size=(n_vectors + n_queries, dim)).astype('float32')
+    return data[:n_vectors], data[n_vectors:]
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_search(index, queries, k):
+    """Latencia por consulta individual (como en una petición web) en milisegundos."""
+    latencies = []
+    results = np.empty((len(queries), k), dtype='int64')
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--pq-m', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"-> Corpus sintético: {args.vectors} vectores x {args.dim} dimensiones, {args.queries} consultas, k={args.k}")
+    data, queries = synthetic_corpus(args.vectors, args.queries, args.dim)
+    nlist = auto_nlist(args.vectors)
+
+    flat = build_index('flat', args.dim)
+    flat.add(data)
+    truth, p50, p99 = time_search(flat, queries, args.k)
+
+    print(f"\n{'índice':<10} {'parámetro':<14} {'build (s)':>9} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'flat':<10} {'-':<14} {0:>9.2f} {1.0:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+    configs = [
+        ('ivf_flat', 'nprobe', [1, 4, 16, 64]),
+        ('hnsw', 'efSearch', [16, 32, 64, 128, 256]),
+        ('ivf_pq', 'nprobe', [1, 4, 16, 64]),
+    ]
+    for kind, param, values in configs:
+        start = time.perf_counter()
+        index = build_index(kind, args.dim, nlist=nlist, pq_m=args.pq_m)
+        if not index.is_trained:
+            index.train(data)
+        index.add(data)
+        build_s = time.perf_counter() - start
+
+        for value in values:
+            if param == 'nprobe':
+                apply_search_params(index, nprobe=value)
+            else:
+                apply_search_params(index, ef_search=value)
+            found, p50, p99 = time_search(index, queries, args.k)
+            label = f"{param}={value}"
+            print(f"{kind:<10} {label:<14} {build_s:>9.2f} {recall_at_k(found, truth):>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: codificación de consultas una a una vs. micro-lotes (BatchEncoder).
+
+Simula N clientes concurrentes llamando a get_relevant_context: cada uno codifica
+su consulta y espera el vector. Se mide latencia p50/p99 y consultas por segundo.
+
+Por defecto usa el modelo real de RAGProcessor (sentence-transformers); con
+--synthetic usa un codificador de juguete en numpy con coste fijo por llamada y
+coste por texto, útil donde no está instalado el modelo.
+
+    python benchmarks/bench_batch_encoder.py --clients 1 8 32 --queries 200
+    python benchmarks/bench_batch_encoder.py --synthetic
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.assistant.batch_encoder import BatchEncoder
+
+
+class SyntheticEncoder:
+    """Transformer de juguete: 64 "tokens" por texto y dos capas densas de 768 -> 3072 -> 768."""
+
+    def __init__(self, dim=768, tokens=64, call_overhead_ms=4.0):
+        rng = np.random.default_rng(0)
+        self.tokens = tokens
+        self.w1 = rng.standard_normal((dim, dim * 4), dtype=np.float32) / 30
+        self.w2 = rng.standard_normal((dim * 4, dim), dtype=np.float32) / 60
+        self.emb = rng.standard_normal((tokens, dim), dtype=np.float32)
+        self.call_overhead = call_overhead_ms / 1000
+
+    def encode(self, texts):
+        time.sleep(self.call_overhead)  # tokenización, preparación del lote, etc. (libera el GIL como torch)
+        x = np.tile(self.emb, (len(texts), 1))
+        h = np.maximum(x @ self.w1, 0) @ self.w2
+        return h.reshape(len(texts), self.tokens, -1).mean(axis=1)
+
+
+def load_real_encoder():
+    from sentence_transformers import SentenceTransformer
+    from modules.assistant.rag_processor import EMBEDDING_MODEL
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    return lambda texts: model.encode(texts, batch_size=len(texts), convert_to_tensor=False)
+
+
+def run(encode_one, n_clients, queries_per_client):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client(c):
+        barrier.wait()
+        local = []
+        for i in range(queries_per_client):
+            start = time.perf_counter()
+            encode_one(f"¿cuál es el plazo de prescripción {c}-{i} para contratos civiles?")
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(n_clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat_ms = np.array(latencies) * 1000
+    return np.percentile(lat_ms, 50), np.percentile(lat_ms, 99), len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--queries', type=int, default=100, help='consultas por cliente')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--synthetic', action='store_true')
+    args = parser.parse_args()
+
+    encode_fn = SyntheticEncoder().encode if args.synthetic else load_real_encoder()
+    encode_fn(["calentamiento"])
+    batcher = BatchEncoder(encode_fn, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    modes = (
+        ('uno a uno', lambda text: encode_fn([text])[0]),
+        ('micro-lotes', batcher.encode),
+    )
+
+    print(f"{'modo':<12} {'clientes':>8} {'p50 ms':>8} {'p99 ms':>8} {'consultas/s':>12}")
+    for name, encode_one in modes:
+        for n_clients in args.clients:
+            p50, p99, qps = run(encode_one, n_clients, args.queries)
+            print(f"{name:<12} {n_clients:>8} {p50:>8.2f} {p99:>8.2f} {qps:>12.1f}")
+    print(f"\n-> Tamaño medio de lote: {batcher.stats()['avg_batch']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: metadatos de RAGProcessor como lista de strings vs. ChunkStore mapeado.
+
+Antes, documents_meta.txt se leía entero a una lista de "Fuente: archivo::texto"
+por proceso. Ahora los textos viven en un blob UTF-8 + offsets abierto con mmap y
+solo se decodifican los top-k de cada búsqueda. Cada modo corre en un proceso
+nuevo para medir su memoria residente sin interferencias.
+
+    python benchmarks/bench_chunk_store.py --articles 300000 --chars 700
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.assistant.chunk_store import ChunkStore
+
+
+def rss_anon_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1])
+    return 0
+
+
+def build_fixture(directory, n_articles, chars, n_sources):
+    filler = "El contrato se perfecciona por el consentimiento de las partes y obliga a su cumplimiento. "
+    body = (filler * (chars // len(filler) + 1))[:chars]
+    items = [(f"Artículo {i}: {body}", f"codigo_{i % n_sources}.pdf") for i in range(n_articles)]
+    with open(os.path.join(directory, 'documents_meta.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(f"Fuente: {source}::{text}" for text, source in items))
+    ChunkStore.write(os.path.join(directory, 'documents_chunks'), items)
+
+
+def worker(mode, directory, lookups, results):
+    base = rss_anon_kb()
+    start = time.perf_counter()
+    if mode == 'list':
+        with open(os.path.join(directory, 'documents_meta.txt'), 'r', encoding='utf-8') as f:
+            metadata = f.read().splitlines()
+        fetch = metadata.__getitem__
+    else:
+        store = ChunkStore(os.path.join(directory, 'documents_chunks'))
+
+        def fetch(i):
+            text, source = store.get(i)
+            return f"Fuente: {source}::{text}"
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in lookups:
+        for i in row:
+            fetch(int(i))
+    lookup_us = (time.perf_counter() - start) / len(lookups) * 1e6
+    results.put((mode, load_s, lookup_us, (rss_anon_kb() - base) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=300000)
+    parser.add_argument('--chars', type=int, default=700)
+    parser.add_argument('--sources', type=int, default=40)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--top-k', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"-> Generando {args.articles} artículos de ~{args.chars} caracteres...")
+        build_fixture(directory, args.articles, args.chars, args.sources)
+        lookups = np.random.default_rng(0).integers(0, args.articles, size=(args.queries, args.top_k))
+
+        ctx = mp.get_context('spawn')
+        print(f"\n{'modo':<12} {'carga (s)':>10} {'top-k (µs)':>11} {'RssAnon MB':>11}")
+        for mode in ('list', 'chunkstore'):
+            results = ctx.Queue()
+            proc = ctx.Process(target=worker, args=(mode, directory, lookups, results))
+            proc.start()
+            _, load_s, lookup_us, rss_mb = results.get()
+            proc.join()
+            print(f"{mode:<12} {load_s:>10.3f} {lookup_us:>11.1f} {rss_mb:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark: is_legal_related anterior (~45 `in` + 5 re.search sin compilar) vs.
+LegalTopicMatcher (un solo regex compilado en forma de trie, con o sin tildes).
+
+Genera prompts jurídicos y no jurídicos de varias longitudes y mide µs por prompt
+con la lista de términos actual y con listas más largas (p. ej. cargadas desde
+LEGAL_TERMS_FILE; los términos añadidos no aparecen en los prompts). Compara las decisiones con la versión anterior. Las discrepancias esperadas
+son de dos tipos y se listan con ejemplos:
+  - solo el nuevo: términos escritos sin tilde ("juridico", "prision")
+  - solo el anterior: términos dentro de otra palabra ("comprueba" -> "prueba",
+    "leyenda" -> "ley", "marcar" -> "marca")
+
+Con --model se prueba además el respaldo por embeddings (sentence-transformers).
+
+    python benchmarks/bench_legal_matcher.py --prompts 5000 --terms 45,200,500
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.legal_matcher import LegalTopicMatcher, DEFAULT_LEGAL_TERMS, DEFAULT_LEGAL_PATTERNS
+
+
+def legacy_is_legal_related(prompt, terms=DEFAULT_LEGAL_TERMS):
+    """is_legal_related anterior, copiado tal cual (con la lista de términos como parámetro)."""
+    prompt_lower = prompt.lower()
+    for term in terms:
+        if term in prompt_lower:
+            return True
+    for pattern in DEFAULT_LEGAL_PATTERNS:
+        if re.search(pattern, prompt_lower):
+            return True
+    return False
+
+
+LEGAL = [
+    '¿Cómo demandar a mi arrendador por no devolver la fianza?',
+    'Necesito redactar un testamento para mis hijos',
+    '¿Cuánto tiempo tarda un juicio por despido?',
+    'Me acusan de un delito que no cometí, ¿qué debo hacer para proceder?',
+    'Tengo una duda juridica sobre la herencia de mi abuela',
+    'quiero registrar la marca de mi empresa',
+    '¿Qué derechos tengo si me despiden estando de baja?',
+    'mi socio incumplió el contrato de compraventa',
+    'PRISION PROVISIONAL sin fianza, es normal?',
+    'indemnizacion por danos en accidente de trafico',
+]
+OTHER = [
+    'Hola, ¿qué tal estás hoy?',
+    'Recomiéndame una receta de cocina con pollo',
+    '¿Cuál es la capital de Australia?',
+    'Cuéntame una leyenda de dragones',
+    'comprueba si el servidor responde',
+    'El partido de ayer fue increíble',
+    'Quiero aprender a programar en Python',
+    'Escribe un poema sobre el mar',
+    'Mi gato no quiere comer, ¿qué hago?',
+    'Traduce esta frase al inglés por favor',
+]
+FILLER = ('la verdad es que no sé muy bien cómo explicarlo pero ayer pasó algo raro en casa '
+          'y estuvimos hablando toda la tarde sobre lo que podríamos hacer ').split()
+
+
+def make_prompts(n, seed=0):
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(n):
+        base = rng.choice(LEGAL if i % 2 else OTHER)
+        # Mezcla de longitudes: mensaje corto, párrafo y mensaje largo (~2000 caracteres)
+        words = rng.choice((0, 30, 300))
+        filler = ' '.join(rng.choice(FILLER) for _ in range(words))
+        prompts.append(f"{filler} {base}" if rng.random() < 0.5 else f"{base} {filler}")
+    return prompts
+
+
+def make_terms(n, seed=0):
+    """Los términos actuales más palabras inventadas hasta llegar a n."""
+    rng = random.Random(seed)
+    syllables = ['ca', 'te', 'mo', 'pro', 'der', 'sa', 'li', 'fu', 'ven', 'tra', 'ción', 'gu', 'men', 'to']
+    terms = list(DEFAULT_LEGAL_TERMS)
+    while len(terms) < n:
+        word = ''.join(rng.choice(syllables) for _ in range(rng.randint(3, 5)))
+        if word not in terms:
+            terms.append(word)
+    return terms
+
+
+def time_per_prompt(fn, prompts, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for prompt in prompts:
+            fn(prompt)
+        best = min(best, time.perf_counter() - start)
+    return best / len(prompts) * 1e6
+
+
+def legacy_reason(prompt):
+    lower = prompt.lower()
+    for term in DEFAULT_LEGAL_TERMS:
+        pos = lower.find(term)
+        if pos != -1:
+            start = pos
+            while start > 0 and lower[start - 1].isalnum():
+                start -= 1
+            end = pos + len(term)
+            while end < len(lower) and lower[end].isalnum():
+                end += 1
+            return f"'{term}' en '{lower[start:end]}'"
+    return 'patrón'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--prompts', type=int, default=5000)
+    parser.add_argument('--terms', default='45,200,500', help='tamaños de la lista de términos')
+    parser.add_argument('--model', default=None, help='modelo de sentence-transformers para el respaldo')
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.prompts)
+    matcher = LegalTopicMatcher()
+
+    print(f"-> {len(prompts)} prompts, longitud media {sum(map(len, prompts)) / len(prompts):.0f} caracteres")
+    print(f"\n{'términos':>8} {'anterior µs':>12} {'nuevo µs':>10} {'x':>6}")
+    for n in (int(n) for n in args.terms.split(',')):
+        terms = make_terms(n)
+        candidate = LegalTopicMatcher(terms=terms)
+        legacy_us = time_per_prompt(lambda p: legacy_is_legal_related(p, terms), prompts)
+        new_us = time_per_prompt(candidate, prompts)
+        print(f"{n:>8} {legacy_us:>12.2f} {new_us:>10.2f} {legacy_us / new_us:>6.1f}")
+
+    only_new, only_old = {}, {}
+    for prompt in prompts:
+        old, new = legacy_is_legal_related(prompt), matcher(prompt)
+        if new and not old:
+            only_new[matcher.terms_regex.search(' ' + prompt.lower()).group(0).strip()] = prompt
+        elif old and not new:
+            only_old[legacy_reason(prompt)] = prompt
+    agree = len(prompts) - sum(legacy_is_legal_related(p) != matcher(p) for p in prompts)
+    print(f"\n-> Coinciden con la versión anterior: {agree}/{len(prompts)}")
+    print(f"-> Solo el nuevo (sin tildes): {sorted(only_new)}")
+    print(f"-> Solo el anterior (dentro de otra palabra): {sorted(only_old)}")
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+        fallback = LegalTopicMatcher(encoder=lambda texts: model.encode(texts, convert_to_tensor=False))
+        misses = [p for p in LEGAL + OTHER if not matcher(p)]
+        for prompt in misses:
+            start = time.perf_counter()
+            similarity = fallback.similarity(prompt)
+            print(f"   {similarity:.2f}  {(time.perf_counter() - start) * 1000:6.1f} ms  {prompt}")
+
+
+if __name__ == '__main__':
+    main()
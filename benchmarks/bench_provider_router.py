@@ -0,0 +1,144 @@
+"""
+Benchmark: llamadas secuenciales Groq -> OpenRouter (como antes) vs. ProviderRouter.
+
+Levanta dos servidores HTTP locales que imitan /chat/completions de una API
+compatible con OpenAI, con latencia y fallos configurables, y mide la latencia
+que ve el usuario en tres escenarios:
+
+  sano     : Groq responde en ~80 ms
+  lento    : Groq se cuelga (tarda más que el timeout); OpenRouter responde en ~150 ms
+  caído    : Groq devuelve 500 al instante
+
+    python benchmarks/bench_provider_router.py --requests 40 --timeout 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.provider_router import ChatProvider, CircuitBreaker, ProviderRouter
+
+
+class StubServer:
+    """Servidor /chat/completions de juguete. `delay` (s) y `status` se pueden cambiar en caliente."""
+
+    def __init__(self, name, delay=0.1, status=200):
+        self.name = name
+        self.delay = delay
+        self.status = status
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+            disable_nagle_algorithm = True  # cabeceras y cuerpo van en dos write(): sin esto, +40 ms por ACK retardado
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                # Latencia con cola larga: la mayoría cerca de `delay`, alguna bastante más lenta
+                time.sleep(stub.delay * random.lognormvariate(0, 0.25))
+                if stub.status != 200:
+                    body = b'{"error": "stub"}'
+                else:
+                    body = json.dumps({'choices': [{'message': {'content': f'respuesta de {stub.name}'}}]}).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except BrokenPipeError:
+                    pass  # el cliente ya se fue por timeout o porque ganó la cobertura
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def legacy_call(url, timeout):
+    """Como el LegalAIAssistant anterior: requests.post nuevo (conexión nueva) en cada llamada."""
+    try:
+        response = requests.post(url + '/chat/completions', json={'messages': []}, timeout=timeout,
+                                 headers={'Authorization': 'Bearer x'})
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+    except Exception:
+        return None
+
+
+def legacy_sequential(urls, timeout):
+    for url in urls:
+        answer = legacy_call(url, timeout)
+        if answer:
+            return answer
+    return None
+
+
+def measure(fn, n):
+    latencies, answers = [], {}
+    for _ in range(n):
+        start = time.perf_counter()
+        answer = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+        answers[answer] = answers.get(answer, 0) + 1
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--timeout', type=float, default=3.0, help='timeout por llamada (antes 30 s)')
+    parser.add_argument('--hedge-default', type=float, default=1.0, help='espera inicial antes de cubrir sin historial')
+    args = parser.parse_args()
+
+    groq, openrouter = StubServer('groq', delay=0.08), StubServer('openrouter', delay=0.15)
+    scenarios = (
+        ('sano', dict(delay=0.08, status=200)),
+        ('lento', dict(delay=args.timeout * 2, status=200)),
+        ('caído', dict(delay=0.0, status=500)),
+    )
+
+    print(f"{'escenario':<10} {'cliente':<10} {'p50 ms':>9} {'p99 ms':>9}  respuestas")
+    for name, groq_conf in scenarios:
+        vars(groq).update(groq_conf)
+        # Router nuevo en cada escenario: breakers e historial de latencias desde cero
+        providers = [
+            ChatProvider('groq', groq.url, 'x', 'm', timeout=args.timeout, breaker=CircuitBreaker(5, 30)),
+            ChatProvider('openrouter', openrouter.url, 'x', 'm', timeout=args.timeout, breaker=CircuitBreaker(5, 30)),
+        ]
+        router = ProviderRouter(providers, default_hedge_delay=args.hedge_default)
+        # El secuencial tarda un timeout entero por petición con Groq colgado: menos repeticiones
+        legacy_n = args.requests if name != 'lento' else max(4, args.requests // 8)
+
+        before = groq.connections + openrouter.connections
+        p50, p99, answers = measure(lambda: legacy_sequential([groq.url, openrouter.url], args.timeout), legacy_n)
+        legacy_conns = groq.connections + openrouter.connections - before
+        print(f"{name:<10} {'anterior':<10} {p50:>9.1f} {p99:>9.1f}  {answers}  ({legacy_conns} conexiones)")
+
+        before = groq.connections + openrouter.connections
+        p50, p99, answers = measure(lambda: router.complete('sistema', 'pregunta'), args.requests)
+        router_conns = groq.connections + openrouter.connections - before
+        print(f"{name:<10} {'router':<10} {p50:>9.1f} {p99:>9.1f}  {answers}  ({router_conns} conexiones)")
+        g = providers[0].stats()
+        print(f"   -> groq: circuito {g['breaker']}, errores {g['errors']}, p95 {g['p95_ms']}; "
+              f"openrouter: coberturas {providers[1].stats()['hedges']} (ganadas {providers[1].stats()['hedge_wins']})")
+
+
+if __name__ == '__main__':
+    main()
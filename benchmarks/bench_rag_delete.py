@@ -0,0 +1,115 @@
+"""
+Benchmark: latencia de RAGSystem.delete_document según el tamaño del corpus.
+
+Compara el borrado anterior (UPDATE + recargar todas las filas de SQLite y
+reconstruir el índice) con el actual (UPDATE + tombstone en el VectorIndex del
+usuario). También mide lo que tarda la compactación en segundo plano.
+
+    python benchmarks/bench_rag_delete.py --sizes 1000 10000 50000 --deletes 20
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.vector_index import VectorIndex
+
+DIMENSION = 384
+
+
+def build_db(path, n_docs, n_users, content_chars):
+    rng = np.random.default_rng(0)
+    content = "Artículo de ejemplo con contenido legal. " * (content_chars // 40 + 1)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE rag_documents (
+            id INTEGER PRIMARY KEY, title TEXT, content TEXT, embedding BLOB,
+            user_id INTEGER, doc_type TEXT, source TEXT, is_active INTEGER DEFAULT 1
+        )
+    ''')
+    rows = ((f"doc_{i}", content[:content_chars], rng.random(DIMENSION, dtype=np.float32).tobytes(),
+             i % n_users, 'general', 'upload') for i in range(n_docs))
+    conn.executemany('INSERT INTO rag_documents (title, content, embedding, user_id, doc_type, source) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    return conn
+
+
+def load_tenants(conn):
+    per_user = {}
+    for doc_id, blob, user_id in conn.execute('SELECT id, embedding, user_id FROM rag_documents WHERE is_active = 1'):
+        ids, vectors = per_user.setdefault(user_id, ([], []))
+        ids.append(doc_id)
+        vectors.append(np.frombuffer(blob, dtype=np.float32))
+    tenants = {}
+    for user_id, (ids, vectors) in per_user.items():
+        index = VectorIndex(DIMENSION, use_ids=True)
+        index.add_with_ids(np.vstack(vectors), ids)
+        tenants[user_id] = index
+    return tenants
+
+
+def delete_rebuild(conn, doc_id, user_id):
+    """Comportamiento anterior: tras el UPDATE se relee y reindexa todo el corpus."""
+    conn.execute('UPDATE rag_documents SET is_active = 0 WHERE id = ? AND user_id = ?', (doc_id, user_id))
+    conn.commit()
+    rows = conn.execute('SELECT id, title, content, embedding, user_id, doc_type, source '
+                        'FROM rag_documents WHERE is_active = 1').fetchall()
+    index = faiss.IndexFlatL2(DIMENSION)
+    index.add(np.vstack([np.frombuffer(r[3], dtype=np.float32) for r in rows]))
+
+
+def delete_tombstone(conn, tenants, doc_id, user_id):
+    conn.execute('UPDATE rag_documents SET is_active = 0 WHERE id = ? AND user_id = ?', (doc_id, user_id))
+    conn.commit()
+    tenants[user_id].remove_ids([doc_id])
+
+
+def percentile_ms(samples, q):
+    return np.percentile(samples, q) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--deletes', type=int, default=20)
+    parser.add_argument('--content-chars', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'documentos':>10} {'modo':<10} {'p50 ms':>9} {'p99 ms':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            conn = build_db(os.path.join(directory, 'rag.db'), size, args.users, args.content_chars)
+            tenants = load_tenants(conn)
+            targets = [(i + 1, i % args.users) for i in range(0, size, max(1, size // (2 * args.deletes)))]
+            rebuild_targets, tombstone_targets = targets[:args.deletes], targets[args.deletes:2 * args.deletes]
+
+            samples = []
+            for doc_id, user_id in rebuild_targets:
+                start = time.perf_counter()
+                delete_rebuild(conn, doc_id, user_id)
+                samples.append(time.perf_counter() - start)
+            print(f"{size:>10} {'rebuild':<10} {percentile_ms(samples, 50):>9.3f} {percentile_ms(samples, 99):>9.3f}")
+
+            samples = []
+            for doc_id, user_id in tombstone_targets:
+                start = time.perf_counter()
+                delete_tombstone(conn, tenants, doc_id, user_id)
+                samples.append(time.perf_counter() - start)
+            print(f"{size:>10} {'tombstone':<10} {percentile_ms(samples, 50):>9.3f} {percentile_ms(samples, 99):>9.3f}")
+
+            start = time.perf_counter()
+            removed = sum(index.compact() for index in tenants.values())
+            print(f"{size:>10} {'compact':<10} {'':>9} {'':>9}  ({removed} vectores en {(time.perf_counter() - start) * 1000:.1f} ms, en segundo plano)")
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark: LegalScraper anterior (requests.get secuencial + BeautifulSoup
+html.parser) vs. el nuevo (Fetcher concurrente con caché HTTP + lxml).
+
+Sirve en local páginas HTML de prueba con la estructura del BOE (listado de
+búsqueda con .resultado-busqueda y leyes con #textoxslt, publicidad, scripts y
+~300 KB de articulado), con latencia simulada y soporte de ETag/Last-Modified.
+Muestra además si ambas versiones extraen el mismo texto (las comprobaciones
+con asserts están en tests/test_scraper.py).
+
+    pip install -r requirements-dev.txt   # beautifulsoup4, solo para la versión anterior
+    python benchmarks/bench_scraper.py --laws 24 --latency-ms 80 --per-host 4
+"""
+import os
+import re
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.http_fetcher import Fetcher, HttpCache
+from modules.scraper import LegalScraper
+
+LAST_MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+
+
+def law_page(n, articles=400):
+    rng = random.Random(n)
+    words = ['contrato', 'arrendamiento', 'plazo', 'obligación', 'derecho', 'parte', 'notario', 'sociedad']
+    body = []
+    for a in range(1, articles + 1):
+        text = ' '.join(rng.choice(words) for _ in range(rng.randint(40, 120)))
+        body.append(f'<p class="articulo">Artículo {a}.</p>\n<p class="parrafo">{text}.</p>')
+        if a % 50 == 0:
+            body.append('<div class="publicidad">Anuncio que no debe salir</div>')
+    return f'''<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Ley {n}/2024</title>
+<script>var tracking = "no debe salir";</script><style>.x{{color:red}}</style></head>
+<body><div class="skip">Saltar al contenido</div><nav>{'<a href="#">menú</a>' * 200}</nav>
+<div id="textoxslt"><h3>Ley {n}/2024, de prueba</h3>{''.join(body)}</div>
+<footer>{'<p>pie</p>' * 100}</footer></body></html>'''.encode('utf-8')
+
+
+def search_page(query, n=8):
+    items = ''.join(f'''<li class="resultado-busqueda"><p class="titulo"><a href="/doc/{i}">Ley {i}/2024 sobre {query}</a></p>
+<p class="fecha"> 0{i % 9 + 1}/01/2024 </p><p class="texto">Resumen de la ley {i} sobre {query}.</p></li>''' for i in range(n))
+    return f'<html><body><ul>{items}</ul></body></html>'.encode('utf-8')
+
+
+class FixtureServer:
+    def __init__(self, latency):
+        self.hits = {'200': 0, '304': 0}
+        pages = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(latency)
+                match = re.match(r'/doc/(\d+)', self.path)
+                if match:
+                    n = int(match.group(1))
+                    body = pages.get(n) or pages.setdefault(n, law_page(n))
+                else:
+                    query = re.search(r'q=([^&]*)', self.path)
+                    body = search_page(query.group(1) if query else '')
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    server.hits['304'] += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                server.hits['200'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', LAST_MODIFIED)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def legacy_law_text(url):
+    """get_law_text anterior, copiado tal cual (sin el manejo de errores)."""
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    for elem in soup.select('.skip, .anuncio, .publicidad'):
+        elem.decompose()
+    text = ''
+    for selector in ['#textoxslt', '.articulado', '.disposicion', 'main article', '.contenido']:
+        content = soup.select_one(selector)
+        if content:
+            text = content.get_text(separator='\n', strip=True)
+            break
+    if not text:
+        text = soup.get_text(separator='\n', strip=True)
+    text = text[:50000]
+    return re.sub(r'\n\s*\n', '\n\n', text)
+
+
+def legacy_search(base, query):
+    response = requests.get(base + '/buscar/', params={'q': query, 'sort_field': 'fecha', 'sort_order': 'desc'}, timeout=30)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    results = []
+    for item in soup.select('.resultado-busqueda')[:5]:
+        title_elem = item.select_one('.titulo a')
+        link = title_elem['href']
+        results.append({
+            'title': title_elem.get_text(strip=True),
+            'link': link if link.startswith('http') else 'https://www.boe.es' + link,
+            'date': item.select_one('.fecha').get_text(strip=True),
+            'summary': item.select_one('.texto').get_text(strip=True),
+            'source': 'BOE',
+        })
+    return results
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--laws', type=int, default=24)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--per-host', type=int, default=4)
+    args = parser.parse_args()
+
+    fixtures = FixtureServer(args.latency_ms / 1000)
+    urls = [f"{fixtures.base}/doc/{i}" for i in range(args.laws)]
+    cache_dir = tempfile.mkdtemp(prefix='scraper_cache_')
+
+    def make_scraper(ttl):
+        fetcher = Fetcher(cache=HttpCache(cache_dir, default_ttl=ttl), per_host_limit=args.per_host, max_workers=8)
+        scraper = LegalScraper(fetcher=fetcher)
+        scraper.sources['boe']['url'] = fixtures.base + '/buscar/'
+        return scraper
+
+    print(f"-> {args.laws} leyes de ~{len(law_page(0)) // 1024} KB, latencia {args.latency_ms:.0f} ms, "
+          f"{args.per_host} descargas simultáneas por host")
+
+    # Solo parseo, sin red
+    page = law_page(0)
+    _, bs4_ms = timed(lambda: BeautifulSoup(page.decode('utf-8'), 'html.parser').select_one('#textoxslt').get_text('\n', strip=True))
+    from modules.http_fetcher import FetchResult
+    _, lxml_ms = timed(lambda: make_scraper(0).extract_law_text(FetchResult('x', 200, page, 'utf-8')))
+    print(f"-> Extracción de una ley: BeautifulSoup {bs4_ms:.1f} ms, lxml {lxml_ms:.1f} ms")
+
+    legacy, legacy_ms = timed(lambda: [legacy_law_text(url) for url in urls])
+    cold, cold_ms = timed(lambda: make_scraper(0).get_law_texts(urls))
+    revalidated, revalidated_ms = timed(lambda: make_scraper(0).get_law_texts(urls))
+    fresh, fresh_ms = timed(lambda: make_scraper(3600).get_law_texts(urls))
+
+    print(f"\n{'versión':<32} {'total ms':>10} {'ms/ley':>8}")
+    for name, ms in (('anterior (secuencial + bs4)', legacy_ms), ('nuevo, caché vacía', cold_ms),
+                     ('nuevo, revalidación (304)', revalidated_ms), ('nuevo, caché vigente', fresh_ms)):
+        print(f"{name:<32} {ms:>10.1f} {ms / args.laws:>8.1f}")
+    print(f"\n-> Respuestas del servidor: {fixtures.hits}")
+
+    same_text = legacy == cold == revalidated == fresh
+    legacy_results = legacy_search(fixtures.base, 'arrendamiento')
+    new_results = make_scraper(0).search_all('arrendamiento')
+    print(f"-> Mismo texto extraído que la versión anterior: {same_text}")
+    print(f"-> Mismos resultados de búsqueda en el BOE: {legacy_results == new_results['boe']} "
+          f"(fuentes consultadas a la vez: {', '.join(new_results)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: memoria por worker con índice privado vs. índice compartido por mmap.
+
+Simula N workers de gunicorn que cargan la misma base de conocimiento y hacen
+búsquedas. Con carga privada cada worker tiene su propia copia (RssAnon); con mmap
+las páginas vienen de la caché del sistema y se comparten (RssFile / Pss).
+
+    python benchmarks/bench_shared_index.py --vectors 200000 --dim 768 --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.assistant.chunk_store import ChunkStore, read_faiss_index_mmap
+
+
+def memory_kb():
+    """RSS del proceso separado en anónima (privada) y de archivo (compartible), más Pss."""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key = line.split(':')[0]
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                values[key] = int(line.split()[1])
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    values['Pss'] = int(line.split()[1])
+    except FileNotFoundError:
+        values['Pss'] = values.get('VmRSS', 0)
+    return values
+
+
+def build_fixture(directory, n_vectors, dim, chunk_chars):
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, n_vectors, 50000):
+        index.add(rng.random((min(50000, n_vectors - start), dim), dtype=np.float32))
+    faiss.write_index(index, os.path.join(directory, 'vectors.faiss'))
+
+    filler = "Producto de catálogo con precio y características. " * (chunk_chars // 50 + 1)
+    texts = [(f"{i}: {filler[:chunk_chars]}", f"catalogo_{i % 50}.pdf") for i in range(n_vectors)]
+    ChunkStore.write(os.path.join(directory, 'chunks'), texts)
+    return rng.random((20, dim), dtype=np.float32)
+
+
+def worker(mode, directory, queries, barrier, results):
+    base = memory_kb()
+    start = time.perf_counter()
+    if mode == 'private':
+        index = faiss.read_index(os.path.join(directory, 'vectors.faiss'))
+        store = ChunkStore(os.path.join(directory, 'chunks'))
+        # Equivale al docstore pickle de LangChain: todos los textos en memoria del proceso
+        texts = [store.get(i) for i in range(len(store))]
+        fetch = texts.__getitem__
+    else:
+        index = read_faiss_index_mmap(os.path.join(directory, 'vectors.faiss'))
+        store = ChunkStore(os.path.join(directory, 'chunks'))
+        fetch = store.get
+    load_s = time.perf_counter() - start
+
+    _, ids = index.search(queries, 3)
+    for row in ids:
+        for i in row:
+            fetch(int(i))
+
+    # Todos los workers vivos a la vez: así el Pss reparte las páginas compartidas
+    barrier.wait()
+    mem = memory_kb()
+    results.put((mode, load_s, {k: mem[k] - base.get(k, 0) for k in mem}))
+    barrier.wait()
+
+
+def run(mode, directory, queries, n_workers):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, directory, queries, barrier, results)) for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-chars', type=int, default=800)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"-> Generando {args.vectors} vectores de {args.dim} dimensiones...")
+        queries = build_fixture(directory, args.vectors, args.dim, args.chunk_chars)
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1024 / 1024
+        print(f"-> Tamaño en disco: {size_mb:.1f} MB\n")
+
+        print(f"{'modo':<8} {'carga (s)':>10} {'RssAnon MB':>11} {'RssFile MB':>11} {'Pss MB':>8}")
+        for mode in ('private', 'mmap'):
+            rows = run(mode, directory, queries, args.workers)
+            for _, load_s, mem in rows:
+                print(f"{mode:<8} {load_s:>10.3f} {mem.get('RssAnon', 0) / 1024:>11.1f} "
+                      f"{mem.get('RssFile', 0) / 1024:>11.1f} {mem.get('Pss', 0) / 1024:>8.1f}")
+            total_pss = sum(mem.get('Pss', 0) for _, _, mem in rows) / 1024
+            print(f"{mode:<8} total Pss de {args.workers} workers: {total_pss:.1f} MB\n")
+
+
+if __name__ == '__main__':
+    main()
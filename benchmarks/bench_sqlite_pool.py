@@ -0,0 +1,91 @@
+"""
+Benchmark: escrituras/s con muchos hilos de webhook registrando mensajes a la vez.
+
+Compara el log_message anterior (sqlite3.connect + commit + close en cada mensaje,
+journal por defecto) con modules/db.py (conexión por hilo, WAL, pragmas y
+sentencias preparadas reutilizadas). Cada turno de chat son dos inserciones.
+
+    python benchmarks/bench_sqlite_pool.py --threads 1 8 32 --turns 200
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.db import Database
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        sender TEXT NOT NULL,
+        message_text TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+INSERT = "INSERT INTO conversations (chat_id, sender, message_text) VALUES (?, ?, ?)"
+
+
+def make_connect_per_call(path):
+    def log_message(chat_id, sender, message):
+        conn = sqlite3.connect(path)
+        conn.execute(INSERT, (chat_id, sender, message))
+        conn.commit()
+        conn.close()
+    return log_message
+
+
+def make_pooled(path):
+    db = Database(path)
+
+    def log_message(chat_id, sender, message):
+        db.write(INSERT, (chat_id, sender, message))
+    return log_message
+
+
+def run(log_message, n_threads, turns):
+    errors = []
+    barrier = threading.Barrier(n_threads)
+
+    def worker(chat_id):
+        barrier.wait()
+        for i in range(turns):
+            try:
+                log_message(chat_id, 'user', f"Pregunta {i} sobre precios y disponibilidad")
+                log_message(chat_id, 'bot', f"Respuesta {i}: el producto está disponible")
+            except sqlite3.Error as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return n_threads * turns * 2 / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--turns', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'modo':<18} {'hilos':>6} {'escrituras/s':>13} {'errores':>8}")
+    for name, factory in (('connect-por-call', make_connect_per_call), ('pool WAL', make_pooled)):
+        for n_threads in args.threads:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.db')
+                with sqlite3.connect(path) as conn:
+                    conn.execute(SCHEMA)
+                rate, errors = run(factory(path), n_threads, args.turns)
+                print(f"{name:<18} {n_threads:>6} {rate:>13.0f} {errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
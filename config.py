@@ -20,10 +20,128 @@ class Config:
     GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
 
     TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
+    # Si se define, Telegram debe enviarlo en la cabecera X-Telegram-Bot-Api-Secret-Token
+    TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET')
+    # Respuestas en streaming: primer mensaje con la primera frase y ediciones cada N segundos como mucho.
+    # Desactivado por defecto: cada respuesta pasa a ser un envío más varias ediciones (límites de la
+    # API de Telegram) y, sin WEBHOOK_ASYNC, el webhook espera a que termine la generación.
+    TELEGRAM_STREAMING = os.environ.get('TELEGRAM_STREAMING', 'false').lower() == 'true'
+    TELEGRAM_STREAM_EDIT_INTERVAL = float(os.environ.get('TELEGRAM_STREAM_EDIT_INTERVAL', 1.0))
+    TELEGRAM_STREAM_FIRST_MESSAGE_CHARS = int(os.environ.get('TELEGRAM_STREAM_FIRST_MESSAGE_CHARS', 200))
+
+    # Twilio (WhatsApp). Necesario para responder por la API REST en modo asíncrono.
+    TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
+    TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
+    TWILIO_WHATSAPP_FROM = os.environ.get('TWILIO_WHATSAPP_FROM')  # ej: 'whatsapp:+14155238886'
+    TWILIO_VALIDATE_SIGNATURE = os.environ.get('TWILIO_VALIDATE_SIGNATURE', 'false').lower() == 'true'
+
+    # Caché semántica de respuestas (delante de get_commercial_response)
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', 1000))
+    SEMANTIC_CACHE_TTL = int(os.environ.get('SEMANTIC_CACHE_TTL', 86400))
+    # Ruta SQLite opcional para persistir la caché entre reinicios (vacío = solo memoria)
+    SEMANTIC_CACHE_DB_PATH = os.environ.get('SEMANTIC_CACHE_DB_PATH', '')
+
+    # Webhooks asíncronos: se responde 200 de inmediato y la respuesta se envía desde un pool de workers
+    WEBHOOK_ASYNC = os.environ.get('WEBHOOK_ASYNC', 'false').lower() == 'true'
+    WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 4))
+    WEBHOOK_QUEUE_SIZE = int(os.environ.get('WEBHOOK_QUEUE_SIZE', 200))
     
+    # Proveedores de LegalAIAssistant (APIs compatibles con OpenAI), en orden de preferencia
+    GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+    GROQ_BASE_URL = os.environ.get('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+    GROQ_MODEL = os.environ.get('GROQ_MODEL', 'llama-3.1-8b-instant')
+    OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
+    OPENROUTER_BASE_URL = os.environ.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+    OPENROUTER_MODEL = os.environ.get('OPENROUTER_MODEL', 'google/gemma-7b-it:free')
+    PROVIDER_TIMEOUT = float(os.environ.get('PROVIDER_TIMEOUT', 30))
+    PROVIDER_POOL_SIZE = int(os.environ.get('PROVIDER_POOL_SIZE', 10))
+    # Cobertura: si un proveedor no responde en su p95 se lanza también el siguiente (espera inicial sin historial)
+    PROVIDER_HEDGING = os.environ.get('PROVIDER_HEDGING', 'true').lower() == 'true'
+    PROVIDER_HEDGE_DEFAULT_DELAY = float(os.environ.get('PROVIDER_HEDGE_DEFAULT_DELAY', 5))
+    # Peticiones simultáneas previstas por proceso: el router reserva un hilo por proveedor para cada una
+    PROVIDER_CONCURRENCY = int(os.environ.get('PROVIDER_CONCURRENCY', 16))
+    # Circuit breaker: fallos seguidos para abrirlo y segundos hasta la siguiente llamada de prueba
+    PROVIDER_BREAKER_FAILURES = int(os.environ.get('PROVIDER_BREAKER_FAILURES', 5))
+    PROVIDER_BREAKER_RESET = float(os.environ.get('PROVIDER_BREAKER_RESET', 30))
+    # Filtro de temática jurídica: fichero con un término por línea (vacío = lista por defecto) y
+    # similitud mínima del respaldo por embeddings (solo si LegalAIAssistant recibe un encoder)
+    LEGAL_TERMS_FILE = os.environ.get('LEGAL_TERMS_FILE', '')
+    LEGAL_EMBEDDING_THRESHOLD = float(os.environ.get('LEGAL_EMBEDDING_THRESHOLD', 0.5))
+
+    # LegalScraper: caché HTTP en disco (vacío = sin caché), vigencia sin revalidar y descargas simultáneas por host
+    SCRAPER_CACHE_DIR = os.environ.get('SCRAPER_CACHE_DIR', os.path.join(BASE_DIR, 'instance', 'scraper_cache'))
+    SCRAPER_CACHE_TTL = int(os.environ.get('SCRAPER_CACHE_TTL', 300))
+    SCRAPER_PER_HOST_LIMIT = int(os.environ.get('SCRAPER_PER_HOST_LIMIT', 2))
+    SCRAPER_MAX_WORKERS = int(os.environ.get('SCRAPER_MAX_WORKERS', 8))
+    SCRAPER_TIMEOUT = float(os.environ.get('SCRAPER_TIMEOUT', 30))
+
+    # Corpus legal local (modules/legal_corpus.py): textos versionados, URLs a rastrear y artículos por tanda de vectorización
+    CORPUS_DIR = os.environ.get('CORPUS_DIR', os.path.join(BASE_DIR, 'instance', 'legal_corpus'))
+    CORPUS_URLS_FILE = os.environ.get('CORPUS_URLS_FILE', os.path.join(BASE_DIR, 'instance', 'legal_corpus', 'urls.txt'))
+    CORPUS_PUSH_BATCH = int(os.environ.get('CORPUS_PUSH_BATCH', 256))
+
     # El interruptor principal para la IA
     AI_PROVIDER = os.environ.get('AI_PROVIDER', 'ollama')
 
+    # Embeddings: lotes, concurrencia, límite de tasa, reintentos y caché por contenido
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'models/text-embedding-004')
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 100))
+    EMBEDDING_MAX_CONCURRENCY = int(os.environ.get('EMBEDDING_MAX_CONCURRENCY', 4))
+    EMBEDDING_REQUESTS_PER_MINUTE = float(os.environ.get('EMBEDDING_REQUESTS_PER_MINUTE', 1500))
+    EMBEDDING_MAX_RETRIES = int(os.environ.get('EMBEDDING_MAX_RETRIES', 6))
+    # Consultas recientes cuyo embedding se guarda en memoria (LRU; no van a la caché en disco)
+    EMBEDDING_QUERY_CACHE_SIZE = int(os.environ.get('EMBEDDING_QUERY_CACHE_SIZE', 1024))
+    # Vacío = sin caché en disco
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(BASE_DIR, 'instance', 'embedding_cache.db'))
+
+    # Índices vectoriales de RAGProcessor / RAGSystem: 'flat', 'ivf_flat', 'hnsw' o 'ivf_pq'
+    VECTOR_INDEX_TYPE = os.environ.get('VECTOR_INDEX_TYPE', 'flat')
+    VECTOR_INDEX_NLIST = int(os.environ.get('VECTOR_INDEX_NLIST', 0))  # 0 = automático (~4·sqrt(N))
+    VECTOR_INDEX_NPROBE = int(os.environ.get('VECTOR_INDEX_NPROBE', 16))
+    VECTOR_INDEX_HNSW_M = int(os.environ.get('VECTOR_INDEX_HNSW_M', 32))
+    VECTOR_INDEX_EF_SEARCH = int(os.environ.get('VECTOR_INDEX_EF_SEARCH', 64))
+    VECTOR_INDEX_PQ_M = int(os.environ.get('VECTOR_INDEX_PQ_M', 16))
+    # Los tipos IVF se entrenan (y sustituyen al Flat provisional) al alcanzar este número de vectores
+    VECTOR_INDEX_TRAIN_THRESHOLD = int(os.environ.get('VECTOR_INDEX_TRAIN_THRESHOLD', 20000))
+    # Cada cuántos segundos RAGSystem elimina físicamente los documentos borrados (0 = desactivado)
+    RAG_COMPACTION_INTERVAL = float(os.environ.get('RAG_COMPACTION_INTERVAL', 60))
+    # Fragmentación de RAGSystem (MiniLM trunca a 256 tokens, ~1000 caracteres)
+    RAG_CHUNK_SIZE = int(os.environ.get('RAG_CHUNK_SIZE', 800))
+    RAG_CHUNK_OVERLAP = int(os.environ.get('RAG_CHUNK_OVERLAP', 100))
+    RAG_ENCODE_BATCH_SIZE = int(os.environ.get('RAG_ENCODE_BATCH_SIZE', 64))
+    # RAGProcessor reescribe el índice principal (checkpoint) cada N subidas; entre medias solo añade segmentos al WAL
+    RAG_CHECKPOINT_SEGMENTS = int(os.environ.get('RAG_CHECKPOINT_SEGMENTS', 20))
+    # Cada cuántos segundos, como mucho, las búsquedas de RAGProcessor miran si otro proceso añadió artículos
+    RAG_SYNC_INTERVAL = float(os.environ.get('RAG_SYNC_INTERVAL', 5))
+    # Micro-lotes de consultas en RAGProcessor: espera máxima para juntar consultas concurrentes (0 = desactivado)
+    RAG_QUERY_MAX_WAIT_MS = float(os.environ.get('RAG_QUERY_MAX_WAIT_MS', 5))
+    RAG_QUERY_MAX_BATCH = int(os.environ.get('RAG_QUERY_MAX_BATCH', 32))
+    # Hilos que procesan las subidas de documentos en segundo plano
+    INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 1))
+
+    # Carga la base de conocimiento al crear la app en lugar de en la primera petición
+    KB_EAGER_LOAD = os.environ.get('KB_EAGER_LOAD', 'false').lower() == 'true'
+    # Abre los índices con mmap para que los workers de gunicorn compartan la memoria
+    KB_MMAP = os.environ.get('KB_MMAP', 'true').lower() == 'true'
+
+    # SQLite compartido (modules/db.py): una conexión por hilo en modo WAL
+    DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')  # FULL = durabilidad total en cada commit
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 20000))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+
+    # Registro de conversaciones del bot: 'async' (write-behind por lotes) o 'sync' (commit por mensaje)
+    CONVERSATION_LOG_MODE = os.environ.get('CONVERSATION_LOG_MODE', 'async')
+    CONVERSATION_LOG_BATCH_SIZE = int(os.environ.get('CONVERSATION_LOG_BATCH_SIZE', 200))
+    CONVERSATION_LOG_FLUSH_INTERVAL = float(os.environ.get('CONVERSATION_LOG_FLUSH_INTERVAL', 0.5))
+    CONVERSATION_LOG_QUEUE_SIZE = int(os.environ.get('CONVERSATION_LOG_QUEUE_SIZE', 10000))
+
+    # Modelos de generación por proveedor (la cadena RAG se cachea por proveedor + modelo)
+    GOOGLE_CHAT_MODEL = os.environ.get('GOOGLE_CHAT_MODEL', 'gemini-1.5-flash-latest')
+    OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'phi3:mini')
+
 # Verificación que se imprime en la terminal al iniciar
 print("-" * 30)
 print(f"-> RUTA DE LA BASE DE DATOS: '{Config.DATABASE_PATH}'")
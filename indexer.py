@@ -1,71 +1,329 @@
 import os
 import fitz
+import json
 import time
+import shutil
+import hashlib
+import argparse
+import tempfile
 import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from config import Config
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.schema.document import Document
+from modules.assistant.embeddings import get_embedding_model
+from modules.assistant.knowledge_base import write_index_metadata, export_shared_index
 
 PDFS_PATH = "biblioteca_pdfs/"
 INDEX_PATH = "faiss_index_maestra"
+# Manifiesto con el hash de cada PDF y los IDs (hash de contenido) de sus fragmentos
+MANIFEST_PATH = os.path.join(INDEX_PATH, "manifest.json")
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+# Texto acumulado (en caracteres) antes de trocear; acota la memoria por documento
+SPLIT_WINDOW = CHUNK_SIZE * 8
+# Fragmentos que se embeben y añaden al índice de una vez; acota la memoria del proceso principal
+ADD_BATCH = 256
 
-def create_master_index():
+# --- UTILIDADES DE HASH Y MANIFIESTO ---
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_chunk_ids(source, chunks):
+    """
+    Genera (fragmento, ID) con un ID estable por fragmento: hash de (archivo, texto,
+    nº de repetición del mismo texto). Un fragmento que no cambia conserva su ID
+    aunque el resto del PDF se edite. Las repeticiones se cuentan por el hash del
+    texto, así no hace falta tener los fragmentos del documento en memoria.
+    """
+    seen = {}
+    for chunk in chunks:
+        key = hashlib.sha1(chunk.encode('utf-8')).digest()
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        payload = f"{source}\x00{occurrence}\x00{chunk}".encode('utf-8')
+        yield chunk, hashlib.sha256(payload).hexdigest()
+
+def chunk_ids(source, chunks):
+    return [chunk_id for _, chunk_id in iter_chunk_ids(source, chunks)]
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    # Escritura atómica: un fallo a mitad nunca deja un manifiesto corrupto
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+# --- EXTRACCIÓN (PIPELINE EN PARALELO) ---
+# Cada proceso del pool abre un PDF, recorre sus páginas como un generador y va
+# troceando el texto por ventanas, así nunca tiene el documento entero en memoria.
+# Los fragmentos no vuelven como una lista: el worker los va escribiendo en un
+# fichero temporal (JSON por línea) y el proceso principal los lee de uno en uno.
+# El proceso principal mantiene un número acotado de documentos en vuelo.
+
+_worker_splitter = None
+
+def _make_splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def _init_worker():
+    global _worker_splitter
+    _worker_splitter = _make_splitter()
+
+def iter_page_texts(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            yield page.get_text()
+
+def split_stream(page_texts, text_splitter, window=SPLIT_WINDOW):
+    """
+    Trocea un flujo de páginas sin concatenar el documento completo.
+    El último fragmento de cada ventana se arrastra a la siguiente para que
+    los cortes (y el solapamiento) sigan el texto continuo.
+    """
+    buffer = ""
+    for page_text in page_texts:
+        buffer += page_text
+        if len(buffer) < window:
+            continue
+        chunks = text_splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        yield from chunks[:-1]
+        buffer = chunks[-1]
+    if buffer.strip():
+        yield from text_splitter.split_text(buffer)
+
+def iter_chunks(pdf_file, text_splitter=None):
+    """Fragmentos de un PDF, a medida que se trocean sus páginas."""
+    text_splitter = text_splitter or _worker_splitter or _make_splitter()
+    return split_stream(iter_page_texts(os.path.join(PDFS_PATH, pdf_file)), text_splitter)
+
+def _extract_task(pdf_file, spool_path):
+    try:
+        with open(spool_path, 'w', encoding='utf-8') as f:
+            for chunk in iter_chunks(pdf_file):
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        return pdf_file, spool_path, None
+    except Exception as e:
+        return pdf_file, spool_path, str(e)
+
+def _read_spool(spool_path):
+    try:
+        with open(spool_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    finally:
+        os.remove(spool_path)
+
+def _spooled(result):
+    pdf_file, spool_path, error = result
+    if error is not None:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        return pdf_file, None, error
+    return pdf_file, _read_spool(spool_path), None
+
+class ExtractionError(Exception):
+    """Fallo al leer o trocear un PDF (no al embeberlo): ese archivo se salta."""
+
+def _guarded(chunks):
+    try:
+        yield from chunks
+    except Exception as e:
+        raise ExtractionError(str(e)) from e
+
+def iter_extracted(pdf_files, workers=1, max_in_flight=None):
+    """
+    Genera (pdf_file, fragmentos, error) a medida que cada documento termina.
+    `fragmentos` es un iterador que hay que consumir antes de pedir el siguiente
+    documento. Sin pool (workers=1), un error de lectura salta al recorrerlo como
+    ExtractionError.
+    """
+    if workers <= 1:
+        text_splitter = _make_splitter()
+        for pdf_file in pdf_files:
+            yield pdf_file, _guarded(iter_chunks(pdf_file, text_splitter)), None
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    spool_dir = tempfile.mkdtemp(prefix='indexer_chunks_')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight = set()
+            for n, pdf_file in enumerate(pdf_files):
+                spool_path = os.path.join(spool_dir, f"{n}.jsonl")
+                in_flight.add(pool.submit(_extract_task, pdf_file, spool_path))
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield _spooled(future.result())
+            for future in in_flight:
+                yield _spooled(future.result())
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+# --- CONSTRUCCIÓN DEL ÍNDICE ---
+
+def create_master_index(incremental=False, workers=1, max_in_flight=None):
     print("--- Iniciando Creación de Base de Conocimiento para SalesMind ---")
     if not Config.GOOGLE_API_KEY:
         print("-> ERROR: La GOOGLE_API_KEY no está en tu archivo .env. Proceso detenido.")
         return
 
-    # (El resto del código es tu lógica de lectura de PDFs, que ya funcionaba bien)
-    pdf_files = [f for f in os.listdir(PDFS_PATH) if f.lower().endswith(".pdf")]
-    if not pdf_files:
+    pdf_files = sorted(f for f in os.listdir(PDFS_PATH) if f.lower().endswith(".pdf"))
+    previous = load_manifest() if incremental else None
+    if incremental and (previous is None or not os.path.exists(os.path.join(INDEX_PATH, "index.faiss"))):
+        print("-> No hay índice o manifiesto previo. Se realizará una construcción completa.")
+        incremental = False
+        previous = None
+
+    if not pdf_files and not incremental:
         print(f"-> ADVERTENCIA: No se encontraron PDFs en '{PDFS_PATH}'.")
         return
-    
-    print(f"-> {len(pdf_files)} PDFs encontrados. Procesando...")
-    docs_with_metadata = []
+
+    print(f"-> {len(pdf_files)} PDFs encontrados. Procesando con {workers} proceso(s)...")
+    previous_files = previous["files"] if previous else {}
+
+    manifest = {"version": 1, "files": {}}
+    removed_ids = []
+    skipped = 0
+
+    # 1. Hash de cada archivo: solo se extraen los nuevos o modificados
+    file_hashes = {}
     for pdf_file in pdf_files:
         try:
-            with fitz.open(os.path.join(PDFS_PATH, pdf_file)) as doc:
-                full_text = "".join(page.get_text() for page in doc)
-                if full_text.strip():
-                    docs_with_metadata.append({"text": full_text, "source": pdf_file})
-        except Exception as e:
+            file_hash = file_sha256(os.path.join(PDFS_PATH, pdf_file))
+        except OSError as e:
             print(f"   -> Error leyendo {pdf_file}: {e}")
+            if pdf_file in previous_files:
+                manifest["files"][pdf_file] = previous_files[pdf_file]
             continue
+        old_entry = previous_files.get(pdf_file)
+        if old_entry and old_entry["sha256"] == file_hash:
+            # Archivo sin cambios: ni se lee ni se re-embebe
+            manifest["files"][pdf_file] = old_entry
+            skipped += len(old_entry["chunks"])
+        else:
+            file_hashes[pdf_file] = file_hash
 
-    if not docs_with_metadata:
-        print("-> ERROR: No se pudo extraer texto de ningún PDF.")
-        return
+    print("-> Generando embeddings con Google a medida que se extraen los fragmentos... (Esto puede tardar)")
+    start = time.time()
+    try:
+        # Mismo cliente que el resto de la app: lotes explícitos, reintentos ante 429 y caché en disco
+        embeddings = get_embedding_model()
+        vector_store = None
+        if incremental:
+            vector_store = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+        batch_docs, batch_ids = [], []
+        added = 0
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=200)
-    all_chunks = [
-        Document(page_content=chunk, metadata={"source": doc["source"]})
-        for doc in docs_with_metadata
-        for chunk in text_splitter.split_text(doc["text"])
-    ]
+        def flush():
+            # Como mucho ADD_BATCH fragmentos pendientes: la memoria no crece con la biblioteca
+            nonlocal vector_store, added
+            if not batch_docs:
+                return
+            if vector_store is None:
+                vector_store = FAISS.from_documents(batch_docs, embedding=embeddings, ids=batch_ids)
+            else:
+                vector_store.add_documents(batch_docs, ids=batch_ids)
+            added += len(batch_docs)
+            batch_docs.clear()
+            batch_ids.clear()
+
+        # 2. Extracción y troceado en paralelo; los fragmentos se embeben por lotes según llegan
+        for pdf_file, chunks, error in iter_extracted(list(file_hashes), workers, max_in_flight):
+            old_entry = previous_files.get(pdf_file)
+            old_ids = set(old_entry["chunks"]) if old_entry else set()
+            ids, file_new_ids, file_skipped = [], [], 0
+            try:
+                if error is not None:
+                    raise ExtractionError(error)
+                for chunk, chunk_id in iter_chunk_ids(pdf_file, chunks):
+                    ids.append(chunk_id)
+                    if chunk_id in old_ids:
+                        file_skipped += 1
+                        continue
+                    batch_docs.append(Document(page_content=chunk, metadata={"source": pdf_file}))
+                    batch_ids.append(chunk_id)
+                    file_new_ids.append(chunk_id)
+                    if len(batch_docs) >= ADD_BATCH:
+                        flush()
+            except ExtractionError as e:
+                print(f"   -> Error leyendo {pdf_file}: {e}")
+                # Lo ya añadido de este archivo se deshace y se conserva lo que estaba indexado
+                discard = set(file_new_ids)
+                pending_ids = set(batch_ids)
+                flushed = [chunk_id for chunk_id in file_new_ids if chunk_id not in pending_ids]
+                kept = [(doc, chunk_id) for doc, chunk_id in zip(batch_docs, batch_ids) if chunk_id not in discard]
+                batch_docs[:] = [doc for doc, _ in kept]
+                batch_ids[:] = [chunk_id for _, chunk_id in kept]
+                if flushed:
+                    vector_store.delete(flushed)
+                    added -= len(flushed)
+                if old_entry:
+                    manifest["files"][pdf_file] = old_entry
+                continue
+            skipped += file_skipped
+            removed_ids.extend(old_ids - set(ids))
+            manifest["files"][pdf_file] = {"sha256": file_hashes[pdf_file], "chunks": ids}
+        flush()
+
+        # Archivos que ya no existen: sus vectores se eliminan
+        for pdf_file, entry in previous_files.items():
+            if pdf_file not in manifest["files"]:
+                removed_ids.extend(entry["chunks"])
+
+        if vector_store is None:
+            print("-> ERROR: No se pudo extraer texto de ningún PDF.")
+            return
+
+        print(f"-> Fragmentos: {skipped} sin cambios (omitidos), {added} nuevos, {len(removed_ids)} eliminados.")
+        if incremental and not added and not removed_ids:
+            print("-> La base de conocimiento ya está al día. No hay nada que hacer.")
+            return
+
+        if incremental:
+            existing = set(vector_store.index_to_docstore_id.values())
+            to_remove = [i for i in removed_ids if i in existing]
+            if to_remove:
+                vector_store.delete(to_remove)
 
-    print(f"-> {len(all_chunks)} fragmentos de texto creados.")
-    print("-> Generando embeddings con Google... (Esto puede tardar)")
-    
-    try:
-        # --- AQUÍ ESTÁ EL CAMBIO CLAVE ---
-        # Usamos el mismo modelo y la misma clave que el resto de tu app
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004",
-            google_api_key=Config.GOOGLE_API_KEY
-        )
-        
-        vector_store = FAISS.from_documents(all_chunks, embedding=embeddings)
         vector_store.save_local(INDEX_PATH)
-        
-        print("\n-> ¡ÉXITO! La base de conocimiento se creó correctamente.")
-        print(f"-> Índice guardado en '{INDEX_PATH}'.")
+        # Copia en formato compartido (mmap) que cargan los workers de la app
+        export_shared_index(vector_store, INDEX_PATH)
+        # Metadatos para validar el índice al cargarlo sin llamar a la API
+        write_index_metadata(INDEX_PATH, Config.EMBEDDING_MODEL, vector_store.index.d, vector_store.index.ntotal)
+        save_manifest(manifest)
+
+        print(f"\n-> ¡ÉXITO! La base de conocimiento se {'actualizó' if incremental else 'creó'} correctamente en {time.time() - start:.1f}s.")
+        print(f"-> Índice guardado en '{INDEX_PATH}' ({vector_store.index.ntotal} vectores).")
+        print(f"-> Resumen: {skipped} omitidos, {added} añadidos, {len(removed_ids)} eliminados.")
+        print(f"-> Embeddings: {embeddings.stats()}")
 
     except Exception as e:
         print(f"\n-> ERROR CRÍTICO durante la creación de embeddings: {e}")
         traceback.print_exc()
 
 if __name__ == "__main__":
-    create_master_index()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Crea o actualiza la base de conocimiento de SalesMind.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Solo embebe fragmentos nuevos o modificados y elimina los de PDFs borrados.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para extraer y trocear PDFs en paralelo (1 = sin pool).")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Máximo de documentos en proceso a la vez (por defecto 2 x workers).")
+    args = parser.parse_args()
+    create_master_index(incremental=args.incremental, workers=args.workers, max_in_flight=args.max_in_flight)
@@ -82,6 +82,11 @@ def create_app():
     from .assistant.routes import assistant_bp
     app.register_blueprint(assistant_bp)
 
+    # Calentamiento opcional: por defecto la base de conocimiento se carga en la primera petición
+    if Config.KB_EAGER_LOAD:
+        from .assistant.core import warm_up
+        warm_up()
+
     # 4. (Opcional) Una ruta para verificar que el servidor está en línea
     @app.route("/")
     def index():
@@ -0,0 +1,217 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from modules.db import get_db
+
+# Tablas de resumen (rollups) mantenidas por triggers: cualquier INSERT en users,
+# query_log o conversations, venga de donde venga, actualiza las estadísticas en
+# la misma transacción. El panel solo lee filas ya agregadas, así que su coste no
+# depende del tamaño de los logs. stats_chats es el resumen por chat (número de
+# mensajes y último mensaje) que pagina la lista de conversaciones.
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS stats_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS stats_queries_hourly (
+        hour TEXT PRIMARY KEY,          -- 'YYYY-MM-DD HH' (UTC, como CURRENT_TIMESTAMP)
+        queries INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS stats_daily (
+        day TEXT PRIMARY KEY,           -- 'YYYY-MM-DD'
+        queries INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        active_chats INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS stats_chats_daily (
+        day TEXT NOT NULL,
+        chat_id INTEGER NOT NULL,
+        messages INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, chat_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS stats_top_questions (
+        question_key TEXT PRIMARY KEY,  -- pregunta normalizada (minúsculas, sin espacios extremos)
+        question TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        last_at TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_stats_top_questions_hits ON stats_top_questions (hits DESC)',
+    '''CREATE TABLE IF NOT EXISTS stats_chats (
+        chat_id INTEGER PRIMARY KEY,
+        messages INTEGER NOT NULL DEFAULT 0,
+        last_at TEXT NOT NULL,          -- (last_at, last_id) del último mensaje del chat
+        last_id INTEGER NOT NULL,
+        last_message TEXT NOT NULL
+    )''',
+    # Lista de chats por último mensaje: la paginación por cursor recorre solo este índice
+    'CREATE INDEX IF NOT EXISTS idx_stats_chats_last ON stats_chats (last_at, chat_id)',
+    # "Actividad reciente": ORDER BY timestamp DESC LIMIT n recorre solo el final del índice
+    'CREATE INDEX IF NOT EXISTS idx_query_log_timestamp ON query_log (timestamp)',
+
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users BEGIN
+        INSERT INTO stats_counters (name, value) VALUES ('users', 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'users';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_query_log_insert AFTER INSERT ON query_log BEGIN
+        INSERT INTO stats_counters (name, value) VALUES ('queries', 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_queries_hourly (hour, queries)
+            VALUES (substr(COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), 1, 13), 1)
+            ON CONFLICT(hour) DO UPDATE SET queries = queries + 1;
+        INSERT INTO stats_daily (day, queries)
+            VALUES (substr(COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), 1, 10), 1)
+            ON CONFLICT(day) DO UPDATE SET queries = queries + 1;
+        INSERT INTO stats_top_questions (question_key, question, hits, last_at)
+            VALUES (lower(trim(NEW.question)), trim(NEW.question), 1, COALESCE(NEW.timestamp, CURRENT_TIMESTAMP))
+            ON CONFLICT(question_key) DO UPDATE SET hits = hits + 1, last_at = excluded.last_at;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_conversations_insert AFTER INSERT ON conversations BEGIN
+        INSERT INTO stats_counters (name, value) VALUES ('messages', 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        -- Primer mensaje del chat en el día: un chat activo más
+        INSERT INTO stats_daily (day, messages, active_chats)
+            VALUES (substr(COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), 1, 10), 1,
+                    NOT EXISTS (SELECT 1 FROM stats_chats_daily
+                                WHERE day = substr(COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), 1, 10)
+                                  AND chat_id = NEW.chat_id))
+            ON CONFLICT(day) DO UPDATE SET messages = messages + 1,
+                                           active_chats = active_chats + excluded.active_chats;
+        INSERT INTO stats_chats_daily (day, chat_id, messages)
+            VALUES (substr(COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), 1, 10), NEW.chat_id, 1)
+            ON CONFLICT(day, chat_id) DO UPDATE SET messages = messages + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_stats_chats_insert AFTER INSERT ON conversations BEGIN
+        INSERT INTO stats_chats (chat_id, messages, last_at, last_id, last_message)
+            VALUES (NEW.chat_id, 1, COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), NEW.id, NEW.message_text)
+            ON CONFLICT(chat_id) DO UPDATE SET messages = messages + 1;
+        -- Un mensaje con hora anterior (llegado tarde) no sustituye al último
+        UPDATE stats_chats
+            SET last_at = COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), last_id = NEW.id, last_message = NEW.message_text
+            WHERE chat_id = NEW.chat_id AND (last_at, last_id) < (COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), NEW.id);
+    END''',
+]
+
+# Reconstrucción completa a partir de los logs (solo al instalar el esquema)
+BACKFILL = [
+    'DELETE FROM stats_counters',
+    'DELETE FROM stats_queries_hourly',
+    'DELETE FROM stats_daily',
+    'DELETE FROM stats_chats_daily',
+    'DELETE FROM stats_top_questions',
+    "INSERT INTO stats_counters (name, value) SELECT 'users', COUNT(*) FROM users",
+    "INSERT INTO stats_counters (name, value) SELECT 'queries', COUNT(*) FROM query_log",
+    "INSERT INTO stats_counters (name, value) SELECT 'messages', COUNT(*) FROM conversations",
+    '''INSERT INTO stats_queries_hourly (hour, queries)
+        SELECT substr(timestamp, 1, 13), COUNT(*) FROM query_log GROUP BY 1''',
+    '''INSERT INTO stats_chats_daily (day, chat_id, messages)
+        SELECT substr(timestamp, 1, 10), chat_id, COUNT(*) FROM conversations GROUP BY 1, 2''',
+    '''INSERT INTO stats_daily (day, queries, messages, active_chats)
+        SELECT day, SUM(queries), SUM(messages), SUM(active_chats) FROM (
+            SELECT substr(timestamp, 1, 10) AS day, COUNT(*) AS queries, 0 AS messages, 0 AS active_chats
+                FROM query_log GROUP BY 1
+            UNION ALL
+            SELECT day, 0, SUM(messages), COUNT(*) FROM stats_chats_daily GROUP BY day
+        ) GROUP BY day''',
+    '''INSERT INTO stats_top_questions (question_key, question, hits, last_at)
+        SELECT lower(trim(question)), MAX(trim(question)), COUNT(*), MAX(timestamp)
+        FROM query_log GROUP BY lower(trim(question))''',
+]
+
+# stats_chats llegó después que el resto: se rellena aparte para las bases que ya
+# tenían los demás rollups instalados
+CHATS_BACKFILL = [
+    'DELETE FROM stats_chats',
+    '''INSERT INTO stats_chats (chat_id, messages, last_at, last_id, last_message)
+        SELECT g.chat_id, g.messages, m.timestamp, m.id, m.message_text
+        FROM (SELECT chat_id, COUNT(*) AS messages,
+                     (SELECT id FROM conversations last WHERE last.chat_id = c.chat_id
+                      ORDER BY last.timestamp DESC, last.id DESC LIMIT 1) AS last_id
+              FROM conversations c GROUP BY chat_id) g
+        JOIN conversations m ON m.id = g.last_id''',
+]
+
+_installed = set()
+_install_lock = threading.Lock()
+
+
+def install(db=None):
+    """
+    Crea tablas, índices y triggers de estadísticas (idempotente). La primera vez
+    que se instalan en una base existente, rellena los rollups desde los logs.
+    Devuelve False si aún no existen las tablas de logs (init_db sin ejecutar).
+    """
+    db = db or get_db()
+    if db.path in _installed:
+        return True
+    with _install_lock:
+        if db.path in _installed:
+            return True
+        with db.transaction() as conn:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not {'users', 'query_log', 'conversations'} <= existing:
+                return False
+            triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+            for statement in SCHEMA:
+                conn.execute(statement)
+            if 'trg_stats_query_log_insert' not in triggers:
+                for statement in BACKFILL:
+                    conn.execute(statement)
+            if 'trg_stats_chats_insert' not in triggers:
+                for statement in CHATS_BACKFILL:
+                    conn.execute(statement)
+        _installed.add(db.path)
+        return True
+
+
+EMPTY_STATS = {
+    'total_users': 0, 'total_queries': 0, 'total_messages': 0, 'queries_today': 0,
+    'queries_last_24h': 0, 'messages_today': 0, 'active_chats_today': 0,
+}
+
+
+def dashboard_stats(recent_limit=10, top_limit=10, days=14):
+    """Todo lo que muestra el panel de administración, leído de los rollups."""
+    db = get_db()
+    if not install(db):
+        print("ADVERTENCIA: Las tablas de logs aún no existen. Se mostrarán datos en cero.")
+        return {'stats': dict(EMPTY_STATS), 'daily': [], 'top_questions': [], 'recent_queries': []}
+    now = datetime.now(timezone.utc)
+    today = now.strftime('%Y-%m-%d')
+    last_hour_keys = [(now - timedelta(hours=h)).strftime('%Y-%m-%d %H') for h in range(24)]
+
+    counters = {row['name']: row['value'] for row in db.query_all('SELECT name, value FROM stats_counters')}
+    today_row = db.query_one('SELECT queries, messages, active_chats FROM stats_daily WHERE day = ?', (today,))
+    queries_24h = db.query_one(
+        f"SELECT COALESCE(SUM(queries), 0) FROM stats_queries_hourly WHERE hour IN ({','.join('?' * 24)})",
+        last_hour_keys,
+    )[0]
+    since = (now - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    daily = db.query_all(
+        'SELECT day, queries, messages, active_chats FROM stats_daily WHERE day >= ? ORDER BY day', (since,)
+    )
+    top_questions = db.query_all(
+        'SELECT question, hits, last_at FROM stats_top_questions ORDER BY hits DESC LIMIT ?', (top_limit,)
+    )
+    recent_queries = db.query_all(
+        'SELECT q.question, u.username, q.timestamp FROM query_log q JOIN users u ON q.user_id = u.id '
+        'ORDER BY q.timestamp DESC LIMIT ?', (recent_limit,)
+    )
+
+    stats = {
+        'total_users': counters.get('users', 0),
+        'total_queries': counters.get('queries', 0),
+        'total_messages': counters.get('messages', 0),
+        'queries_today': today_row['queries'] if today_row else 0,
+        'queries_last_24h': queries_24h,
+        'messages_today': today_row['messages'] if today_row else 0,
+        'active_chats_today': today_row['active_chats'] if today_row else 0,
+    }
+    return {
+        'stats': stats,
+        'daily': [dict(row) for row in daily],
+        'top_questions': top_questions,
+        'recent_queries': recent_queries,
+    }
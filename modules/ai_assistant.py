@@ -1,98 +1,101 @@
-import os
-import requests
-import json
 import logging
+import threading
 from typing import Optional
-import re
+from config import Config
+from modules.provider_router import ChatProvider, CircuitBreaker, ProviderRouter
+from modules.legal_matcher import LegalTopicMatcher, load_terms
+
+# --- ROUTER DE PROVEEDORES (compartido por el proceso) ---
+# Sesiones HTTP, circuit breakers y métricas de latencia viven aquí, no en cada
+# LegalAIAssistant, para que se reutilicen entre peticiones.
+_router = None
+_router_lock = threading.Lock()
+
+def _breaker():
+    return CircuitBreaker(failure_threshold=Config.PROVIDER_BREAKER_FAILURES, reset_timeout=Config.PROVIDER_BREAKER_RESET)
+
+def build_provider_router():
+    groq = ChatProvider(
+        'groq', Config.GROQ_BASE_URL, Config.GROQ_API_KEY, Config.GROQ_MODEL,
+        timeout=Config.PROVIDER_TIMEOUT, pool_size=Config.PROVIDER_POOL_SIZE, breaker=_breaker(),
+        extra_payload={"temperature": 0.7, "max_tokens": 2000},
+    )
+    openrouter = ChatProvider(
+        'openrouter', Config.OPENROUTER_BASE_URL, Config.OPENROUTER_API_KEY, Config.OPENROUTER_MODEL,
+        timeout=Config.PROVIDER_TIMEOUT, pool_size=Config.PROVIDER_POOL_SIZE, breaker=_breaker(),
+        extra_payload={"temperature": 0.7},
+    )
+    return ProviderRouter(
+        [groq, openrouter],
+        hedging=Config.PROVIDER_HEDGING,
+        default_hedge_delay=Config.PROVIDER_HEDGE_DEFAULT_DELAY,
+        concurrency=Config.PROVIDER_CONCURRENCY,
+    )
+
+def get_provider_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = build_provider_router()
+        return _router
+
+def build_topic_matcher(encoder=None):
+    """Filtro de temática jurídica con los términos de Config.LEGAL_TERMS_FILE (o los de serie)."""
+    terms = load_terms(Config.LEGAL_TERMS_FILE) if Config.LEGAL_TERMS_FILE else None
+    return LegalTopicMatcher(terms=terms, encoder=encoder, threshold=Config.LEGAL_EMBEDDING_THRESHOLD)
+
+_topic_matcher = None
+
+def get_topic_matcher():
+    global _topic_matcher
+    if _topic_matcher is None:
+        _topic_matcher = build_topic_matcher()
+    return _topic_matcher
 
 class LegalAIAssistant:
-    def __init__(self):
-        self.groq_api_key = os.getenv('GROQ_API_KEY')
-        self.openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+    def __init__(self, router: Optional[ProviderRouter] = None, encoder=None):
+        self.router = router or get_provider_router()
+        # encoder (opcional): textos -> vectores con un modelo ya cargado, p. ej.
+        # lambda texts: rag_processor.model.encode(texts); activa el respaldo por embeddings
+        self.topic_matcher = build_topic_matcher(encoder) if encoder is not None else get_topic_matcher()
+        self.groq_api_key = Config.GROQ_API_KEY
+        self.openrouter_api_key = Config.OPENROUTER_API_KEY
         
     def get_response(self, prompt: str, user_id: int) -> str:
-        """Obtiene respuesta de la IA"""
+        """Obtiene respuesta de la IA (Groq, con OpenRouter como respaldo)"""
         if not self.is_legal_related(prompt):
             return "⚠️ Solo puedo responder preguntas relacionadas con derecho y asuntos jurídicos."
         
-        response = self.groq_assistant(prompt)
-        if response:
-            return response
-            
-        response = self.openrouter_assistant(prompt)
+        response = self.router.complete(self._get_system_prompt(), prompt)
         if response:
             return response
             
         return "⚠️ Los servicios de IA no están disponibles temporalmente."
     
-    def groq_assistant(self, prompt: str) -> Optional[str]:
-        """Usa Groq API"""
-        if not self.groq_api_key:
+    def _provider(self, name: str) -> Optional[ChatProvider]:
+        return next((p for p in self.router.providers if p.name == name), None)
+
+    def _ask(self, name: str, prompt: str) -> Optional[str]:
+        provider = self._provider(name)
+        if provider is None or not provider.configured or not provider.breaker.allow():
             return None
-            
         try:
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.groq_api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "llama-3.1-8b-instant",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2000
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
-            
+            return provider.call(self._get_system_prompt(), prompt)
         except Exception as e:
-            logging.error(f"Error con Groq API: {e}")
+            logging.error(f"Error con {name}: {e}")
             return None
+
+    def groq_assistant(self, prompt: str) -> Optional[str]:
+        """Usa Groq API"""
+        return self._ask('groq', prompt)
     
     def openrouter_assistant(self, prompt: str) -> Optional[str]:
         """Usa OpenRouter como alternativa"""
-        if not self.openrouter_api_key:
-            return None
-            
-        try:
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "google/gemma-7b-it:free",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content']
-            
-        except Exception as e:
-            logging.error(f"Error con OpenRouter: {e}")
-            return None
+        return self._ask('openrouter', prompt)
+
+    def provider_stats(self) -> list:
+        """Latencias (histograma y percentiles), errores y estado del circuito de cada proveedor."""
+        return self.router.stats()
     
     def _get_system_prompt(self) -> str:
         return """Eres un abogado junior que trabaja en un bufete de abogados. 
@@ -105,32 +108,4 @@ Siempre recomienda consultar con abogados senior para casos complejos.
 """
     
     def is_legal_related(self, prompt: str) -> bool:
-        prompt_lower = prompt.lower()
-        legal_terms = [
-            'derecho', 'ley', 'legal', 'jurídico', 'abogado', 'proceso', 'juicio', 
-            'demanda', 'contrato', 'testamento', 'herencia', 'penal', 'civil', 
-            'mercantil', 'laboral', 'fiscal', 'notario', 'documento', 'escritura',
-            'poder', 'arrendamiento', 'compraventa', 'sociedad', 'empresa', 'patente',
-            'marca', 'propiedad intelectual', 'familia', 'divorcio', 'hipoteca',
-            'despido', 'contrato laboral', 'delito', 'prisión', 'detención', 'prueba',
-            'testigo', 'mediación', 'arbitraje', 'responsabilidad civil', 'daños',
-            'indemnización', 'competencia', 'protección de datos', 'usufructo'
-        ]
-        
-        for term in legal_terms:
-            if term in prompt_lower:
-                return True
-                
-        patterns = [
-            r'(cómo|como)\s+(demandar|reclamar).*',
-            r'(qué|que)\s+(debo|debería).*(hacer|proceder)',
-            r'(necesito|quiero)\s+(hacer|redactar).*(contrato|testamento|poder)',
-            r'(cuánto|cuanto)\s+(tiempo|dura|tarda).*(proceso|juicio|demanda)',
-            r'(qué|que)\s+(derechos|obligaciones).*(tengo|tiene)',
-        ]
-        
-        for pattern in patterns:
-            if re.search(pattern, prompt_lower):
-                return True
-                
-        return False
\ No newline at end of file
+        return self.topic_matcher(prompt)
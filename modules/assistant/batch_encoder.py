@@ -0,0 +1,64 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchEncoder:
+    """
+    Agrupa en un solo encode() las consultas que llegan a la vez.
+
+    Cada llamador deja su texto en una cola y espera su Future. Un hilo de fondo
+    toma la primera consulta pendiente, sigue recogiendo durante `max_wait_ms` (o
+    hasta `max_batch`) y las codifica juntas: con el modelo en CPU, un lote de 16
+    cuesta poco más que uno de 1. Sin concurrencia, la espera añadida es como
+    mucho max_wait_ms.
+    """
+
+    def __init__(self, encode_fn, max_batch=32, max_wait_ms=5.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats = {'requests': 0, 'batches': 0}
+        self._thread = threading.Thread(target=self._run, name='batch-encoder', daemon=True)
+        self._thread.start()
+
+    def encode(self, text, timeout=None):
+        """Devuelve el embedding (float32) de un texto. Bloquea hasta que su lote esté listo."""
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Lo que ya está en cola se toma sin esperar; después, hasta el plazo
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype='float32')
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._stats['requests'] += len(batch)
+            self._stats['batches'] += 1
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        batches = self._stats['batches']
+        return dict(self._stats, avg_batch=self._stats['requests'] / batches if batches else 0.0)
@@ -0,0 +1,59 @@
+import threading
+
+
+class ChainRegistry:
+    """
+    Registro de cadenas RAG compartido por todo el proceso.
+
+    Cada cadena (LLM + retriever + RetrievalQA) se construye UNA sola vez por
+    combinación (proveedor, modelo) y se reutiliza en todos los mensajes, de modo
+    que el cliente HTTP del LLM y sus conexiones se aprovechan entre peticiones.
+    Si Config.AI_PROVIDER cambia en caliente, la siguiente petición usa una clave
+    distinta y se construye (una vez) la cadena del nuevo proveedor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chains = {}
+        self.builds = 0
+        self.reuses = 0
+
+    def get(self, provider, model, builder):
+        """Devuelve la cadena para (provider, model), construyéndola con builder() si no existe."""
+        key = (provider, model)
+        chain = self._chains.get(key)
+        if chain is not None:
+            with self._lock:
+                self.reuses += 1
+            return chain
+
+        with self._lock:
+            # Otro hilo pudo construirla mientras esperábamos el lock.
+            chain = self._chains.get(key)
+            if chain is not None:
+                self.reuses += 1
+                return chain
+            chain = builder()
+            self._chains[key] = chain
+            self.builds += 1
+            print(f"-> [ChainRegistry] Cadena RAG construida para proveedor='{provider}', modelo='{model}'.")
+            return chain
+
+    def invalidate(self, provider=None, model=None):
+        """Descarta cadenas para forzar su reconstrucción (todas si no se indica clave)."""
+        with self._lock:
+            if provider is None:
+                self._chains.clear()
+            else:
+                self._chains = {
+                    key: chain for key, chain in self._chains.items()
+                    if not (key[0] == provider and (model is None or key[1] == model))
+                }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'builds': self.builds,
+                'reuses': self.reuses,
+                'cached_chains': [f"{p}:{m}" for p, m in self._chains],
+            }
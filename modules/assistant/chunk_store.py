@@ -0,0 +1,105 @@
+import os
+import json
+import mmap
+
+import numpy as np
+
+
+def read_faiss_index_mmap(path):
+    """
+    Abre un índice FAISS mapeado en memoria (solo lectura): los workers de gunicorn
+    comparten las páginas de la caché del sistema en vez de tener una copia cada uno.
+    Si el tipo de índice no admite mmap, se carga de forma normal.
+    """
+    import faiss
+    flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+class ChunkStore:
+    """
+    Almacén binario, de solo lectura, para los textos de los fragmentos.
+
+    Cuatro archivos con el mismo prefijo:
+      <prefix>.bin             todos los textos en UTF-8, uno detrás de otro
+      <prefix>.offsets.npy     int64 (N + 1): el fragmento i ocupa [offsets[i], offsets[i+1])
+      <prefix>.source_ids.npy  int32 (N): índice de la fuente de cada fragmento
+      <prefix>.sources.json    nombres de fuente (internados, cada uno una sola vez)
+
+    Todo se abre con mmap, así que varios procesos comparten las mismas páginas de
+    la caché del sistema y un texto solo se decodifica cuando se pide.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.offsets = np.load(prefix + ".offsets.npy", mmap_mode='r')
+        self.source_ids = np.load(prefix + ".source_ids.npy", mmap_mode='r')
+        with open(prefix + ".sources.json", 'r', encoding='utf-8') as f:
+            self.sources = json.load(f)
+
+        self._file = open(prefix + ".bin", 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap no admite archivos vacíos
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        if len(self.offsets) != len(self.source_ids) + 1 or int(self.offsets[-1]) != size:
+            raise ValueError(f"ChunkStore '{prefix}' inconsistente (offsets/fuentes/blob no coinciden).")
+
+    def __len__(self):
+        return len(self.source_ids)
+
+    def text(self, i):
+        return self._blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode('utf-8')
+
+    def source(self, i):
+        return self.sources[int(self.source_ids[i])]
+
+    def get(self, i):
+        return self.text(i), self.source(i)
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+    @staticmethod
+    def exists(prefix):
+        return all(os.path.exists(prefix + ext) for ext in
+                   (".bin", ".offsets.npy", ".source_ids.npy", ".sources.json"))
+
+    @staticmethod
+    def write(prefix, items):
+        """
+        Escribe (texto, fuente) en orden. Cada archivo se escribe a un temporal y se
+        renombra, de modo que los procesos que ya tienen abierto (mmap) el almacén
+        anterior siguen leyendo su versión sin corromperse.
+        """
+        source_index = {}
+        sources = []
+        offsets = [0]
+        source_ids = []
+        tmp = prefix + ".tmp"
+        with open(tmp + ".bin", 'wb') as blob:
+            for text, source in items:
+                data = text.encode('utf-8')
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+                if source not in source_index:
+                    source_index[source] = len(sources)
+                    sources.append(source)
+                source_ids.append(source_index[source])
+
+        with open(tmp + ".offsets.npy", 'wb') as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+        with open(tmp + ".source_ids.npy", 'wb') as f:
+            np.save(f, np.asarray(source_ids, dtype=np.int32))
+        with open(tmp + ".sources.json", 'w', encoding='utf-8') as f:
+            json.dump(sources, f, ensure_ascii=False)
+
+        # El blob se renombra el último: el lector valida que offsets y blob coincidan
+        for ext in (".offsets.npy", ".source_ids.npy", ".sources.json", ".bin"):
+            os.replace(tmp + ext, prefix + ext)
+        return len(source_ids)
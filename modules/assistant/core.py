@@ -1,55 +1,28 @@
-import os
 import traceback
 from config import Config
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from .chain_registry import ChainRegistry
+from .semantic_cache import SemanticCache
+from .embeddings import get_embedding_model
+from .knowledge_base import KnowledgeBase, index_fingerprint
 
-# --- 1. CONFIGURACIÓN E INICIALIZACIÓN ---
-# Se ejecuta una sola vez al iniciar la aplicación para optimizar el rendimiento.
+# --- 1. CONFIGURACIÓN E INICIALIZACIÓN (PEREZOSA) ---
+# Importar este módulo no carga nada ni hace llamadas de red: la base de
+# conocimiento se carga en la primera petición (o con warm_up()) y se valida
+# contra los metadatos que el indexador guarda junto al índice.
 
 INDEX_PATH = "faiss_index_maestra"
-vector_store = None
-embedding_model = None
-
-try:
-    # Usamos embeddings de Google para consistencia con el modelo de generación.
-    embedding_model = GoogleGenerativeAIEmbeddings(
-        model="models/text-embedding-004",
-        google_api_key=Config.GOOGLE_API_KEY
-    )
-    print("-> ✅ Modelo de embeddings 'text-embedding-004' cargado.")
+RETRIEVAL_K = 3  # Fragmentos más relevantes que se pasan al prompt
 
-    if os.path.exists(INDEX_PATH):
-        vector_store = FAISS.load_local(
-            INDEX_PATH,
-            embedding_model,
-            allow_dangerous_deserialization=True  # Necesario para cargar el índice local
-        )
+# Usamos embeddings de Google para consistencia con el modelo de generación,
+# con lotes, reintentos y caché en disco (las preguntas repetidas no se re-embeben).
+knowledge_base = KnowledgeBase(INDEX_PATH, get_embedding_model, Config.EMBEDDING_MODEL, use_mmap=Config.KB_MMAP)
 
-        # --- VALIDACIÓN DE DIMENSIONES (LA SOLUCIÓN AL ERROR) ---
-        # Verificamos que el índice cargado y el modelo de embedding actual "hablen el mismo idioma".
-        index_dimension = vector_store.index.d
-        model_dimension = len(embedding_model.embed_query("test query"))
-
-        if index_dimension != model_dimension:
-            print("\n" + "---" * 20)
-            print(f"-> ❌ ERROR CRÍTICO DE INCOMPATIBILIDAD DE MODELOS:")
-            print(f"-> La base de datos ('{INDEX_PATH}') fue creada con un modelo de {index_dimension} dimensiones.")
-            print(f"-> Tu código actual intenta usar un modelo ('text-embedding-004') de {model_dimension} dimensiones.")
-            print("-> SOLUCIÓN: Borra la carpeta 'faiss_index_maestra' y vuelve a generarla con tu script de ingesta de datos.")
-            print("---" * 20 + "\n")
-            vector_store = None  # Invalidamos el vector_store para detener la ejecución segura.
-        else:
-            print(f"-> ✅ Base de Conocimiento ('{INDEX_PATH}') cargada y validada (Dimensiones: {index_dimension}).")
-
-    else:
-        print(f"-> ⚠️ ADVERTENCIA: Base de Conocimiento no encontrada en '{INDEX_PATH}'. El bot no podrá responder preguntas sobre productos.")
-
-except Exception as e:
-    print(f"-> ❌ ERROR CRÍTICO al cargar la Base de Conocimiento: {e}")
-    traceback.print_exc()
+def warm_up():
+    """Carga la base de conocimiento por adelantado (opcional, ver Config.KB_EAGER_LOAD)."""
+    return knowledge_base.warm_up()
 
 # --- 2. PROMPT DE SISTEMA MEJORADO: EL CEREBRO DE SALESMIND ---
 # Este prompt define la personalidad, las reglas y las capacidades del asistente.
@@ -89,46 +62,159 @@ SALESMIND_PROMPT = PromptTemplate(
     input_variables=["context", "question"]
 )
 
-# --- 3. LÓGICA PRINCIPAL DE GENERACIÓN DE RESPUESTA (RAG) ---
+# --- 3. REGISTRO DE CADENAS RAG ---
+# El LLM, el retriever y la cadena RetrievalQA se construyen una sola vez por
+# (proveedor, modelo) y se reutilizan en todos los mensajes del proceso.
+
+chain_registry = ChainRegistry()
+# El retriever de cada cadena apunta al índice cargado: si se recarga, se reconstruyen.
+knowledge_base.on_reload.append(chain_registry.invalidate)
+
+def _current_model(provider: str) -> str:
+    if provider == 'google':
+        return Config.GOOGLE_CHAT_MODEL
+    return Config.OLLAMA_MODEL
+
+def _build_llm(provider: str, model: str):
+    """Crea el cliente del LLM para el proveedor configurado."""
+    if provider == 'google':
+        return ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=Config.GOOGLE_API_KEY,
+            temperature=0.2, # Un poco más bajo para respuestas más predecibles y basadas en hechos
+            convert_system_message_to_human=True # Buena práctica para algunos modelos de chat
+        )
+    if provider == 'ollama':
+        from langchain_community.llms import Ollama
+        return Ollama(model=model, temperature=0.2)
+    raise ValueError(f"Proveedor de IA no soportado: '{provider}'")
+
+def _build_chain(provider: str, model: str):
+    vector_store = knowledge_base.get()
+    # Creación de la cadena de "Pregunta y Respuesta sobre Recuperación de Información"
+    return RetrievalQA.from_chain_type(
+        llm=_build_llm(provider, model),
+        chain_type="stuff",  # "stuff" es ideal para pasar los documentos recuperados directamente al prompt
+        retriever=vector_store.as_retriever(search_kwargs={"k": RETRIEVAL_K}), # Recupera los fragmentos más relevantes
+        return_source_documents=False, # No necesitamos ver los documentos fuente en la respuesta final
+        chain_type_kwargs={"prompt": SALESMIND_PROMPT}
+    )
+
+def get_qa_chain():
+    """Devuelve la cadena RAG del proveedor activo, construyéndola solo la primera vez."""
+    provider = Config.AI_PROVIDER
+    model = _current_model(provider)
+    return chain_registry.get(provider, model, lambda: _build_chain(provider, model))
+
+# --- 4. CACHÉ SEMÁNTICA DE RESPUESTAS ---
+# Preguntas iguales o casi iguales (por similitud del embedding) reutilizan la
+# respuesta ya generada. Se invalida sola cuando se regenera el índice.
+
+semantic_cache = None
+if Config.SEMANTIC_CACHE_ENABLED:
+    semantic_cache = SemanticCache(
+        threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=Config.SEMANTIC_CACHE_TTL,
+        db_path=Config.SEMANTIC_CACHE_DB_PATH or None,
+        version_fn=lambda: index_fingerprint(INDEX_PATH),
+    )
+
+NO_ANSWER_MESSAGE = 'No estoy seguro de cómo responder a eso. ¿Podrías reformular tu pregunta? Un asesor puede ayudarte.'
+KB_UNAVAILABLE_MESSAGE = "Lo siento, nuestra base de conocimiento no está disponible en este momento. Por favor, verifica la consola para más detalles o contacta a un administrador."
+ERROR_MESSAGE = "Ocurrió un error al procesar tu solicitud. Por favor, contacta a un asesor humano para obtener ayuda."
+
+# --- 5. LÓGICA PRINCIPAL DE GENERACIÓN DE RESPUESTA (RAG) ---
 
 def get_commercial_response(question: str) -> str:
     """
     Función central del RAG. Toma la pregunta del usuario y retorna la respuesta generada por la IA.
     """
+    vector_store = knowledge_base.get()
     if not vector_store:
-        return "Lo siento, nuestra base de conocimiento no está disponible en este momento. Por favor, verifica la consola para más detalles o contacta a un administrador."
+        return KB_UNAVAILABLE_MESSAGE
 
     try:
-        # Se selecciona el LLM basado en la configuración (Google por defecto)
-        if Config.AI_PROVIDER == 'google':
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-latest",
-                google_api_key=Config.GOOGLE_API_KEY,
-                temperature=0.2, # Un poco más bajo para respuestas más predecibles y basadas en hechos
-                convert_system_message_to_human=True # Buena práctica para algunos modelos de chat
-            )
-        # Aquí iría la lógica para otros proveedores como Ollama si se mantiene
-        # else:
-        #     llm = Ollama(...)
-
-        # Creación de la cadena de "Pregunta y Respuesta sobre Recuperación de Información"
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",  # "stuff" es ideal para pasar los documentos recuperados directamente al prompt
-            retriever=vector_store.as_retriever(search_kwargs={"k": 3}), # Recupera los 3 fragmentos más relevantes
-            return_source_documents=False, # No necesitamos ver los documentos fuente en la respuesta final
-            chain_type_kwargs={"prompt": SALESMIND_PROMPT}
-        )
+        # El embedding de la pregunta se calcula una sola vez: sirve para la caché y para la búsqueda
+        question_embedding = knowledge_base.embedding_model.embed_query(question)
+
+        if semantic_cache is not None:
+            cached = semantic_cache.get(question, question_embedding)
+            if cached is not None:
+                return cached
+
+        docs = vector_store.similarity_search_by_vector(question_embedding, k=RETRIEVAL_K)
 
-        # Invocación de la cadena con la pregunta del usuario
-        result = qa_chain.invoke({"query": question})
+        # La cadena (y su cliente HTTP) se reutiliza entre peticiones; le pasamos
+        # los documentos ya recuperados para no volver a calcular el embedding.
+        qa_chain = get_qa_chain()
+        result = qa_chain.combine_documents_chain.invoke({"input_documents": docs, "question": question})
 
         # Extraemos el texto de la respuesta del diccionario resultante
-        return result.get('result', 'No estoy seguro de cómo responder a eso. ¿Podrías reformular tu pregunta? Un asesor puede ayudarte.')
+        answer = result.get('output_text') or NO_ANSWER_MESSAGE
+        if semantic_cache is not None and answer != NO_ANSWER_MESSAGE:
+            semantic_cache.put(question, question_embedding, answer)
+        return answer
 
     except Exception as e:
         print("--- ❌ ERROR DETALLADO EN LA CADENA RAG ---")
         traceback.print_exc()
         print("--- FIN DEL ERROR ---")
-        return "Ocurrió un error al procesar tu solicitud. Por favor, contacta a un asesor humano para obtener ayuda."
+        return ERROR_MESSAGE
 
+
+# --- 6. RESPUESTA EN STREAMING ---
+
+def _chunk_text(chunk) -> str:
+    # Los modelos de chat (Gemini) emiten AIMessageChunk; los LLM de texto (Ollama), str
+    return getattr(chunk, 'content', chunk) or ''
+
+def stream_commercial_response(question: str, llm=None):
+    """
+    Igual que get_commercial_response, pero genera la respuesta a trozos según la
+    emite el LLM. La recuperación y la caché semántica son las mismas; una
+    respuesta cacheada sale en un solo trozo. `llm` permite inyectar otro modelo
+    con método stream(prompt) (p. ej. FakeStreamingLLM en pruebas).
+    """
+    vector_store = knowledge_base.get()
+    if not vector_store:
+        yield KB_UNAVAILABLE_MESSAGE
+        return
+
+    parts = []
+    try:
+        question_embedding = knowledge_base.embedding_model.embed_query(question)
+
+        if semantic_cache is not None:
+            cached = semantic_cache.get(question, question_embedding)
+            if cached is not None:
+                yield cached
+                return
+
+        docs = vector_store.similarity_search_by_vector(question_embedding, k=RETRIEVAL_K)
+
+        # Mismo prompt que arma la cadena "stuff", pero llamando al LLM en modo stream
+        if llm is None:
+            llm = get_qa_chain().combine_documents_chain.llm_chain.llm
+        prompt = SALESMIND_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            question=question,
+        )
+        for chunk in llm.stream(prompt):
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield text
+
+        answer = ''.join(parts)
+        if not answer.strip():
+            yield NO_ANSWER_MESSAGE
+        elif semantic_cache is not None:
+            semantic_cache.put(question, question_embedding, answer)
+
+    except Exception:
+        print("--- ❌ ERROR DETALLADO EN LA CADENA RAG (STREAMING) ---")
+        traceback.print_exc()
+        print("--- FIN DEL ERROR ---")
+        # Si el usuario ya está viendo parte de la respuesta, se la completamos con el aviso
+        yield ("\n\n" + ERROR_MESSAGE) if parts else ERROR_MESSAGE
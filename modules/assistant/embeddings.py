@@ -0,0 +1,260 @@
+import os
+import time
+import random
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Errores que vale la pena reintentar: límite de tasa, fallos del servidor, timeouts y red.
+# Un 400 (entrada mal formada) o un 401/403 (clave inválida) fallarían igual al reintentar.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ('resourceexhausted', 'toomanyrequests', 'serviceunavailable', 'internalservererror',
+                         'deadlineexceeded', 'gatewaytimeout', 'badgateway', 'timeout', 'connection')
+
+
+class TokenBucket:
+    """Limitador de tasa: `rate` peticiones por segundo con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_s = (tokens - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings direccionada por contenido en SQLite:
+    sha256(modelo + tipo + texto) -> vector float32.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)',
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Envoltorio de un cliente de embeddings de LangChain con:
+      - lotes de tamaño explícito y varios lotes en vuelo a la vez,
+      - limitación de tasa (token bucket) y reintentos con backoff exponencial,
+      - caché por contenido, para no pagar dos veces por el mismo texto.
+    Se usa igual que cualquier Embeddings (FAISS.from_documents, load_local...).
+
+    Solo se reintentan los errores transitorios (ver RETRYABLE_STATUS); el resto
+    se propaga al momento. Los documentos van a la caché en disco; las consultas
+    (texto libre de los usuarios) a una LRU en memoria de `query_cache_size`.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, cache: EmbeddingCache = None,
+                 batch_size: int = 100, max_concurrency: int = 4, requests_per_minute: float = 1500,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0,
+                 query_cache_size: int = 1024):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._query_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'cache_hits': 0, 'cache_misses': 0, 'api_calls': 0, 'retries': 0, 'rate_limited': 0,
+                       'permanent_errors': 0}
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{kind}\x00{text}".encode('utf-8')).hexdigest()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        text = f"{type(error).__name__} {error}".lower()
+        return '429' in text or 'resourceexhausted' in text or 'quota' in text or 'rate limit' in text
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        # Código HTTP: google.api_core (e.code), requests/httpx (e.status_code o e.response.status_code)
+        for status in (getattr(error, 'code', None), getattr(error, 'status_code', None),
+                       getattr(getattr(error, 'response', None), 'status_code', None)):
+            if isinstance(status, int) and not isinstance(status, bool):
+                return status in RETRYABLE_STATUS or status >= 500
+        if cls._is_rate_limit(error):
+            return True
+        name = type(error).__name__.lower()
+        return any(part in name for part in RETRYABLE_ERROR_NAMES)
+
+    def _call_with_retry(self, fn, *args):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            self._count('api_calls')
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not self._is_retryable(e):
+                    self._count('permanent_errors')
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                if self._is_rate_limit(e):
+                    self._count('rate_limited')
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay = random.uniform(delay / 2, delay)  # jitter para no sincronizar reintentos
+                logger.warning(f"Error de embeddings ({e}); reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+                self._count('retries')
+                time.sleep(delay)
+                attempt += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key('document', t) for t in texts]
+        found = self.cache.get_many(list(set(keys))) if self.cache else {}
+
+        # Textos únicos que aún no tienen vector
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self._count('cache_hits', len(texts) - len(missing))
+        self._count('cache_misses', len(missing))
+
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+
+            def run_batch(batch_keys):
+                vectors = self._call_with_retry(self.inner.embed_documents, [missing[k] for k in batch_keys])
+                computed = dict(zip(batch_keys, vectors))
+                # Se guarda cada lote al terminar: si la ejecución falla más adelante, no se repite
+                if self.cache:
+                    self.cache.put_many(computed)
+                return computed
+
+            if len(batches) == 1 or self.max_concurrency == 1:
+                for batch_keys in batches:
+                    found.update(run_batch(batch_keys))
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                    for computed in pool.map(run_batch, batches):
+                        found.update(computed)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key('query', text)
+        with self._query_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return list(cached)
+        self._count('cache_misses')
+        vector = list(self._call_with_retry(self.inner.embed_query, text))
+        if self.query_cache_size > 0:
+            with self._query_lock:
+                self._query_cache[key] = vector
+                self._query_cache.move_to_end(key)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return list(vector)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_embedding_model() -> BatchedEmbeddings:
+    """Construye el cliente de embeddings de Google con lotes, límites de tasa y caché compartida."""
+    global _shared_cache
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    cache = None
+    if Config.EMBEDDING_CACHE_PATH:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = EmbeddingCache(Config.EMBEDDING_CACHE_PATH)
+            cache = _shared_cache
+
+    inner = GoogleGenerativeAIEmbeddings(
+        model=Config.EMBEDDING_MODEL,
+        google_api_key=Config.GOOGLE_API_KEY
+    )
+    return BatchedEmbeddings(
+        inner,
+        model_name=Config.EMBEDDING_MODEL,
+        cache=cache,
+        batch_size=Config.EMBEDDING_BATCH_SIZE,
+        max_concurrency=Config.EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute=Config.EMBEDDING_REQUESTS_PER_MINUTE,
+        max_retries=Config.EMBEDDING_MAX_RETRIES,
+        query_cache_size=Config.EMBEDDING_QUERY_CACHE_SIZE,
+    )
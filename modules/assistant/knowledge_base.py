@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import threading
+import traceback
+from collections.abc import Mapping
+from datetime import datetime
+
+from .chunk_store import ChunkStore, read_faiss_index_mmap
+
+# Archivo lateral que el indexador escribe junto al índice: permite validar
+# modelo y dimensiones sin hacer ninguna llamada de red al cargar.
+METADATA_FILE = "index_meta.json"
+# Formato compartible entre procesos: vectores FAISS abiertos con mmap + textos en un ChunkStore
+SHARED_VECTORS_FILE = "vectors.faiss"
+SHARED_CHUNKS_PREFIX = "chunks"
+
+
+def write_index_metadata(index_path, embedding_model, dimension, num_vectors):
+    meta = {
+        "embedding_model": embedding_model,
+        "dimension": int(dimension),
+        "num_vectors": int(num_vectors),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+    }
+    tmp_path = os.path.join(index_path, METADATA_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, os.path.join(index_path, METADATA_FILE))
+    return meta
+
+
+def export_shared_index(vector_store, index_path):
+    """
+    Exporta un vector store de LangChain al formato compartido (mmap). El pickle de
+    LangChain se conserva como copia maestra editable para el modo incremental.
+    """
+    import faiss
+    ids = vector_store.index_to_docstore_id
+
+    def items():
+        for i in range(vector_store.index.ntotal):
+            doc = vector_store.docstore.search(ids[i])
+            yield doc.page_content, doc.metadata.get("source", "")
+
+    count = ChunkStore.write(os.path.join(index_path, SHARED_CHUNKS_PREFIX), items())
+    tmp_path = os.path.join(index_path, SHARED_VECTORS_FILE + ".tmp")
+    faiss.write_index(vector_store.index, tmp_path)
+    os.replace(tmp_path, os.path.join(index_path, SHARED_VECTORS_FILE))
+    return count
+
+
+class _PositionalIds(Mapping):
+    """index_to_docstore_id sin diccionario: la posición en el índice ES el id del fragmento."""
+
+    def __init__(self, size):
+        self._size = size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._size:
+            raise KeyError(i)
+        return int(i)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(range(self._size))
+
+
+def _chunk_docstore(chunk_store):
+    from langchain_community.docstore.base import Docstore
+    from langchain.schema.document import Document
+
+    class ChunkDocstore(Docstore):
+        """Docstore de solo lectura respaldado por el ChunkStore mapeado en memoria."""
+
+        def search(self, search):
+            try:
+                text, source = chunk_store.get(int(search))
+            except (IndexError, ValueError):
+                return f"ID {search} not found."
+            return Document(page_content=text, metadata={"source": source})
+
+    return ChunkDocstore()
+
+
+def read_index_metadata(index_path):
+    path = os.path.join(index_path, METADATA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def index_fingerprint(index_path):
+    """
+    Huella barata (tamaño + fecha) de los archivos del índice en disco. Un archivo
+    que desaparece entre el listado y el stat (el indexador lo está reemplazando) se
+    omite; cualquier otro error de E/S se propaga como OSError.
+    """
+    if not os.path.isdir(index_path):
+        return None
+    parts = []
+    for name in sorted(os.listdir(index_path)):
+        try:
+            st = os.stat(os.path.join(index_path, name))
+        except FileNotFoundError:
+            continue
+        parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+class KnowledgeBase:
+    """
+    Carga perezosa de la base de conocimiento FAISS.
+
+    Nada se carga al importar: el primer get() (o warm_up()) construye el cliente
+    de embeddings y lee el índice, validando modelo y dimensiones contra el archivo
+    de metadatos. Si el índice se regenera en disco, el siguiente get() lo recarga
+    y avisa a los suscriptores (on_reload) para que descarten lo que dependía de él.
+    """
+
+    def __init__(self, index_path, embedding_factory, model_name, check_interval=5.0, use_mmap=True):
+        self.index_path = index_path
+        self.use_mmap = use_mmap
+        self.embedding_factory = embedding_factory
+        self.model_name = model_name
+        self.check_interval = check_interval
+        self.on_reload = []
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._embedding_model = None
+        self._vector_store = None
+        self._fingerprint = None
+        self._loaded = False
+        self._last_check = 0.0
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    self._embedding_model = self.embedding_factory()
+        return self._embedding_model
+
+    def _load(self):
+        """Carga el índice (se llama con el lock tomado). Devuelve el vector store o None."""
+        from langchain_community.vectorstores import FAISS
+
+        if not os.path.exists(self.index_path):
+            print(f"-> ⚠️ ADVERTENCIA: Base de Conocimiento no encontrada en '{self.index_path}'. El bot no podrá responder preguntas sobre productos.")
+            return None
+
+        meta = read_index_metadata(self.index_path)
+        if meta is not None and meta.get("embedding_model") != self.model_name:
+            self._incompatible(f"fue creada con el modelo '{meta.get('embedding_model')}'",
+                               f"intenta usar el modelo '{self.model_name}'")
+            return None
+
+        if self._embedding_model is None:
+            self._embedding_model = self.embedding_factory()
+
+        vectors_path = os.path.join(self.index_path, SHARED_VECTORS_FILE)
+        chunks_prefix = os.path.join(self.index_path, SHARED_CHUNKS_PREFIX)
+        if self.use_mmap and os.path.exists(vectors_path) and ChunkStore.exists(chunks_prefix):
+            # Vectores y textos compartidos entre workers vía la caché de páginas del sistema
+            index = read_faiss_index_mmap(vectors_path)
+            chunk_store = ChunkStore(chunks_prefix)
+            if len(chunk_store) != index.ntotal:
+                raise ValueError(f"{SHARED_VECTORS_FILE} tiene {index.ntotal} vectores pero el ChunkStore {len(chunk_store)} textos.")
+            vector_store = FAISS(
+                embedding_function=self._embedding_model,
+                index=index,
+                docstore=_chunk_docstore(chunk_store),
+                index_to_docstore_id=_PositionalIds(index.ntotal),
+            )
+        else:
+            vector_store = FAISS.load_local(
+                self.index_path,
+                self._embedding_model,
+                allow_dangerous_deserialization=True  # Necesario para cargar el índice local
+            )
+
+        index_dimension = vector_store.index.d
+        if meta is None:
+            print(f"-> ⚠️ ADVERTENCIA: '{self.index_path}' no tiene {METADATA_FILE}; no se pudo validar el modelo. Regenera el índice con indexer.py.")
+        elif meta.get("dimension") != index_dimension:
+            self._incompatible(f"tiene vectores de {index_dimension} dimensiones",
+                               f"espera {meta.get('dimension')} dimensiones según {METADATA_FILE}")
+            return None
+
+        print(f"-> ✅ Base de Conocimiento ('{self.index_path}') cargada y validada (Dimensiones: {index_dimension}, Vectores: {vector_store.index.ntotal}).")
+        return vector_store
+
+    def _incompatible(self, index_side, code_side):
+        print("\n" + "---" * 20)
+        print("-> ❌ ERROR CRÍTICO DE INCOMPATIBILIDAD DE MODELOS:")
+        print(f"-> La base de datos ('{self.index_path}') {index_side}.")
+        print(f"-> Tu código actual {code_side}.")
+        print(f"-> SOLUCIÓN: Borra la carpeta '{self.index_path}' y vuelve a generarla con tu script de ingesta de datos.")
+        print("---" * 20 + "\n")
+
+    def get(self):
+        """Devuelve el vector store, cargándolo (o recargándolo si cambió en disco) cuando haga falta."""
+        now = time.monotonic()
+        if self._loaded and now - self._last_check < self.check_interval:
+            return self._vector_store
+
+        reloaded = False
+        with self._lock:
+            self._last_check = now
+            try:
+                fingerprint = index_fingerprint(self.index_path)
+            except OSError as e:
+                # El índice se está reescribiendo: seguimos con el actual y miramos en el siguiente intervalo
+                print(f"-> ⚠️ ADVERTENCIA: No se pudo revisar la Base de Conocimiento en disco: {e}")
+                fingerprint = self._fingerprint if self._loaded else None
+            if not self._loaded or fingerprint != self._fingerprint:
+                try:
+                    vector_store = self._load()
+                    reloaded = self._loaded
+                    self._vector_store = vector_store
+                    self.last_error = None
+                    # La huella solo se guarda tras una carga correcta: si falla, se reintenta en la siguiente revisión
+                    self._fingerprint = fingerprint
+                except Exception as e:
+                    # Si el índice se está escribiendo, conservamos el anterior y reintentamos luego
+                    print(f"-> ❌ ERROR CRÍTICO al cargar la Base de Conocimiento: {e}")
+                    traceback.print_exc()
+                    self.last_error = str(e)
+                self._loaded = True
+            vector_store = self._vector_store
+
+        if reloaded:
+            for callback in self.on_reload:
+                callback()
+        return vector_store
+
+    def warm_up(self):
+        """Carga eager opcional (p. ej. desde create_app o el hook post_fork de gunicorn)."""
+        start = time.monotonic()
+        vector_store = self.get()
+        print(f"-> [KnowledgeBase] Calentamiento completado en {time.monotonic() - start:.2f}s.")
+        return vector_store is not None
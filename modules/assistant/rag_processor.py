@@ -3,13 +3,62 @@ from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 import os
+import json
 import re
+import sys
+import threading
+import time
 import unicodedata
+from itertools import chain
+from .chunk_store import ChunkStore, read_faiss_index_mmap
+from .segment_log import SegmentLog
+from .batch_encoder import BatchEncoder
+from modules.vector_index import VectorIndex
+from config import Config
 
 # ---- CONFIGURACIÓN ----
 STORE_PATH = 'instance/vector_store'
 EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
 VECTOR_DIMENSION = 768
+# Artículos por tanda de encode: marca la granularidad del progreso de ingesta
+ENCODE_CHUNK = 256
+
+def split_legacy_metadata(line):
+    """'Fuente: archivo::texto' (formato de documents_meta.txt) -> (texto, archivo)."""
+    source, sep, text = line.partition('::')
+    if not sep:
+        return line, ''
+    return text, source[len('Fuente: '):] if source.startswith('Fuente: ') else source
+
+# Encabezado de artículo en los PDF (p. ej. "ARTICULO 12. ..."); las líneas de cabecera/pie se descartan
+ARTICLE_PATTERN = re.compile(r'^ARTICULO (\d+)\.?>?(.*)')
+PDF_SKIP_PREFIXES = ("CODIGO CIVIL COLOMBIANO", "Página")
+
+def split_articles(lines, pattern=ARTICLE_PATTERN, skip_prefixes=PDF_SKIP_PREFIXES):
+    """
+    Agrupa líneas de texto en artículos. Cada línea que casa con `pattern` abre
+    uno nuevo (grupo 1: número, grupo 2: resto de la línea) y las siguientes se
+    le añaden hasta el próximo encabezado. Devuelve {número: "Artículo N: texto"}
+    en orden de aparición.
+    """
+    articles = {}
+    current_article_text = ""
+    current_article_num = None
+
+    for line in lines:
+        line = line.strip()
+        match = pattern.match(line)
+        if match:
+            if current_article_num is not None:
+                articles[current_article_num] = f"Artículo {current_article_num}: {current_article_text.strip()}"
+            current_article_num = match.group(1)
+            current_article_text = match.group(2).strip()
+        elif current_article_num is not None:
+            if not line.startswith(skip_prefixes):
+                current_article_text += " " + line
+    if current_article_num is not None and current_article_num not in articles:
+        articles[current_article_num] = f"Artículo {current_article_num}: {current_article_text.strip()}"
+    return articles
 
 def normalize_text(text):
     text = text.lower()
@@ -25,92 +74,304 @@ class RAGProcessor:
         print("-> [RAG __init__] Cargando modelo de embeddings... (Esto puede tardar la primera vez)")
         self.model = SentenceTransformer(EMBEDDING_MODEL)
         print("-> [RAG __init__] Modelo cargado exitosamente.")
+        # Las consultas concurrentes se codifican juntas (ver BatchEncoder); 0 ms = una a una
+        self.query_encoder = None
+        if Config.RAG_QUERY_MAX_WAIT_MS > 0:
+            self.query_encoder = BatchEncoder(
+                lambda texts: self.model.encode(texts, batch_size=len(texts), convert_to_tensor=False),
+                max_batch=Config.RAG_QUERY_MAX_BATCH,
+                max_wait_ms=Config.RAG_QUERY_MAX_WAIT_MS,
+            )
         
         self.index_path = os.path.join(STORE_PATH, 'documents.index')
-        self.metadata_path = os.path.join(STORE_PATH, 'documents_meta.txt')
-        
-        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+        # Textos y fuentes de los artículos: blob UTF-8 + offsets, mapeado en memoria (ver ChunkStore)
+        self.chunks_prefix = os.path.join(STORE_PATH, 'documents_chunks')
+        self.legacy_metadata_path = os.path.join(STORE_PATH, 'documents_meta.txt')
+        # Serializa las escrituras (WAL, índice, checkpoint) de ingestas concurrentes
+        self._write_lock = threading.Lock()
+        # Cada subida se añade como segmento al WAL; el índice principal solo se reescribe en los checkpoints.
+        # El WAL lo comparten todos los procesos que usan STORE_PATH (workers, crawl del corpus):
+        # sus escrituras van con self.wal.locked() tomado y después de _sync()
+        self.wal = SegmentLog(os.path.join(STORE_PATH, 'wal'))
+        # Posiciones de artículos sustituidos por una versión más reciente (ver retire())
+        self.retired_path = os.path.join(STORE_PATH, 'retired.json')
+        self._last_refresh = time.monotonic()
+        self._refresh_stamp = None
+        with self.wal.locked():
+            self._load()
+
+    def _load(self):
+        """Carga índice principal y ChunkStore desde disco y reaplica WAL y retirados (con el WAL bloqueado)."""
+        self.wal.reload_checkpoint()
+        self.retired = set()
+        if os.path.exists(self.index_path) and (ChunkStore.exists(self.chunks_prefix) or os.path.exists(self.legacy_metadata_path)):
             try:
-                self.index = faiss.read_index(self.index_path)
-                with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                    self.metadata = f.read().splitlines()
+                # Abierto con mmap: los workers comparten el índice en la caché de páginas
+                self.index = VectorIndex.from_config(
+                    VECTOR_DIMENSION, index=read_faiss_index_mmap(self.index_path), shared=True
+                )
+                if not ChunkStore.exists(self.chunks_prefix):
+                    self._migrate_legacy_metadata()
+                self.chunk_store = ChunkStore(self.chunks_prefix)
+                if len(self.chunk_store) < self.index.ntotal:
+                    raise ValueError(f"{self.index.ntotal} vectores pero solo {len(self.chunk_store)} artículos en el ChunkStore.")
+                # Un checkpoint interrumpido puede dejar artículos de más: se ignoran y el WAL los repone
+                self.stored_count = self.index.ntotal
+                self.pending_chunks = []
                 print(f"-> [RAG __init__] Índice vectorial existente con {self.index.ntotal} artículos cargado.")
             except Exception as e:
                 print(f"-> [RAG __init__] ERROR: No se pudo cargar el índice existente. Se creará uno nuevo. Error: {e}")
                 self._initialize_empty_index()
+                # Las posiciones retiradas se referían al índice descartado
+                if os.path.exists(self.retired_path):
+                    os.remove(self.retired_path)
         else:
             print("-> [RAG __init__] No se encontró un índice existente.")
             self._initialize_empty_index()
+        self._replay_wal()
+        self._load_retired()
 
     def _initialize_empty_index(self):
-        self.index = faiss.IndexFlatL2(VECTOR_DIMENSION) 
-        self.metadata = []
+        # Tipo de índice configurable (Flat, IVF, HNSW, IVF-PQ); ver Config.VECTOR_INDEX_TYPE
+        self.index = VectorIndex.from_config(VECTOR_DIMENSION)
+        self.chunk_store = None
+        self.stored_count = 0
+        # (texto, fuente) de los artículos aún no compactados en el ChunkStore
+        self.pending_chunks = []
         print("-> [RAG _initialize] Se ha inicializado un nuevo índice vectorial vacío.")
 
+    def _migrate_legacy_metadata(self):
+        """Convierte documents_meta.txt (una línea por artículo) al ChunkStore binario."""
+        with open(self.legacy_metadata_path, 'r', encoding='utf-8') as f:
+            count = ChunkStore.write(self.chunks_prefix, (split_legacy_metadata(line) for line in f.read().splitlines()))
+        os.replace(self.legacy_metadata_path, self.legacy_metadata_path + '.bak')
+        print(f"-> [RAG __init__] {count} artículos migrados de documents_meta.txt al ChunkStore.")
+
+    def _chunk(self, idx):
+        """(texto, fuente) del artículo en la posición idx del índice. Solo decodifica ese artículo."""
+        if idx < self.stored_count:
+            return self.chunk_store.get(idx)
+        return self.pending_chunks[idx - self.stored_count]
+
+    def _iter_chunks(self):
+        stored = (self.chunk_store.get(i) for i in range(self.stored_count))
+        return chain(stored, self.pending_chunks)
+
+    def _append_chunks(self, vectors, records):
+        self.index.add(vectors)
+        for record in records:
+            text, source = split_legacy_metadata(record) if isinstance(record, str) else record
+            self.pending_chunks.append((text, sys.intern(source)))
+
+    def _replay_wal(self):
+        """Reaplica los segmentos escritos después del último checkpoint."""
+        # Vectores del checkpoint + los de cada segmento: si el índice en disco ya
+        # los contiene (se cayó entre el rename del índice y el de checkpoint.json), se saltan.
+        covered = self.wal.checkpoint["ntotal"]
+        # Último segmento incorporado en memoria (ver _sync)
+        self.applied_seq = self.wal.checkpoint["seq"]
+        self.pending_segments = 0
+        replayed = 0
+        for seq, vectors, records in self.wal.pending():
+            covered += len(vectors)
+            self.pending_segments += 1
+            self.applied_seq = seq
+            if covered <= self.index.ntotal:
+                continue
+            self._append_chunks(vectors, records)
+            replayed += len(vectors)
+        if replayed:
+            print(f"-> [RAG __init__] WAL: {replayed} artículos recuperados de {self.pending_segments} segmentos.")
+
+    def _sync(self):
+        """
+        Incorpora lo que otros procesos hayan escrito en el almacén desde la última
+        vez (con el WAL bloqueado). Así las posiciones que asigna add_articles() y
+        lo que escribe checkpoint() parten de la misma vista en todos los procesos.
+        Si otro proceso hizo un checkpoint más allá de lo visto aquí, los segmentos
+        intermedios ya no existen y se recarga todo desde disco.
+        """
+        checkpoint = self.wal.reload_checkpoint()
+        if checkpoint["seq"] > self.applied_seq:
+            print("-> [RAG sync] Otro proceso actualizó el índice principal; recargando.")
+            self._load()
+            return
+        synced = 0
+        for seq, vectors, records in self.wal.pending(after=self.applied_seq):
+            self._append_chunks(vectors, records)
+            self.applied_seq = seq
+            synced += len(vectors)
+        self.pending_segments = sum(1 for seq in self.wal.segments() if seq > checkpoint["seq"])
+        if synced:
+            print(f"-> [RAG sync] {synced} artículos añadidos por otros procesos.")
+        self._load_retired()
+
+    def refresh(self):
+        """
+        Para las búsquedas: como mucho cada Config.RAG_SYNC_INTERVAL segundos, y solo
+        si el WAL o los retirados cambiaron en disco, incorpora lo que hayan escrito
+        otros procesos. Si hay una escritura en curso no espera: lo intenta la próxima vez.
+        """
+        now = time.monotonic()
+        if now - self._last_refresh < Config.RAG_SYNC_INTERVAL:
+            return
+        self._last_refresh = now
+        stamp = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+                      for path in (self.wal.directory, self.retired_path))
+        if stamp == self._refresh_stamp or not self._write_lock.acquire(blocking=False):
+            return
+        try:
+            with self.wal.locked(blocking=False) as acquired:
+                if acquired:
+                    self._sync()
+                    self._refresh_stamp = stamp
+        finally:
+            self._write_lock.release()
+
+    def checkpoint(self):
+        """Compacta en el índice principal los segmentos pendientes de todos los procesos."""
+        with self._write_lock, self.wal.locked():
+            self._sync()
+            self._checkpoint()
+
+    def _checkpoint(self):
+        """
+        Compacta los segmentos pendientes en el índice principal. Índice y ChunkStore
+        se escriben a temporal y se renombran; checkpoint.json se confirma el último.
+        Se llama con ambos bloqueos tomados y justo después de _sync().
+        """
+        if not self.pending_segments:
+            return
+        seq = self.applied_seq
+        # Escritura a temporal + rename: los procesos que tienen mapeado el índice
+        # anterior siguen leyendo su versión intacta.
+        faiss.write_index(self.index.index, self.index_path + '.tmp')
+        # Artículos antes que el índice: al cargar, los sobrantes se ignoran
+        ChunkStore.write(self.chunks_prefix, self._iter_chunks())
+        os.replace(self.index_path + '.tmp', self.index_path)
+        self.wal.commit_checkpoint(seq, self.index.ntotal)
+        # El ChunkStore anterior se libera cuando ya no lo referencia ninguna búsqueda en curso
+        self.chunk_store = ChunkStore(self.chunks_prefix)
+        self.stored_count = self.index.ntotal
+        self.pending_chunks = []
+        print(f"-> [RAG checkpoint] {self.pending_segments} segmentos compactados en el índice principal ({self.index.ntotal} artículos).")
+        self.pending_segments = 0
+
     def _extract_articles_from_pdf(self, pdf_path):
         print(f"-> [RAG extract] Extrayendo artículos del PDF: {os.path.basename(pdf_path)}")
         doc = fitz.open(pdf_path)
-        articles = {}
-        current_article_text = ""
-        current_article_num = None
-        article_pattern = re.compile(r'^ARTICULO (\d+)\.?>?(.*)')
-
-        for page_num, page in enumerate(doc):
-            text = page.get_text("text")
-            for line in text.split('\n'):
-                line = line.strip()
-                match = article_pattern.match(line)
-                if match:
-                    if current_article_num is not None:
-                        articles[current_article_num] = f"Artículo {current_article_num}: {current_article_text.strip()}"
-                    current_article_num = match.group(1)
-                    current_article_text = match.group(2).strip()
-                elif current_article_num is not None:
-                    if not line.startswith("CODIGO CIVIL COLOMBIANO") and not line.startswith("Página"):
-                        current_article_text += " " + line
-        if current_article_num is not None and current_article_num not in articles:
-            articles[current_article_num] = f"Artículo {current_article_num}: {current_article_text.strip()}"
+        lines = (line for page in doc for line in page.get_text("text").split('\n'))
+        articles = split_articles(lines)
 
         print(f"-> [RAG extract] Se extrajeron {len(articles)} artículos del documento.")
         return list(articles.values())
 
-    def process_document(self, file_path, original_filename):
+    def process_document(self, file_path, original_filename, progress=None):
+        """
+        Extrae, vectoriza y persiste los artículos del PDF. Devuelve cuántos se añadieron.
+        `progress(etapa, n)` se llama con 'extracted', 'embedded' y 'persisted'.
+        """
+        report = progress or (lambda stage, count: None)
         print(f"-> [RAG process] Procesando el documento: {original_filename}")
         
         chunks = self._extract_articles_from_pdf(file_path)
+        report('extracted', len(chunks))
         if not chunks:
             print("-> [RAG process] ADVERTENCIA: No se encontraron artículos en el documento. Proceso abortado.")
-            return
+            return 0
 
-        normalized_chunks = [normalize_text(chunk) for chunk in chunks]
+        source = sys.intern(original_filename)
+        positions = self.add_articles([(chunk, source) for chunk in chunks], progress=progress)
+        print(f"-> [RAG process] Documento '{original_filename}' procesado. Total de artículos en memoria: {self.index.ntotal}")
+        return len(positions)
+
+    def add_articles(self, articles, progress=None):
+        """
+        Vectoriza y persiste una tanda de artículos [(texto, fuente)] como un solo
+        segmento del WAL. Devuelve las posiciones que ocupan en el índice (range),
+        que son las que luego acepta retire().
+        """
+        report = progress or (lambda stage, count: None)
+        if not articles:
+            return range(0)
+        normalized_chunks = [normalize_text(text) for text, _ in articles]
         
         print(f"-> [RAG process] Creando embeddings para {len(normalized_chunks)} artículos...")
-        embeddings = self.model.encode(
-            normalized_chunks, 
-            batch_size=32,
-            show_progress_bar=True,
-            convert_to_tensor=False
-        )
+        embeddings = []
+        for start in range(0, len(normalized_chunks), ENCODE_CHUNK):
+            embeddings.extend(self.model.encode(
+                normalized_chunks[start:start + ENCODE_CHUNK], 
+                batch_size=32,
+                show_progress_bar=False,
+                convert_to_tensor=False
+            ))
+            report('embedded', len(embeddings))
         
-        self.index.add(np.array(embeddings).astype('float32'))
-        for chunk in chunks:
-            clean_chunk = re.sub(r'\s+', ' ', chunk).strip()
-            self.metadata.append(f"Fuente: {original_filename}::{clean_chunk}")
+        vectors = np.array(embeddings).astype('float32')
+        records = [(text.strip(), sys.intern(source)) for text, source in articles]
         
-        faiss.write_index(self.index, self.index_path)
-        with open(self.metadata_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.metadata))
-        print(f"-> [RAG process] Documento '{original_filename}' procesado. Total de artículos en memoria: {self.index.ntotal}")
+        with self._write_lock, self.wal.locked():
+            # Antes de asignar seq y posiciones se incorpora lo que hayan añadido otros procesos
+            self._sync()
+            # Primero el segmento en disco (coste proporcional a la subida); luego la memoria.
+            # Los textos antes que los vectores: una búsqueda concurrente nunca ve un vector sin texto.
+            # VectorIndex hace una copia privada si el índice estaba mapeado (mmap)
+            self.applied_seq = self.wal.append(vectors, records)
+            first = self.index.ntotal
+            self.pending_chunks.extend(records)
+            self.index.add(vectors)
+            self.pending_segments += 1
+            report('persisted', len(records))
+            
+            if self.pending_segments >= Config.RAG_CHECKPOINT_SEGMENTS:
+                self._checkpoint()
+        return range(first, first + len(records))
+
+    def _load_retired(self):
+        """Vuelve a ocultar los artículos retirados, también los que retiraron otros procesos."""
+        try:
+            with open(self.retired_path, 'r', encoding='utf-8') as f:
+                retired = set(json.load(f))
+        except (OSError, ValueError):
+            retired = set()
+        new = {pos for pos in retired if pos < self.index.ntotal} - self.retired
+        if new:
+            self.retired |= new
+            self.index.remove_ids(new)
+
+    def retire(self, positions):
+        """
+        Deja de devolver en las búsquedas los artículos de esas posiciones (p. ej.
+        versiones antiguas de un artículo que cambió). El vector sigue en el índice;
+        la lista de retirados se guarda aparte y se reaplica al cargar.
+        """
+        positions = {int(pos) for pos in positions}
+        with self._write_lock, self.wal.locked():
+            # _sync() incorpora los retirados por otros procesos: se reescribe la unión, no solo los de aquí
+            self._sync()
+            positions -= self.retired
+            if not positions:
+                return
+            self.retired |= positions
+            tmp = self.retired_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(sorted(self.retired), f)
+            os.replace(tmp, self.retired_path)
+            self.index.remove_ids(positions)
 
     def get_relevant_context(self, query, top_k=3):
         print(f"\n-> [RAG get_context] Buscando contexto para la pregunta: '{query}'")
+        self.refresh()
         if self.index.ntotal == 0:
             print("-> [RAG get_context] ERROR CRÍTICO: El índice de vectores está vacío. Imposible buscar.")
             return ""
         
         print(f"-> [RAG get_context] Tamaño del índice: {self.index.ntotal} vectores.")
         normalized_query = normalize_text(query)
-        query_embedding = self.model.encode([normalized_query])
+        if self.query_encoder is not None:
+            query_embedding = self.query_encoder.encode(normalized_query).reshape(1, -1)
+        else:
+            query_embedding = self.model.encode([normalized_query])
         
         distances, indices = self.index.search(np.array(query_embedding).astype('float32'), top_k)
         
@@ -120,7 +381,8 @@ class RAGProcessor:
         context = []
         for i, idx in enumerate(indices[0]):
             if idx != -1:
-                context.append(self.metadata[idx])
+                text, source = self._chunk(int(idx))
+                context.append(f"Fuente: {source}::{text}")
 
         if not context:
             print("-> [RAG get_context] ADVERTENCIA: La búsqueda no arrojó ningún resultado relevante.")
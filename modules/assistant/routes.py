@@ -348,9 +348,13 @@
 
 # /modules/assistant/routes.py
 
-from flask import Blueprint, request
+from flask import Blueprint, request, abort
 from twilio.twiml.messaging_response import MessagingResponse
 import os
+import threading
+
+from config import Config
+from modules.webhook_dispatcher import WebhookDispatcher, TwilioOutboundClient
 
 # ¡Importante! Importamos el "cerebro" desde core.py
 # Asegúrate de que tu archivo core.py tiene una función
@@ -359,15 +363,58 @@ from .core import get_commercial_response
 
 assistant_bp = Blueprint('assistant', __name__)
 
+# --- MODO ASÍNCRONO (WEBHOOK_ASYNC=true) ---
+# El despachador se crea en la primera petición (después del fork de gunicorn).
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_whatsapp_dispatcher(outbound=None):
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            if outbound is None:
+                outbound = TwilioOutboundClient(
+                    Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN, Config.TWILIO_WHATSAPP_FROM
+                )
+            _dispatcher = WebhookDispatcher(
+                'whatsapp',
+                handler=lambda chat_id, text: get_commercial_response(text),
+                outbound=outbound,
+                workers=Config.WEBHOOK_WORKERS,
+                max_queue_size=Config.WEBHOOK_QUEUE_SIZE,
+            )
+        return _dispatcher
+
+def _is_valid_twilio_request() -> bool:
+    if not Config.TWILIO_VALIDATE_SIGNATURE:
+        return True
+    from twilio.request_validator import RequestValidator
+    validator = RequestValidator(Config.TWILIO_AUTH_TOKEN)
+    return validator.validate(request.url, request.form, request.headers.get('X-Twilio-Signature', ''))
+
 @assistant_bp.route("/whatsapp_webhook", methods=['POST'])
 def whatsapp_webhook():
     """
     Este webhook recibe los mensajes que nos reenvía Twilio desde WhatsApp.
     """
+    if not _is_valid_twilio_request():
+        abort(403)
+
     # 1. Obtenemos el mensaje del usuario del formato de Twilio
     incoming_msg = request.values.get('Body', '')
     print(f"Mensaje recibido de WhatsApp: '{incoming_msg}'")
 
+    if Config.WEBHOOK_ASYNC:
+        sender = request.values.get('From')
+        if not sender or not incoming_msg.strip():
+            return "Petición inválida", 400
+        status = get_whatsapp_dispatcher().submit(sender, incoming_msg, request.values.get('MessageSid'))
+        if status == 'rejected':
+            # Contrapresión: Twilio podrá reintentar más tarde
+            return "Servidor ocupado", 503
+        # ACK inmediato con TwiML vacío; la respuesta sale por la API de Twilio
+        return str(MessagingResponse())
+
     # 2. Llamamos a nuestro "cerebro" de IA
     # Esta función debe existir en tu archivo core.py
     ai_response = get_commercial_response(incoming_msg)
@@ -379,4 +426,4 @@ def whatsapp_webhook():
     message.body(ai_response)
 
     # 4. Devolvemos la respuesta a Twilio
-    return str(resp)
\ No newline at end of file
+    return str(resp)
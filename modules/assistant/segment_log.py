@@ -0,0 +1,145 @@
+import os
+import json
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo proceso por almacén)
+    fcntl = None
+
+CHECKPOINT_FILE = "checkpoint.json"
+LOCK_FILE = "wal.lock"
+
+
+def _fsync_write(path, write):
+    with open(path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class SegmentLog:
+    """
+    Registro de solo-escritura (write-ahead) para el índice de RAGProcessor.
+
+    Cada subida escribe un segmento con su número de secuencia:
+      <seq>.jsonl   los registros de metadatos, uno por línea (JSON)
+      <seq>.npy     los vectores float32 del segmento
+    Ambos se escriben a temporal, con fsync, y se renombran; el .npy va el último
+    y actúa como marca de confirmación: un segmento sin .npy no existe.
+
+    checkpoint.json guarda hasta qué segmento (seq) y cuántos vectores (ntotal)
+    incluye el índice principal. Al arrancar se reaplican los segmentos posteriores.
+
+    Varios procesos (workers de gunicorn, el crawl del corpus) comparten el
+    directorio: toda escritura va dentro de `with log.locked():` (flock sobre
+    wal.lock) y append() toma el siguiente seq de lo que hay en disco, no de
+    memoria, así que dos procesos nunca escriben el mismo segmento.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        with self.locked():
+            self._discard_incomplete()
+            self.checkpoint = self._read_checkpoint()
+
+    @contextmanager
+    def locked(self, blocking=True):
+        """
+        Bloqueo exclusivo del registro entre procesos. Cada llamada abre su propio
+        descriptor, así que también excluye a otros hilos (no es reentrante).
+        Devuelve si se obtuvo: con blocking=False puede ser False.
+        """
+        with open(os.path.join(self.directory, LOCK_FILE), 'a+b') as f:
+            acquired = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    acquired = False
+            try:
+                yield acquired
+            finally:
+                if acquired and fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _path(self, seq, ext):
+        return os.path.join(self.directory, f"{seq:08d}{ext}")
+
+    def _discard_incomplete(self):
+        """Borra temporales y segmentos a medio escribir (p. ej. tras una caída)."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+            elif name.endswith(".jsonl") and not os.path.exists(path[:-len(".jsonl")] + ".npy"):
+                os.remove(path)
+
+    def reload_checkpoint(self):
+        """Vuelve a leer checkpoint.json (otro proceso puede haberlo confirmado)."""
+        self.checkpoint = self._read_checkpoint()
+        return self.checkpoint
+
+    def last_seq(self):
+        """Último seq usado según el disco (checkpoint o segmento más reciente)."""
+        return max([self._read_checkpoint()["seq"]] + self.segments())
+
+    def _read_checkpoint(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return {"seq": 0, "ntotal": 0}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def segments(self):
+        """Números de secuencia de los segmentos confirmados, en orden."""
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                      if name.endswith(".npy") and name[:-4].isdigit())
+
+    def append(self, vectors, records):
+        """
+        Escribe un segmento nuevo y devuelve su seq. Coste proporcional a la subida,
+        no al corpus. Hay que llamarlo con locked() tomado.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if len(vectors) != len(records):
+            raise ValueError(f"El segmento tiene {len(vectors)} vectores y {len(records)} registros.")
+        seq = self.last_seq() + 1
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        _fsync_write(self._path(seq, ".jsonl.tmp"), lambda f: f.write(lines.encode('utf-8')))
+        _fsync_write(self._path(seq, ".npy.tmp"), lambda f: np.save(f, vectors))
+        os.replace(self._path(seq, ".jsonl.tmp"), self._path(seq, ".jsonl"))
+        os.replace(self._path(seq, ".npy.tmp"), self._path(seq, ".npy"))
+        return seq
+
+    def read(self, seq):
+        vectors = np.load(self._path(seq, ".npy"))
+        with open(self._path(seq, ".jsonl"), 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return vectors, records
+
+    def pending(self, after=None):
+        """Segmentos posteriores a `after` (por defecto, al último checkpoint): (seq, vectores, registros)."""
+        after = self.checkpoint["seq"] if after is None else after
+        for seq in self.segments():
+            if seq > after:
+                vectors, records = self.read(seq)
+                yield seq, vectors, records
+
+    def commit_checkpoint(self, seq, ntotal):
+        """
+        Registra (con rename atómico) que el índice principal incluye hasta `seq` y
+        borra esos segmentos. Hay que llamarlo con locked() tomado.
+        """
+        checkpoint = {"seq": int(seq), "ntotal": int(ntotal)}
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        _fsync_write(path + ".tmp", lambda f: f.write(json.dumps(checkpoint).encode('utf-8')))
+        os.replace(path + ".tmp", path)
+        self.checkpoint = checkpoint
+        for old in self.segments():
+            if old <= seq:
+                os.remove(self._path(old, ".npy"))
+                os.remove(self._path(old, ".jsonl"))
@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+class _Entry:
+    __slots__ = ('slot', 'question', 'answer', 'created_at')
+
+    def __init__(self, slot, question, answer, created_at):
+        self.slot = slot
+        self.question = question
+        self.answer = answer
+        self.created_at = created_at
+
+
+class SemanticCache:
+    """
+    Caché de respuestas indexada por el embedding de la pregunta.
+
+    Evolución de la caché exacta de AIAssistant (core_old.py): además de la
+    coincidencia exacta, una pregunta "parecida" (similitud coseno >= threshold)
+    reutiliza la respuesta ya generada. Acotada por LRU + TTL y, opcionalmente,
+    persistida en SQLite para sobrevivir reinicios.
+
+    version_fn devuelve una huella de la base de conocimiento; si cambia (el índice
+    FAISS se regeneró) la caché se vacía automáticamente. Como en KnowledgeBase,
+    la huella se consulta como mucho cada `check_interval` segundos, no en cada get/put.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=1000, ttl_seconds=86400,
+                 db_path=None, version_fn=None, check_interval=5.0):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn or (lambda: None)
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # pregunta normalizada -> _Entry (orden LRU)
+        self._slot_keys = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._vectors = None            # matriz (max_entries, dim) de vectores unitarios
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        self._version = self.version_fn()
+        self._last_check = time.monotonic()
+        self._stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0,
+                       'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS semantic_cache (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    index_version TEXT
+                )
+            ''')
+            self._db.commit()
+            self._load_from_db()
+
+    # --- Persistencia ---
+
+    def _load_from_db(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute(
+            'DELETE FROM semantic_cache WHERE created_at < ? OR index_version IS NOT ?',
+            (cutoff, self._version)
+        )
+        self._db.commit()
+        # Las más recientes; se insertan de la más antigua a la más nueva para conservar el orden LRU
+        rows = self._db.execute(
+            'SELECT key, question, answer, embedding, created_at FROM semantic_cache '
+            'ORDER BY created_at DESC LIMIT ?', (self.max_entries,)
+        ).fetchall()
+        for key, question, answer, blob, created_at in reversed(rows):
+            self._insert(key, question, answer, np.frombuffer(blob, dtype=np.float32), created_at)
+        if rows:
+            print(f"-> [SemanticCache] {len(rows)} respuestas restauradas desde SQLite.")
+
+    def _db_execute(self, sql, params=()):
+        if self._db is not None:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    # --- Gestión interna (se llama con el lock tomado) ---
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            self._clear()
+            self._stats['invalidations'] += 1
+            self._db_execute('DELETE FROM semantic_cache')
+            print("-> [SemanticCache] La base de conocimiento cambió; caché invalidada.")
+
+    def _clear(self):
+        self._entries.clear()
+        self._slot_keys = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._valid[:] = False
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._valid[entry.slot] = False
+        self._slot_keys[entry.slot] = None
+        self._free_slots.append(entry.slot)
+        self._db_execute('DELETE FROM semantic_cache WHERE key = ?', (key,))
+
+    def _insert(self, key, question, answer, unit_vector, created_at):
+        if key in self._entries:
+            self._remove(key)
+        if not self._free_slots:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._stats['evictions'] += 1
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, unit_vector.shape[0]), dtype=np.float32)
+        slot = self._free_slots.pop()
+        self._vectors[slot] = unit_vector
+        self._valid[slot] = True
+        self._slot_keys[slot] = key
+        self._entries[key] = _Entry(slot, question, answer, created_at)
+
+    def _is_expired(self, entry) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    # --- API pública ---
+
+    def get(self, question: str, embedding):
+        """Devuelve la respuesta cacheada para la pregunta (o una semánticamente equivalente) o None."""
+        key = _normalize_question(question)
+        with self._lock:
+            self._check_version()
+
+            entry = self._entries.get(key)
+            hit_kind = 'exact_hits'
+            if entry is None and self._entries:
+                sims = self._vectors @ _unit(embedding)
+                sims[~self._valid] = -1.0
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = self._slot_keys[best]
+                    entry = self._entries[key]
+                    hit_kind = 'semantic_hits'
+
+            if entry is not None and self._is_expired(entry):
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats[hit_kind] += 1
+            return entry.answer
+
+    def put(self, question: str, embedding, answer: str):
+        key = _normalize_question(question)
+        unit_vector = _unit(embedding)
+        created_at = time.time()
+        with self._lock:
+            self._check_version()
+            self._insert(key, question, answer, unit_vector, created_at)
+            self._db_execute(
+                'INSERT OR REPLACE INTO semantic_cache '
+                '(key, question, answer, embedding, created_at, index_version) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, question, answer, unit_vector.tobytes(), created_at, self._version)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self._db_execute('DELETE FROM semantic_cache')
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s['size'] = len(self._entries)
+        s['hits'] = s['exact_hits'] + s['semantic_hits']
+        lookups = s['hits'] + s['misses']
+        s['hit_rate'] = s['hits'] / lookups if lookups else 0.0
+        return s
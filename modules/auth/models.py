@@ -1,16 +1,11 @@
 import sqlite3
 import hashlib
-import os
 from flask_login import UserMixin
-from config import Config
+from modules.db import get_db
 
 def get_db_connection():
-    """Establece conexión con la base de datos y se asegura que la carpeta exista."""
-    instance_path = os.path.dirname(Config.DATABASE_PATH)
-    os.makedirs(instance_path, exist_ok=True)
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Conexión compartida del hilo actual (ver modules/db.py). No se cierra."""
+    return get_db().connection()
 
 def init_db():
     """Crea la tabla de usuarios y la tabla de logs si no existen."""
@@ -27,6 +22,8 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         );
     ''')
+    # Paginación por chat sin recorrer la tabla entera (la lista de chats sale de stats_chats)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_conversations_chat_ts ON conversations (chat_id, timestamp, id)')
     # --- FIN DEL BLOQUE ---
 
     # Tabla de Usuarios con el campo 'role'
@@ -52,7 +49,10 @@ def init_db():
     ''')
     
     conn.commit()
-    conn.close()
+
+    # Rollups de estadísticas del panel de administración (triggers + índices)
+    from modules.admin.stats import install
+    install()
     # Mensaje de confirmación que ahora verás
     print("Base de datos de usuarios y logs verificada/creada con éxito.")
 
@@ -73,32 +73,23 @@ class User(UserMixin):
 
     @staticmethod
     def get(user_id):
-        conn = get_db_connection()
-        user_data = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        user_data = get_db().query_one('SELECT * FROM users WHERE id = ?', (user_id,))
         if user_data:
             return User(user_data['id'], user_data['username'], user_data['email'], user_data['role'])
         return None
 
     @staticmethod
     def get_by_username(username):
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
-        return user
+        return get_db().query_one('SELECT * FROM users WHERE username = ?', (username,))
 
     @staticmethod
     def create(username, email, password):
-        conn = get_db_connection()
         try:
-            conn.execute(
+            get_db().write(
                 'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
                 (username, email, hash_password(password))
             )
-            conn.commit()
             return True
         except sqlite3.IntegrityError: # Evita duplicados de username o email
             return False
-        finally:
-            conn.close()
 
@@ -0,0 +1,150 @@
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timezone
+
+from modules.db import get_db
+
+INSERT_SQL = "INSERT INTO conversations (chat_id, sender, message_text, timestamp) VALUES (?, ?, ?, ?)"
+
+# Modos de durabilidad
+SYNC = 'sync'    # cada mensaje se confirma en SQLite antes de responder (comportamiento anterior)
+ASYNC = 'async'  # write-behind: ante una caída se pueden perder como mucho flush_interval segundos de mensajes
+
+
+class ConversationLogger:
+    """
+    Registro de conversaciones con escritura diferida (write-behind).
+
+    log() solo encola el mensaje en memoria; un hilo de fondo los vuelca con
+    executemany en una única transacción cuando se juntan `batch_size` o pasan
+    `flush_interval` segundos desde el primero pendiente. Así la latencia del
+    webhook no incluye ningún commit a disco.
+
+    La hora se toma al encolar (no al volcar) para conservar el orden real. Si la
+    cola se llena, el mensaje se escribe directamente: nunca se descarta. Si un
+    lote falla, se reintenta con espera creciente y, como último recurso, se
+    escribe fila a fila; solo se pierden (y se cuentan en 'dropped') las filas
+    que ni así se pueden guardar.
+    """
+
+    def __init__(self, db=None, mode=ASYNC, batch_size=200, flush_interval=0.5, max_queue_size=10000,
+                 write_retries=3, retry_delay=0.1):
+        if mode not in (SYNC, ASYNC):
+            raise ValueError(f"Modo de durabilidad desconocido: '{mode}'. Opciones: {SYNC}, {ASYNC}")
+        self.db = db or get_db()
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        # Los contadores se actualizan desde el hilo de fondo y desde los que llaman a log()
+        self._stats = {'logged': 0, 'flushes': 0, 'direct_writes': 0, 'errors': 0, 'retries': 0, 'dropped': 0}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        if mode == ASYNC:
+            self._thread = threading.Thread(target=self._run, name='conversation-logger', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def log(self, chat_id, sender, message):
+        row = (chat_id, sender, message, datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+        self._count('logged')
+        if self.mode == ASYNC and not self._stop.is_set():
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                pass
+        self._count('direct_writes')
+        self.db.write(INSERT_SQL, row)
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def _take_batch(self):
+        """Espera al primer mensaje y junta más hasta batch_size o flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            for attempt in range(self.write_retries + 1):
+                try:
+                    self.db.write(INSERT_SQL, batch, many=True)
+                    self._count('flushes')
+                    return
+                except Exception as e:
+                    self._count('errors')
+                    print(f"Error al guardar {len(batch)} mensajes en la base de datos (intento {attempt + 1}): {e}")
+                    if attempt < self.write_retries:
+                        self._count('retries')
+                        time.sleep(self.retry_delay * 2 ** attempt)
+            # Último recurso: fila a fila, para que una fila problemática no arrastre al resto
+            self._write_rows(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_rows(self, batch):
+        dropped = 0
+        for row in batch:
+            try:
+                self.db.write(INSERT_SQL, row)
+            except Exception as e:
+                dropped += 1
+                print(f"-> ❌ Mensaje del chat {row[0]} descartado tras reintentar: {e}")
+        if dropped:
+            self._count('dropped', dropped)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+        # Vaciado final: lo que quede en la cola al parar
+        self._drain()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write_batch(batch)
+
+    def flush(self):
+        """Bloquea hasta que todo lo encolado hasta ahora esté en SQLite."""
+        if self.mode == ASYNC:
+            self._queue.join()
+
+    def shutdown(self, timeout=10):
+        """Vacía la cola y detiene el hilo de fondo (se llama también al salir del proceso)."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        # Mensajes que llegaron a encolarse mientras el hilo terminaba
+        self._drain()
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats, pending=self._queue.qsize())
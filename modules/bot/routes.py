@@ -1,26 +1,39 @@
 # Contenido para: modules/bot/routes.py
 
-from flask import Blueprint, request
+from flask import Blueprint, request, abort
 from config import Config
 import telegram
-import sqlite3 # <-- Importamos sqlite3
 import asyncio
-from modules.assistant.core import get_commercial_response
+import threading
+from modules.assistant.core import get_commercial_response, stream_commercial_response
+from modules.webhook_dispatcher import WebhookDispatcher, TelegramOutboundClient
+from .conversation_logger import ConversationLogger
+from .streaming import TelegramStreamer
 
 bot_bp = Blueprint('bot', __name__)
 bot = telegram.Bot(token=Config.TELEGRAM_TOKEN)
 
-# --- NUEVA FUNCIÓN PARA GUARDAR MENSAJES ---
+# --- REGISTRO DE CONVERSACIONES ---
+# Write-behind: el webhook solo encola; un hilo de fondo escribe por lotes.
+# Se crea en el primer uso (después del fork de gunicorn).
+_conversation_logger = None
+_conversation_logger_lock = threading.Lock()
+
+def get_conversation_logger():
+    global _conversation_logger
+    with _conversation_logger_lock:
+        if _conversation_logger is None:
+            _conversation_logger = ConversationLogger(
+                mode=Config.CONVERSATION_LOG_MODE,
+                batch_size=Config.CONVERSATION_LOG_BATCH_SIZE,
+                flush_interval=Config.CONVERSATION_LOG_FLUSH_INTERVAL,
+                max_queue_size=Config.CONVERSATION_LOG_QUEUE_SIZE,
+            )
+        return _conversation_logger
+
 def log_message(chat_id, sender, message):
     try:
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO conversations (chat_id, sender, message_text) VALUES (?, ?, ?)",
-            (chat_id, sender, message)
-        )
-        conn.commit()
-        conn.close()
+        get_conversation_logger().log(chat_id, sender, message)
     except Exception as e:
         print(f"Error al guardar el mensaje en la base de datos: {e}")
 # --- FIN DE LA NUEVA FUNCIÓN ---
@@ -33,24 +46,82 @@ def run_async(coro):
         asyncio.set_event_loop(loop)
     return loop.run_until_complete(coro)
 
+def answer_and_log(chat_id, user_message):
+    """Registra el mensaje del usuario, genera la respuesta y la registra. Devuelve la respuesta."""
+    log_message(chat_id, 'user', user_message)
+    ai_message = get_commercial_response(user_message)
+    log_message(chat_id, 'bot', ai_message)
+    return ai_message
+
+# --- RESPUESTAS EN STREAMING (TELEGRAM_STREAMING=true) ---
+# El usuario ve la primera frase en cuanto el LLM la genera y el mensaje se va
+# completando con ediciones; en el log solo queda el texto final.
+_stream_outbound = None
+
+def answer_and_stream(chat_id, user_message, outbound=None, llm=None):
+    """Como answer_and_log, pero publica la respuesta mientras se genera. Devuelve None (ya está enviada)."""
+    global _stream_outbound
+    if outbound is None:
+        if _stream_outbound is None:
+            _stream_outbound = TelegramOutboundClient(bot)
+        outbound = _stream_outbound
+    log_message(chat_id, 'user', user_message)
+    streamer = TelegramStreamer(
+        outbound, chat_id,
+        edit_interval=Config.TELEGRAM_STREAM_EDIT_INTERVAL,
+        first_message_chars=Config.TELEGRAM_STREAM_FIRST_MESSAGE_CHARS,
+    )
+    ai_message = streamer.run(stream_commercial_response(user_message, llm=llm))
+    log_message(chat_id, 'bot', ai_message)
+    return None
+
+# --- MODO ASÍNCRONO (WEBHOOK_ASYNC=true) ---
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_telegram_dispatcher(outbound=None):
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            outbound = outbound or TelegramOutboundClient(bot)
+            handler = answer_and_log
+            if Config.TELEGRAM_STREAMING:
+                # El worker envía y edita por su cuenta; al devolver None el dispatcher no reenvía
+                handler = lambda chat_id, text: answer_and_stream(chat_id, text, outbound)
+            _dispatcher = WebhookDispatcher(
+                'telegram',
+                handler=handler,
+                outbound=outbound,
+                workers=Config.WEBHOOK_WORKERS,
+                max_queue_size=Config.WEBHOOK_QUEUE_SIZE,
+            )
+        return _dispatcher
+
 @bot_bp.route('/telegram_webhook', methods=['POST'])
 def telegram_webhook():
+    if Config.TELEGRAM_WEBHOOK_SECRET and \
+            request.headers.get('X-Telegram-Bot-Api-Secret-Token') != Config.TELEGRAM_WEBHOOK_SECRET:
+        abort(403)
+
     update = telegram.Update.de_json(request.get_json(force=True), bot)
 
     if update.message and update.message.text:
         chat_id = update.message.chat.id
         user_message = update.message.text
 
-        # --- AÑADIMOS EL REGISTRO DE MENSAJES ---
-        # 1. Guardamos el mensaje del usuario
-        log_message(chat_id, 'user', user_message)
+        if Config.WEBHOOK_ASYNC:
+            status = get_telegram_dispatcher().submit(chat_id, user_message, update.update_id)
+            if status == 'rejected':
+                # Contrapresión: Telegram reintenta las entregas que no reciben 2xx
+                return "Servidor ocupado", 503
+            return "OK", 200
 
-        # 2. Obtenemos la respuesta de la IA
-        ai_message = get_commercial_response(user_message)
+        if Config.TELEGRAM_STREAMING:
+            answer_and_stream(chat_id, user_message)
+            return "OK", 200
 
-        # 3. Guardamos la respuesta del bot
-        log_message(chat_id, 'bot', ai_message)
-        # --- FIN DEL REGISTRO ---
+        # Guardamos el mensaje, obtenemos la respuesta de la IA y la guardamos también
+        ai_message = answer_and_log(chat_id, user_message)
 
         run_async(bot.send_message(chat_id=chat_id, text=ai_message))
 
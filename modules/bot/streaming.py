@@ -0,0 +1,212 @@
+import re
+import time
+import threading
+from collections import deque
+
+# Telegram rechaza textos de más de 4096 caracteres por mensaje
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Fin de la primera frase: puntuación seguida de espacio (o salto de línea)
+_SENTENCE_END = re.compile(r'[.!?…:;](\s|$)|\n')
+
+
+class StreamingMetrics:
+    """Muestras recientes de tiempo al primer token, al primer mensaje y total (ms)."""
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self._samples = {
+            'ttft_ms': deque(maxlen=max_samples),
+            'first_message_ms': deque(maxlen=max_samples),
+            'total_ms': deque(maxlen=max_samples),
+        }
+        self._counters = {'streams': 0, 'messages': 0, 'edits': 0, 'edit_errors': 0, 'rate_limited': 0}
+
+    def record(self, ttft_ms, first_message_ms, total_ms, messages, edits, edit_errors, rate_limited):
+        with self._lock:
+            for name, value in (('ttft_ms', ttft_ms), ('first_message_ms', first_message_ms), ('total_ms', total_ms)):
+                if value is not None:
+                    self._samples[name].append(value)
+            self._counters['streams'] += 1
+            self._counters['messages'] += messages
+            self._counters['edits'] += edits
+            self._counters['edit_errors'] += edit_errors
+            self._counters['rate_limited'] += rate_limited
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._counters)
+            for name, values in self._samples.items():
+                ordered = sorted(values)
+                prefix = name[:-3]
+                result[f'{prefix}_p50_ms'] = ordered[len(ordered) // 2] if ordered else 0.0
+                result[f'{prefix}_p95_ms'] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+            return result
+
+
+metrics = StreamingMetrics()
+
+
+def streaming_stats():
+    return metrics.stats()
+
+
+def _retry_after_seconds(error):
+    """Segundos que pide esperar un telegram.error.RetryAfter (None si es otro error)."""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is None:
+        return None
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+
+class TelegramStreamer:
+    """
+    Publica en Telegram una respuesta que llega a trozos desde el LLM.
+
+    El primer mensaje sale en cuanto hay una frase completa (o `first_message_chars`
+    caracteres, si el modelo no puntúa); después se va editando ese mensaje, como
+    mucho una vez cada `edit_interval` segundos, para no superar los límites de
+    edición de Telegram (un RetryAfter alarga la pausa lo que pida la API). Al
+    terminar se hace una última edición con el texto completo. Si la respuesta
+    pasa de 4096 caracteres, continúa en un mensaje nuevo.
+
+    `outbound` es cualquier cliente con send(chat_id, text) -> message_id y
+    edit(chat_id, message_id, text) (TelegramOutboundClient, FakeOutboundClient).
+    """
+
+    def __init__(self, outbound, chat_id, edit_interval=1.0, first_message_chars=200,
+                 max_message_length=TELEGRAM_MAX_MESSAGE_LENGTH, clock=time.monotonic, sleep=time.sleep):
+        self.outbound = outbound
+        self.chat_id = chat_id
+        self.edit_interval = edit_interval
+        self.first_message_chars = first_message_chars
+        self.max_message_length = max_message_length
+        self.clock = clock
+        self.sleep = sleep
+
+        self._message_id = None  # mensaje que se está editando
+        self._shown = ''         # texto que muestra ahora ese mensaje
+        self._offset = 0         # dónde empieza, dentro de la respuesta, el texto de ese mensaje
+        self._next_edit_at = 0.0
+        self._started_at = None
+        self.ttft = None
+        self.first_message_at = None
+        self.messages = 0
+        self.edits = 0
+        self.edit_errors = 0
+        self.rate_limited = 0
+
+    def run(self, chunks):
+        """Consume el iterador de trozos, publica la respuesta y devuelve el texto completo."""
+        self._started_at = self.clock()
+        text = ''
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if self.ttft is None:
+                self.ttft = self.clock() - self._started_at
+            text += chunk
+            self._publish(text, final=False)
+        self._publish(text, final=True)
+
+        total = self.clock() - self._started_at
+        metrics.record(
+            ttft_ms=self.ttft * 1000 if self.ttft is not None else None,
+            first_message_ms=self.first_message_at * 1000 if self.first_message_at is not None else None,
+            total_ms=total * 1000,
+            messages=self.messages, edits=self.edits,
+            edit_errors=self.edit_errors, rate_limited=self.rate_limited,
+        )
+        ttft_ms = f"{self.ttft * 1000:.0f} ms" if self.ttft is not None else "-"
+        print(f"-> [Telegram] Respuesta en streaming a {self.chat_id}: TTFT {ttft_ms}, total {total * 1000:.0f} ms, "
+              f"{self.messages} mensaje(s), {self.edits} edición(es).")
+        return text
+
+    def _split_point(self, text):
+        """Corte de página: último espacio antes del límite (o el límite exacto si no hay)."""
+        limit = self._offset + self.max_message_length
+        cut = text.rfind(' ', self._offset + 1, limit)
+        return cut if cut > self._offset else limit
+
+    def _publish(self, text, final):
+        # Páginas llenas: se cierran con su texto definitivo y se sigue en un mensaje nuevo
+        while len(text) - self._offset > self.max_message_length:
+            cut = self._split_point(text)
+            self._show(text[self._offset:cut], force=True)
+            self._message_id, self._shown = None, ''
+            self._offset = cut
+            while self._offset < len(text) and text[self._offset].isspace():
+                self._offset += 1
+
+        pending = text[self._offset:]
+        if not pending.strip():
+            return
+        if self._message_id is None and not final and self.messages == 0 and not self._first_sentence_ready(pending):
+            return
+        self._show(pending, force=final)
+
+    def _first_sentence_ready(self, pending):
+        return len(pending) >= self.first_message_chars or _SENTENCE_END.search(pending) is not None
+
+    def _show(self, text, force):
+        """Envía el mensaje si aún no existe; si existe, lo edita respetando el intervalo."""
+        if text == self._shown:
+            return
+        if self._message_id is None:
+            self._message_id = self.outbound.send(self.chat_id, text)
+            self._shown = text
+            self.messages += 1
+            if self.first_message_at is None:
+                self.first_message_at = self.clock() - self._started_at
+            self._next_edit_at = self.clock() + self.edit_interval
+            return
+
+        now = self.clock()
+        if not force and now < self._next_edit_at:
+            return
+        if force and now < self._next_edit_at:
+            # La edición final no se descarta: se espera a que vuelva a estar permitida
+            self.sleep(self._next_edit_at - now)
+        for attempt in range(2):
+            try:
+                self.outbound.edit(self.chat_id, self._message_id, text)
+                self._shown = text
+                self.edits += 1
+                break
+            except Exception as e:
+                retry_after = _retry_after_seconds(e)
+                if retry_after is None:
+                    self.edit_errors += 1
+                    print(f"Error al editar el mensaje {self._message_id} de {self.chat_id}: {e}")
+                    break
+                self.rate_limited += 1
+                self._next_edit_at = self.clock() + retry_after
+                if not force or attempt:
+                    break
+                self.sleep(retry_after)
+        self._next_edit_at = max(self._next_edit_at, self.clock() + self.edit_interval)
+
+
+class FakeStreamingLLM:
+    """
+    LLM de pruebas con la misma interfaz stream(prompt) que los de LangChain:
+    devuelve `text` palabra a palabra, tras `first_token_delay` segundos y con
+    `token_delay` segundos entre trozos. Las llamadas quedan en self.prompts.
+    """
+
+    def __init__(self, text, first_token_delay=0.0, token_delay=0.0, sleep=time.sleep):
+        self.text = text
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.sleep = sleep
+        self.prompts = []
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        if self.first_token_delay:
+            self.sleep(self.first_token_delay)
+        tokens = re.findall(r'\S+\s*|\s+', self.text)
+        for i, token in enumerate(tokens):
+            if i and self.token_delay:
+                self.sleep(self.token_delay)
+            yield token
@@ -0,0 +1,151 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config import Config
+
+
+class Database:
+    """
+    Acceso compartido a SQLite para todos los blueprints.
+
+    Cada hilo reutiliza su propia conexión (sqlite3 no permite compartirlas entre
+    hilos sin bloquear), configurada una sola vez con:
+      journal_mode=WAL     lectores y un escritor a la vez, sin bloquearse
+      synchronous          NORMAL por defecto: en WAL solo arriesga la última
+                           transacción ante un corte de luz, no la integridad
+      cache_size/mmap_size caché de páginas más grande y lecturas por mmap
+      busy_timeout         espera al escritor en curso en lugar de fallar al momento
+    Las sentencias preparadas se reutilizan gracias a la caché de sqlite3
+    (`cached_statements`), que se indexa por el texto SQL.
+
+    Tras un fork (gunicorn con --preload) las conexiones del padre no se reutilizan.
+    Las conexiones de hilos que ya terminaron (el servidor de desarrollo crea uno
+    por petición) se cierran al abrir la siguiente, así que nunca hay más abiertas
+    que hilos vivos; un hilo también puede cerrar la suya con close_connection().
+    """
+
+    def __init__(self, path, synchronous='NORMAL', cache_size_kb=20000, mmap_size=256 * 1024 * 1024,
+                 busy_timeout_ms=5000, statement_cache=256, write_retries=5):
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache = statement_cache
+        self.write_retries = write_retries
+        self._local = threading.local()
+        self._connections = {}  # hilo -> su conexión
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.statement_cache,
+            # Solo la usa su hilo; esto permite cerrarla desde otro cuando ese hilo ya terminó
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self._close_finished_threads()
+            self._connections[threading.current_thread()] = conn
+        return conn
+
+    def _close_finished_threads(self):
+        """Cierra las conexiones de hilos que ya no existen (se llama con el lock tomado)."""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def connection(self):
+        """Conexión del hilo actual (se crea la primera vez). No hay que cerrarla."""
+        if os.getpid() != self._pid:
+            # Proceso hijo: se descartan las conexiones heredadas sin cerrarlas (son del padre)
+            self._local = threading.local()
+            self._connections = {}
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def close_connection(self):
+        """Cierra la conexión del hilo actual, si tiene; la siguiente llamada abre otra."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.current_thread(), None)
+        conn.close()
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def query_all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        """Confirma al salir o revierte si hay una excepción."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def write(self, sql, params=(), many=False):
+        """
+        Ejecuta una escritura en su propia transacción. Si la base sigue bloqueada
+        tras busy_timeout (picos de muchos escritores), reintenta con espera creciente.
+        """
+        for attempt in range(self.write_retries + 1):
+            try:
+                with self.transaction() as conn:
+                    if many:
+                        return conn.executemany(sql, params)
+                    return conn.execute(sql, params)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e) or attempt == self.write_retries:
+                    raise
+                time.sleep(min(0.05 * 2 ** attempt, 1.0) * (0.5 + random.random()))
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+        self._local = threading.local()
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get_db(path=None):
+    """Instancia compartida por ruta de base de datos (por defecto Config.DATABASE_PATH)."""
+    path = path or Config.DATABASE_PATH
+    with _databases_lock:
+        db = _databases.get(path)
+        if db is None:
+            db = _databases[path] = Database(
+                path,
+                synchronous=Config.DB_SYNCHRONOUS,
+                cache_size_kb=Config.DB_CACHE_SIZE_KB,
+                mmap_size=Config.DB_MMAP_SIZE,
+                busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+            )
+        return db
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from modules.db import get_db
+
+# Estados de un trabajo de ingesta
+QUEUED, RUNNING, DONE, ERROR = 'queued', 'running', 'done', 'error'
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS ingestion_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        owner TEXT,
+        primary_id TEXT,                -- NULL: procesa el documento; si no, trabajo al que sigue
+        status TEXT NOT NULL,
+        extracted INTEGER NOT NULL DEFAULT 0,
+        embedded INTEGER NOT NULL DEFAULT 0,
+        persisted INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        finished_at TEXT,
+        updated_at REAL NOT NULL        -- time.time() del último avance (detecta trabajos huérfanos)
+    )''',
+    # Un único trabajo en marcha por contenido, aunque dos workers reciban la misma subida a la vez
+    f'''CREATE UNIQUE INDEX IF NOT EXISTS idx_ingestion_jobs_active ON ingestion_jobs (sha256)
+        WHERE primary_id IS NULL AND status IN ('{QUEUED}', '{RUNNING}')''',
+    'CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_primary ON ingestion_jobs (primary_id)',
+    '''CREATE TABLE IF NOT EXISTS ingested_hashes (
+        sha256 TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        ingested_at TEXT
+    )''',
+]
+
+JOB_COLUMNS = ('id', 'filename', 'sha256', 'owner', 'status', 'extracted', 'embedded', 'persisted',
+               'error', 'created_at', 'finished_at')
+PROGRESS_COLUMNS = ('status', 'extracted', 'embedded', 'persisted', 'error')
+
+
+def content_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class IngestionJobs:
+    """
+    Cola de ingesta de documentos en segundo plano.
+
+    La petición HTTP solo guarda el PDF y encola el trabajo; un pool local de
+    hilos ejecuta process_document y va anotando el progreso (artículos
+    extraídos, con embedding y persistidos) para que el cliente lo consulte.
+
+    Trabajos y documentos ya ingeridos viven en SQLite (tablas ingestion_jobs e
+    ingested_hashes), no en memoria: con varios workers de gunicorn cualquiera
+    de ellos responde al GET de estado y todos ven los mismos duplicados. Lo
+    único local a cada proceso es el pool que ejecuta sus propios trabajos.
+
+    Los documentos ya ingeridos se reconocen por el SHA-256 de su contenido,
+    igual que un duplicado que aún está en cola. Si quien repite la subida es
+    otro usuario, recibe su propio trabajo (cada usuario solo consulta los
+    suyos) que sigue a la ingesta ya en marcha: el documento se procesa una sola
+    vez y el progreso se copia a ambos.
+
+    Un trabajo en cola o en curso que lleva `stale_after` segundos sin avanzar
+    (su proceso murió) se da por fallido para que el documento se pueda volver
+    a subir.
+    """
+
+    def __init__(self, processor, db=None, workers=1, max_jobs=200, stale_after=3600, legacy_hashes_path=None):
+        self.processor = processor
+        self.db = db or get_db()
+        self.max_jobs = max_jobs
+        self.stale_after = stale_after
+        with self.db.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        if legacy_hashes_path:
+            self._import_legacy_hashes(legacy_hashes_path)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+
+    def _import_legacy_hashes(self, path):
+        """Incorpora el registro JSON de versiones anteriores (idempotente)."""
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            hashes = json.load(f)
+        self.db.write('INSERT OR IGNORE INTO ingested_hashes (sha256, filename) VALUES (?, ?)',
+                      list(hashes.items()), many=True)
+
+    def find_duplicate(self, sha256):
+        """Devuelve (nombre del archivo ya ingerido, job_id en curso) si el contenido ya se conoce."""
+        ingested = self.db.query_one('SELECT filename FROM ingested_hashes WHERE sha256 = ?', (sha256,))
+        active = self.db.query_one(
+            f"SELECT id FROM ingestion_jobs WHERE sha256 = ? AND primary_id IS NULL AND status IN ('{QUEUED}', '{RUNNING}')",
+            (sha256,))
+        return (ingested['filename'] if ingested else None), (active['id'] if active else None)
+
+    def submit(self, file_path, filename, sha256, owner=None):
+        """
+        Encola la ingesta. Si el mismo contenido ya está en cola, devuelve ese trabajo
+        (mismo usuario) o uno propio que sigue al que está en marcha (otro usuario).
+        """
+        for attempt in range(3):
+            try:
+                job, is_new_primary = self._register(filename, sha256, owner)
+                break
+            except sqlite3.IntegrityError:
+                # Otro worker acaba de crear el trabajo para este contenido: la siguiente vuelta lo sigue
+                if attempt == 2:
+                    raise
+        if is_new_primary:
+            self._executor.submit(self._run, job['id'], file_path)
+        return job
+
+    def _register(self, filename, sha256, owner):
+        """Busca o crea el trabajo en una transacción. Devuelve (trabajo, hay que procesarlo aquí)."""
+        with self.db.transaction() as conn:
+            self._expire_stale(conn)
+            primary = conn.execute(
+                f"SELECT * FROM ingestion_jobs WHERE sha256 = ? AND primary_id IS NULL AND status IN ('{QUEUED}', '{RUNNING}')",
+                (sha256,)).fetchone()
+            if primary is not None:
+                if primary['owner'] == owner:
+                    return self._as_dict(primary), False
+                follower = conn.execute('SELECT * FROM ingestion_jobs WHERE primary_id = ? AND owner IS ?',
+                                        (primary['id'], owner)).fetchone()
+                if follower is not None:
+                    return self._as_dict(follower), False
+                # Mismo progreso que el trabajo en curso, con id y dueño propios
+                job = self._insert(conn, filename, sha256, owner, primary_id=primary['id'],
+                                   **{key: primary[key] for key in PROGRESS_COLUMNS})
+            else:
+                job = self._insert(conn, filename, sha256, owner)
+            self._evict_finished(conn)
+        return job, primary is None
+
+    def _insert(self, conn, filename, sha256, owner, primary_id=None, **progress):
+        job = {
+            'id': uuid.uuid4().hex,
+            'filename': filename,
+            'sha256': sha256,
+            'owner': owner,
+            'status': QUEUED,
+            'extracted': 0,
+            'embedded': 0,
+            'persisted': 0,
+            'error': None,
+            'created_at': _now(),
+            'finished_at': None,
+        }
+        job.update(progress)
+        conn.execute(
+            f'INSERT INTO ingestion_jobs ({", ".join(JOB_COLUMNS)}, primary_id, updated_at) '
+            f'VALUES ({", ".join("?" * len(JOB_COLUMNS))}, ?, ?)',
+            [job[key] for key in JOB_COLUMNS] + [primary_id, time.time()])
+        return job
+
+    def _expire_stale(self, conn):
+        conn.execute(
+            f"UPDATE ingestion_jobs SET status = '{ERROR}', error = ?, finished_at = ? "
+            f"WHERE status IN ('{QUEUED}', '{RUNNING}') AND updated_at < ?",
+            ('El proceso que ingería el documento se interrumpió.', _now(), time.time() - self.stale_after))
+
+    def _evict_finished(self, conn):
+        # Conserva como mucho max_jobs trabajos; se descartan primero los terminados más antiguos
+        conn.execute(
+            f'''DELETE FROM ingestion_jobs WHERE id IN (
+                SELECT id FROM ingestion_jobs WHERE status IN ('{DONE}', '{ERROR}')
+                ORDER BY created_at, rowid
+                LIMIT max((SELECT COUNT(*) FROM ingestion_jobs) - ?, 0))''',
+            (self.max_jobs,))
+
+    @staticmethod
+    def _as_dict(row):
+        return {key: row[key] for key in JOB_COLUMNS}
+
+    def _update(self, job_id, **fields):
+        """Actualiza el trabajo y sus seguidores."""
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        self.db.write(f'UPDATE ingestion_jobs SET {assignments}, updated_at = ? WHERE id = ? OR primary_id = ?',
+                      list(fields.values()) + [time.time(), job_id, job_id])
+
+    def _run(self, job_id, file_path):
+        job = self.get(job_id)
+        self._update(job_id, status=RUNNING)
+        try:
+            articles = self.processor.process_document(
+                file_path, job['filename'],
+                progress=lambda stage, count: self._update(job_id, **{stage: count}),
+            )
+            if not articles:
+                self._update(job_id, status=ERROR, error='No se encontraron artículos en el documento.',
+                             finished_at=_now())
+                return
+            self.db.write('INSERT OR IGNORE INTO ingested_hashes (sha256, filename, ingested_at) VALUES (?, ?, ?)',
+                          (job['sha256'], job['filename'], _now()))
+            self._update(job_id, status=DONE, finished_at=_now())
+        except Exception as e:
+            print(f"-> [Ingesta] ERROR procesando '{job['filename']}': {e}")
+            traceback.print_exc()
+            self._update(job_id, status=ERROR, error=str(e), finished_at=_now())
+
+    def get(self, job_id):
+        row = self.db.query_one('SELECT * FROM ingestion_jobs WHERE id = ?', (job_id,))
+        return self._as_dict(row) if row is not None else None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
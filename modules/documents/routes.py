@@ -49,15 +49,38 @@
 #     return render_template('upload.html')
 
 
-from flask import Blueprint, render_template, request, jsonify, current_app
-from flask_login import login_required
+from flask import Blueprint, render_template, request, jsonify, current_app, url_for
+from flask_login import login_required, current_user
 import os
+import threading
 from werkzeug.utils import secure_filename
+from config import Config
+from .jobs import IngestionJobs, content_sha256
 
 documents_bp = Blueprint('documents', __name__)
 UPLOAD_FOLDER = 'instance/uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# La cola de ingesta se crea en la primera subida (después del fork de gunicorn);
+# su estado está en SQLite, compartido por todos los workers
+_jobs = None
+_jobs_lock = threading.Lock()
+
+def get_ingestion_jobs():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = IngestionJobs(
+                current_app.rag_processor,
+                # Registro de versiones anteriores; ahora los hashes viven en la base de datos
+                legacy_hashes_path=os.path.join(UPLOAD_FOLDER, 'ingested_hashes.json'),
+                workers=Config.INGESTION_WORKERS,
+            )
+        return _jobs
+
+def _public_job(job):
+    return {key: value for key, value in job.items() if key not in ('owner', 'sha256')}
+
 @documents_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_file():
@@ -72,21 +95,39 @@ def upload_file():
             
         if file and file.filename.endswith('.pdf'):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
+            data = file.read()
+            sha256 = content_sha256(data)
+            jobs = get_ingestion_jobs()
+            
+            # Mismo contenido ya ingerido: no se vuelve a procesar
+            ingested_as, _ = jobs.find_duplicate(sha256)
+            if ingested_as:
+                message = f'El archivo "{filename}" ya estaba cargado (como "{ingested_as}"). No se ha vuelto a procesar.'
+                return jsonify({'status': 'duplicate', 'message': message}), 200
             
-            try:
-                # El procesamiento RAG que puede tardar
-                current_app.rag_processor.process_document(filepath, filename)
-                message = f'¡Archivo "{filename}" cargado y procesado exitosamente!'
-                return jsonify({'status': 'success', 'message': message}), 200
-            except Exception as e:
-                # Capturamos cualquier error durante el procesamiento
-                print(f"ERROR DURANTE EL PROCESAMIENTO RAG: {e}")
-                message = f'Error al procesar el archivo: {str(e)}'
-                return jsonify({'status': 'error', 'message': message}), 500
+            # El hash en el nombre evita que dos subidas con el mismo nombre se pisen
+            filepath = os.path.join(UPLOAD_FOLDER, f"{sha256[:12]}_{filename}")
+            with open(filepath, 'wb') as f:
+                f.write(data)
+            
+            # El procesamiento RAG (que puede tardar minutos) sigue en segundo plano
+            job = jobs.submit(filepath, filename, sha256, owner=current_user.get_id())
+            return jsonify({
+                'status': 'queued',
+                'job_id': job['id'],
+                'status_url': url_for('documents.upload_status', job_id=job['id']),
+                'message': f'Archivo "{filename}" recibido. Procesando en segundo plano...'
+            }), 202
         else:
             return jsonify({'status': 'error', 'message': 'Formato de archivo no válido. Por favor, sube un PDF.'}), 400
 
     # La petición GET simplemente muestra la página
-    return render_template('upload.html')
\ No newline at end of file
+    return render_template('upload.html')
+
+@documents_bp.route('/upload/<job_id>', methods=['GET'])
+@login_required
+def upload_status(job_id):
+    job = get_ingestion_jobs().get(job_id)
+    if job is None or job['owner'] != current_user.get_id():
+        return jsonify({'status': 'error', 'message': 'Trabajo no encontrado'}), 404
+    return jsonify(_public_job(job)), 200
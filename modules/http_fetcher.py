@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class FetchResult:
+    """Respuesta (de red o de la caché). `from_cache`: None (red), 'fresh' o 'revalidated' (304)."""
+
+    def __init__(self, url, status, content, encoding, from_cache=None):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class HttpCache:
+    """
+    Caché HTTP en disco: por cada URL (con sus parámetros) un `.body` con los
+    bytes y un `.json` con ETag, Last-Modified, codificación y hora de descarga.
+    Una entrada dentro de su vigencia (max-age, o `default_ttl` si el servidor no
+    la indica) se sirve sin red; pasada la vigencia se revalida con
+    If-None-Match / If-Modified-Since y un 304 reutiliza el cuerpo guardado.
+    """
+
+    def __init__(self, directory, default_ttl=0):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, digest[:2], digest)
+        return base + '.json', base + '.body'
+
+    def get(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def is_fresh(self, meta):
+        ttl = meta.get('max_age')
+        return time.time() - meta.get('stored_at', 0) < (self.default_ttl if ttl is None else ttl)
+
+    def put(self, key, response):
+        cache_control = response.headers.get('Cache-Control', '')
+        if 'no-store' in cache_control:
+            return
+        max_age = re.search(r'max-age=(\d+)', cache_control)
+        meta = {
+            'url': response.url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'encoding': response.encoding,
+            'max_age': int(max_age.group(1)) if max_age else None,
+            'stored_at': time.time(),
+        }
+        self._write(key, meta, response.content)
+
+    def touch(self, key, meta, response):
+        """Tras un 304: la entrada vuelve a estar vigente (y se actualizan los validadores si llegan nuevos)."""
+        meta = dict(meta, stored_at=time.time())
+        for field, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified')):
+            if response.headers.get(header):
+                meta[field] = response.headers[header]
+        meta_path, _ = self._paths(key)
+        self._atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def _write(self, key, meta, body):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # Primero el cuerpo: un .json solo existe si su .body está completo
+        self._atomic_write(body_path, body)
+        self._atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    @staticmethod
+    def _atomic_write(path, data):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+class Fetcher:
+    """
+    Descargas HTTP concurrentes con caché y límite de conexiones por host.
+
+    Una sola requests.Session (keep-alive) para todo el proceso; cada host admite
+    como mucho `per_host_limit` peticiones simultáneas, así fetch_many() puede
+    lanzar muchas URLs a la vez sin saturar ningún servidor.
+    """
+
+    def __init__(self, cache=None, per_host_limit=2, max_workers=8, timeout=30, user_agent=None):
+        self.cache = cache
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max(per_host_limit, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetcher')
+        self._host_limits = {}
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'network': 0, 'fresh_hits': 0, 'revalidated': 0, 'errors': 0}
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._host_limits.get(host)
+            if semaphore is None:
+                semaphore = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return semaphore
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def fetch(self, url, params=None):
+        """GET con caché. Lanza requests.RequestException si falla (igual que requests.get + raise_for_status)."""
+        self._count('requests')
+        key = requests.Request('GET', url, params=params).prepare().url
+        meta, body = self.cache.get(key) if self.cache else (None, None)
+        if meta is not None and self.cache.is_fresh(meta):
+            self._count('fresh_hits')
+            return FetchResult(key, 200, body, meta.get('encoding'), from_cache='fresh')
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        with self._host_semaphore(key):
+            try:
+                response = self.session.get(key, headers=headers, timeout=self.timeout)
+                if response.status_code == 304 and meta is not None:
+                    self._count('revalidated')
+                    self.cache.touch(key, meta, response)
+                    return FetchResult(key, 200, body, meta.get('encoding'), from_cache='revalidated')
+                response.raise_for_status()
+            except requests.RequestException:
+                self._count('errors')
+                raise
+        self._count('network')
+        if self.cache:
+            self.cache.put(key, response)
+        return FetchResult(response.url, response.status_code, response.content, response.encoding)
+
+    def submit(self, fn, *args, **kwargs):
+        """Ejecuta fn en el pool del fetcher (para repartir trabajo que a su vez llama a fetch)."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def fetch_many(self, urls):
+        """Descarga varias URLs a la vez. Devuelve, en el mismo orden, FetchResult o la excepción."""
+        futures = [self._executor.submit(self.fetch, url) for url in urls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from config import Config
+from modules.assistant.rag_processor import split_articles
+
+# Encabezados de artículo en los textos del BOE: "Artículo 12.", "Artículo 12 bis.", "ARTÍCULO 12"
+LAW_ARTICLE_PATTERN = re.compile(r'^(?:ARTICULO|ARTÍCULO|Artículo) (\d+(?: (?:bis|ter|quater))?)\.?\s*(.*)')
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def law_id_for(url):
+    """Identificador estable de una ley: el del BOE (BOE-A-AAAA-N) si aparece en la URL."""
+    match = re.search(r'BOE-[A-Z]-\d{4}-\d+', url)
+    return match.group(0) if match else _sha1(url)[:16]
+
+
+class LegalCorpus:
+    """
+    Corpus local y versionado de textos legales que alimenta el índice de RAGProcessor.
+
+    Cada crawl() descarga las URLs a la vez (Fetcher del scraper, con caché HTTP
+    y ETag/Last-Modified): una página con los mismos bytes que la última vez ni
+    se vuelve a parsear, y una cuyo texto no ha cambiado no genera versión nueva.
+    Cuando cambia, se guarda `texts/<ley>/v<N>.txt`, se divide en artículos
+    (split_articles, la misma segmentación que los PDF) y solo los artículos
+    nuevos o modificados se vectorizan, en tandas de `push_batch`. Las versiones
+    anteriores de los modificados y los artículos eliminados se retiran del índice.
+
+    manifest.json guarda por URL la versión, el hash del texto y, por artículo,
+    (hash, posición en el índice). Una ley solo se confirma en el manifiesto
+    cuando todos sus artículos están ya en el índice: si el proceso se corta,
+    el siguiente crawl la vuelve a tratar como cambiada. Las posiciones ya
+    subidas de leyes sin confirmar se anotan aparte (`uncommitted`) y se retiran
+    si la subida falla o, si el proceso murió, al empezar el siguiente crawl:
+    así volver a subirlas no deja artículos duplicados en el índice.
+    """
+
+    def __init__(self, directory, scraper=None, processor=None, push_batch=256):
+        self.directory = directory
+        self.texts_dir = os.path.join(directory, 'texts')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.push_batch = max(1, push_batch)
+        if scraper is None:
+            from modules.scraper import LegalScraper
+            scraper = LegalScraper()
+        self.scraper = scraper
+        if processor is None:
+            # Fuera de la app: RAGProcessor propio sobre el mismo almacén (ver run_crawl)
+            from modules.assistant.rag_processor import RAGProcessor
+            processor = RAGProcessor()
+        self.processor = processor
+        self._lock = threading.Lock()
+        os.makedirs(self.texts_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        self.laws = manifest.get('laws', {})
+        self.uncommitted = manifest.get('uncommitted', {})  # url -> posiciones subidas de una ley sin confirmar
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'laws': self.laws, 'uncommitted': self.uncommitted}, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    def _text_path(self, law_id, version):
+        return os.path.join(self.texts_dir, law_id, f"v{version}.txt")
+
+    def text(self, url, version=None):
+        """Texto guardado de una ley (la última versión si no se indica). None si no está en el corpus."""
+        entry = self.laws.get(url)
+        if entry is None:
+            return None
+        with open(self._text_path(entry['law_id'], version or entry['version']), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def crawl(self, urls):
+        """Actualiza el corpus con esas URLs y sube al índice lo que cambió. Devuelve un resumen."""
+        with self._lock:
+            return self._crawl(list(dict.fromkeys(urls)))
+
+    def _crawl(self, urls):
+        # Restos de un crawl que murió a medias: se volverán a subir con su ley
+        self._retire_uncommitted()
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        report = {'laws': len(urls), 'unchanged': 0, 'updated': 0, 'errors': 0,
+                  'new_articles': 0, 'changed_articles': 0, 'removed_articles': 0, 'pushed_batches': 0}
+        staged = {}    # url -> entrada nueva del manifiesto (se confirma cuando todos sus artículos están en el índice)
+        retire = {}    # url -> posiciones de las versiones sustituidas
+        pending = []   # (url, número, texto, hash) por vectorizar
+
+        for url, result in zip(urls, self.scraper.fetcher.fetch_many(urls)):
+            if isinstance(result, Exception):
+                print(f"-> [Corpus] Error descargando {url}: {result}")
+                report['errors'] += 1
+                continue
+            entry = self.laws.get(url)
+            # Mismos bytes que la última vez (típico tras un 304): ni se parsea
+            body_hash = hashlib.sha1(result.content).hexdigest()
+            if entry is not None and entry.get('body_hash') == body_hash:
+                entry['checked_at'] = now
+                report['unchanged'] += 1
+                continue
+
+            text = self.scraper.extract_law_text(result, limit=None)
+            content_hash = _sha1(text)
+            if entry is not None and entry['content_hash'] == content_hash:
+                entry['checked_at'] = now
+                entry['body_hash'] = body_hash
+                report['unchanged'] += 1
+                continue
+
+            law_id = entry['law_id'] if entry else law_id_for(url)
+            version = entry['version'] + 1 if entry else 1
+            path = self._text_path(law_id, version)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+            articles = split_articles(text.split('\n'), pattern=LAW_ARTICLE_PATTERN, skip_prefixes=())
+            previous = entry['articles'] if entry else {}
+            kept, superseded = {}, []
+            for number, article in articles.items():
+                article_hash = _sha1(article)
+                old = previous.get(number)
+                if old is not None and old[0] == article_hash:
+                    kept[number] = old
+                    continue
+                pending.append((url, number, article, article_hash))
+                if old is not None:
+                    superseded.append(old[1])
+                    report['changed_articles'] += 1
+                else:
+                    report['new_articles'] += 1
+            removed = [previous[number][1] for number in previous.keys() - articles.keys()]
+            report['removed_articles'] += len(removed)
+
+            staged[url] = {
+                'law_id': law_id,
+                'title': text.split('\n', 1)[0][:200],
+                'version': version,
+                'content_hash': content_hash,
+                'body_hash': body_hash,
+                'fetched_at': now,
+                'checked_at': now,
+                'articles': kept,
+            }
+            retire[url] = superseded + removed
+            report['updated'] += 1
+
+        waiting = {url: 0 for url in staged}
+        for url, *_ in pending:
+            waiting[url] += 1
+        # Leyes sin artículos que subir (solo eliminaciones o sin artículos reconocibles)
+        self._commit(staged, retire, [url for url, count in waiting.items() if count == 0])
+
+        try:
+            for start in range(0, len(pending), self.push_batch):
+                batch = pending[start:start + self.push_batch]
+                positions = self.processor.add_articles(
+                    [(article, self._source(staged[url])) for url, _, article, _ in batch]
+                )
+                done = []
+                for (url, number, _, article_hash), position in zip(batch, positions):
+                    staged[url]['articles'][number] = [article_hash, position]
+                    self.uncommitted.setdefault(url, []).append(position)
+                    waiting[url] -= 1
+                    if waiting[url] == 0:
+                        done.append(url)
+                report['pushed_batches'] += 1
+                self._commit(staged, retire, done)
+        except Exception:
+            # Las leyes a medias se reintentan enteras en el próximo crawl: lo ya subido se retira
+            self._retire_uncommitted()
+            raise
+
+        self._save_manifest()
+        print(f"-> [Corpus] {report['laws']} leyes: {report['updated']} actualizadas, {report['unchanged']} sin cambios, "
+              f"{report['errors']} con error. Artículos: {report['new_articles']} nuevos, "
+              f"{report['changed_articles']} modificados, {report['removed_articles']} eliminados.")
+        return report
+
+    @staticmethod
+    def _source(entry):
+        return sys.intern(f"{entry['title'] or entry['law_id']} (v{entry['version']})")
+
+    def _commit(self, staged, retire, urls):
+        """
+        Confirma en el manifiesto las leyes ya completas en el índice y retira sus
+        versiones antiguas. Guarda también las posiciones subidas de las que faltan.
+        """
+        positions = []
+        for url in urls:
+            self.laws[url] = staged[url]
+            self.uncommitted.pop(url, None)
+            positions.extend(retire[url])
+        if positions:
+            self.processor.retire(positions)
+        self._save_manifest()
+
+    def _retire_uncommitted(self):
+        positions = [pos for law_positions in self.uncommitted.values() for pos in law_positions]
+        if not positions:
+            return
+        print(f"-> [Corpus] Retirando {len(positions)} artículos subidos de leyes que no llegaron a confirmarse.")
+        self.processor.retire(positions)
+        self.uncommitted = {}
+        self._save_manifest()
+
+
+def read_url_list(path):
+    """Una URL por línea; se ignoran las líneas vacías y las que empiezan por '#'."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def run_crawl(urls=None, processor=None):
+    """
+    Trabajo de crawl: pensado para un cron (`python -m modules.legal_corpus`) o
+    para llamarlo desde la app con su RAGProcessor. Fuera de la app abre su propio
+    RAGProcessor sobre el mismo almacén: las escrituras al WAL y a los retirados
+    van con el bloqueo entre procesos (ver SegmentLog) y los workers las
+    incorporan sin reiniciar en su siguiente refresh().
+    """
+    corpus = LegalCorpus(Config.CORPUS_DIR, processor=processor, push_batch=Config.CORPUS_PUSH_BATCH)
+    return corpus.crawl(urls if urls is not None else read_url_list(Config.CORPUS_URLS_FILE))
+
+
+if __name__ == '__main__':
+    run_crawl(sys.argv[1:] or None)
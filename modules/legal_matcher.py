@@ -0,0 +1,136 @@
+import re
+
+import numpy as np
+
+DEFAULT_LEGAL_TERMS = [
+    'derecho', 'ley', 'legal', 'jurídico', 'abogado', 'proceso', 'juicio',
+    'demanda', 'contrato', 'testamento', 'herencia', 'penal', 'civil',
+    'mercantil', 'laboral', 'fiscal', 'notario', 'documento', 'escritura',
+    'poder', 'arrendamiento', 'compraventa', 'sociedad', 'empresa', 'patente',
+    'marca', 'propiedad intelectual', 'familia', 'divorcio', 'hipoteca',
+    'despido', 'contrato laboral', 'delito', 'prisión', 'detención', 'prueba',
+    'testigo', 'mediación', 'arbitraje', 'responsabilidad civil', 'daños',
+    'indemnización', 'competencia', 'protección de datos', 'usufructo'
+]
+
+DEFAULT_LEGAL_PATTERNS = [
+    r'(cómo|como)\s+(demandar|reclamar).*',
+    r'(qué|que)\s+(debo|debería).*(hacer|proceder)',
+    r'(necesito|quiero)\s+(hacer|redactar).*(contrato|testamento|poder)',
+    r'(cuánto|cuanto)\s+(tiempo|dura|tarda).*(proceso|juicio|demanda)',
+    r'(qué|que)\s+(derechos|obligaciones).*(tengo|tiene)',
+]
+
+# Frases de referencia para el respaldo por embeddings (su centroide representa "consulta jurídica")
+LEGAL_PROTOTYPES = [
+    '¿Qué puedo hacer si mi casero no me devuelve la fianza?',
+    'Me han echado del trabajo sin avisar, ¿es legal?',
+    '¿Cómo reclamo una deuda que no me pagan?',
+    'Quiero separarme de mi pareja y tenemos hijos.',
+    '¿Qué pasa con la casa de mis padres cuando fallezcan?',
+    'Me han puesto una multa que creo injusta.',
+    'Un vecino ha hecho obras que dañan mi vivienda.',
+    '¿Puedo registrar el nombre de mi negocio?',
+]
+
+# Letras que el usuario puede escribir con o sin tilde (la ñ, también como n)
+ACCENTS = {'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'úü', 'n': 'ñ'}
+_FOLD = {ord(accented): plain for plain, variants in ACCENTS.items() for accented in variants}
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin tildes (solo las del español, ver ACCENTS)."""
+    return text.lower().translate(_FOLD)
+
+
+def load_terms(path):
+    """Un término por línea; se ignoran las líneas vacías y las que empiezan por '#'."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def trie_regex(words):
+    """
+    Alternancia de palabras (ya sin tildes) con los prefijos comunes factorizados
+    ("contrato|contrato laboral" -> "contrato(?: laboral)?"), de modo que el motor
+    de re avanza por el árbol en vez de probar cada palabra en cada posición.
+    Las letras de ACCENTS se emiten como clase ("[oó]"): el regex se aplica sobre
+    el prompt en minúsculas sin tener que quitarle antes las tildes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def letter(char):
+        return f'[{char}{ACCENTS[char]}]' if char in ACCENTS else re.escape(char)
+
+    def build(node):
+        ends = '' in node
+        branches = [letter(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if ends:
+            body = ('(?:' + body + ')' if len(branches) == 1 and len(body) > 1 else body) + '?'
+        return body
+
+    return build(trie)
+
+
+class LegalTopicMatcher:
+    """
+    Decide si un prompt es de temática jurídica. Todos los términos van en UNA
+    expresión regular compilada (trie_regex) que recorre el prompt en minúsculas
+    una sola vez, con o sin tildes y solo como palabra completa o su plural
+    (-s, -es): "juridico" y "leyes" cuentan, pero "comprueba" no es "prueba" ni
+    "leyenda" es "ley". Su coste apenas crece con el número de términos, a
+    diferencia de un `in` por término. Si no hay término, se prueban los
+    patrones de frase, ya compilados.
+
+    Si se pasa `encoder` (una función lista de textos -> vectores, p. ej. el
+    modelo ya cargado de RAGProcessor) y no hay coincidencia, se compara el
+    embedding del prompt con el centroide de LEGAL_PROTOTYPES y se acepta por
+    encima de `threshold` (similitud coseno).
+    """
+
+    def __init__(self, terms=None, patterns=None, encoder=None, threshold=0.5, prototypes=None):
+        terms = sorted({fold(term.strip()) for term in (terms or DEFAULT_LEGAL_TERMS) if term.strip()})
+        # Separador + término sobre ' ' + prompt: equivale a \b delante, pero empieza por una
+        # clase de caracteres y re salta directamente de separador en separador. Detrás,
+        # el plural opcional y fin de palabra ("marcar" no es "marca")
+        self.terms_regex = re.compile(r'\W(?:' + trie_regex(terms) + r')(?:es|s)?\b')
+        self.patterns = [re.compile(pattern) for pattern in (patterns if patterns is not None else DEFAULT_LEGAL_PATTERNS)]
+        self.encoder = encoder
+        self.threshold = threshold
+        self.prototypes = prototypes or LEGAL_PROTOTYPES
+        self._centroid = None
+
+    def matches(self, prompt: str) -> bool:
+        """Solo términos y patrones (sin embeddings)."""
+        text = prompt.lower()
+        if self.terms_regex.search(' ' + text):
+            return True
+        return any(pattern.search(text) for pattern in self.patterns)
+
+    def similarity(self, prompt: str) -> float:
+        if self._centroid is None:
+            vectors = np.asarray(self.encoder(self.prototypes), dtype='float32')
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            centroid = vectors.mean(axis=0)
+            self._centroid = centroid / np.linalg.norm(centroid)
+        vector = np.asarray(self.encoder([prompt]), dtype='float32')[0]
+        return float(vector @ self._centroid / (np.linalg.norm(vector) or 1.0))
+
+    def __call__(self, prompt: str) -> bool:
+        if self.matches(prompt):
+            return True
+        if self.encoder is None:
+            return False
+        try:
+            return self.similarity(prompt) >= self.threshold
+        except Exception as e:
+            print(f"-> [LegalTopicMatcher] Respaldo por embeddings no disponible: {e}")
+            return False
@@ -0,0 +1,91 @@
+import threading
+
+from modules.db import get_db
+from modules.admin.stats import install
+
+CHATS_PAGE_SIZE = 20
+MESSAGES_PAGE_SIZE = 50
+
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+
+
+def ensure_indexes(db=None):
+    """Índice (chat_id, timestamp, id): pagina cada chat sin leer la tabla entera."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    with _indexes_lock:
+        if not _indexes_ready:
+            (db or get_db()).write(
+                'CREATE INDEX IF NOT EXISTS idx_conversations_chat_ts ON conversations (chat_id, timestamp, id)'
+            )
+            _indexes_ready = True
+
+
+def encode_cursor(*parts):
+    return '|'.join(str(p) for p in parts)
+
+
+def decode_cursor(cursor):
+    """'timestamp|id' -> (timestamp, id). None si no hay cursor o no es válido."""
+    if not cursor:
+        return None
+    timestamp, sep, key = cursor.rpartition('|')
+    if not sep or not key.lstrip('-').isdigit():
+        return None
+    return timestamp, int(key)
+
+
+def list_chats(before=None, limit=CHATS_PAGE_SIZE):
+    """
+    Chats ordenados por su último mensaje (más reciente primero), con el número de
+    mensajes y el texto del último. Lee el resumen por chat (stats_chats, mantenido
+    por triggers) en lugar de agregar la tabla de mensajes: cada página recorre solo
+    `limit` filas del índice. Paginación por cursor (último timestamp, chat_id).
+    """
+    db = get_db()
+    if not install(db):
+        return [], None
+    cursor = decode_cursor(before)
+    condition, params = '', []
+    if cursor:
+        condition = 'WHERE last_at < ? OR (last_at = ? AND chat_id < ?)'
+        params = [cursor[0], cursor[0], cursor[1]]
+    rows = db.query_all(f'''
+        SELECT chat_id, messages AS message_count, last_at, last_message
+        FROM stats_chats
+        {condition}
+        ORDER BY last_at DESC, chat_id DESC
+        LIMIT ?
+    ''', params + [limit + 1])
+
+    chats = [dict(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(chats[-1]['last_at'], chats[-1]['chat_id']) if len(rows) > limit else None
+    return chats, next_cursor
+
+
+def load_messages(chat_id, before=None, limit=MESSAGES_PAGE_SIZE):
+    """
+    Mensajes de un chat en orden cronológico: la página más reciente anterior al
+    cursor (timestamp, id). Solo recorre el índice de ese chat.
+    """
+    ensure_indexes()
+    cursor = decode_cursor(before)
+    condition, params = '', [chat_id]
+    if cursor:
+        condition = 'AND (timestamp < ? OR (timestamp = ? AND id < ?))'
+        params += [cursor[0], cursor[0], cursor[1]]
+    rows = get_db().query_all(f'''
+        SELECT id, chat_id, sender, message_text, timestamp
+        FROM conversations
+        WHERE chat_id = ? {condition}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1])
+
+    page = [dict(row) for row in rows[:limit]]
+    # El cursor apunta al mensaje más antiguo de la página: la siguiente trae los anteriores
+    next_cursor = encode_cursor(page[-1]['timestamp'], page[-1]['id']) if len(rows) > limit else None
+    page.reverse()
+    return page, next_cursor
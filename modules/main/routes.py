@@ -1,8 +1,6 @@
-import sqlite3
-from config import Config
-from collections import defaultdict
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify
 from flask_login import current_user, login_required
+from .conversations import list_chats, load_messages, CHATS_PAGE_SIZE, MESSAGES_PAGE_SIZE
 
 
 main_bp = Blueprint('main', __name__)
@@ -28,19 +26,23 @@ def manual():
 @main_bp.route('/conversations')
 @login_required
 def conversations_dashboard():
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Obtenemos todos los mensajes ordenados por fecha
-    cursor.execute("SELECT * FROM conversations ORDER BY timestamp ASC")
-    messages = cursor.fetchall()
-    conn.close()
-    
-    # Agrupamos los mensajes por chat_id para separar las conversaciones
-    conversations = defaultdict(list)
-    for msg in messages:
-        conversations[msg['chat_id']].append(dict(msg))
-        
-    return render_template('conversations_dashboard.html', conversations=conversations)
+    # Solo la primera página de chats (agregada por índice); los mensajes se cargan bajo demanda
+    chats, next_cursor = list_chats(before=request.args.get('before'))
+    return render_template('conversations_dashboard.html', chats=chats, next_cursor=next_cursor)
+
+def _page_size(default):
+    return max(1, min(request.args.get('limit', default, type=int), 200))
+
+@main_bp.route('/api/conversations')
+@login_required
+def conversations_api():
+    chats, next_cursor = list_chats(before=request.args.get('before'), limit=_page_size(CHATS_PAGE_SIZE))
+    return jsonify({'chats': chats, 'next_cursor': next_cursor})
+
+# Los grupos de Telegram tienen chat_id negativo
+@main_bp.route('/api/conversations/<int(signed=True):chat_id>/messages')
+@login_required
+def conversation_messages_api(chat_id):
+    messages, next_cursor = load_messages(chat_id, before=request.args.get('before'), limit=_page_size(MESSAGES_PAGE_SIZE))
+    return jsonify({'chat_id': chat_id, 'messages': messages, 'next_cursor': next_cursor})
 # --- FIN DE LA NUEVA RUTA ---
\ No newline at end of file
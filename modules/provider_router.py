@@ -0,0 +1,322 @@
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los cubos del histograma de latencia; el último cubo es "más de 30 s"
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 15000, 30000)
+
+
+class ProviderError(Exception):
+    """Fallo de una llamada a un proveedor, con su tipo para las métricas ('timeout', 'http_5xx', ...)."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+# --- CIRCUIT BREAKER ---
+
+class CircuitBreaker:
+    """
+    closed -> open tras `failure_threshold` fallos seguidos; open -> half_open pasados
+    `reset_timeout` segundos. En half_open se deja pasar una sola llamada de prueba:
+    si sale bien se cierra, si falla se vuelve a abrir.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+
+# --- MÉTRICAS POR PROVEEDOR ---
+
+class ProviderMetrics:
+    """Histograma de latencias (éxitos), errores por tipo y ventana reciente para estimar percentiles."""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.errors = {}
+        self.calls = 0
+        self.successes = 0
+        self.hedges = 0      # veces que este proveedor se lanzó como respaldo de otro más lento
+        self.hedge_wins = 0  # ...y respondió primero
+
+    def record_success(self, latency_ms):
+        with self._lock:
+            self.calls += 1
+            self.successes += 1
+            self._recent.append(latency_ms)
+            self.buckets[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def record_error(self, kind):
+        with self._lock:
+            self.calls += 1
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_hedge(self, won=False):
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges += 1
+
+    def percentile(self, q, min_samples=1):
+        with self._lock:
+            if len(self._recent) < min_samples:
+                return None
+            ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+            result = {
+                'calls': self.calls,
+                'successes': self.successes,
+                'errors': dict(self.errors),
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'latency_histogram': dict(zip(labels, self.buckets)),
+            }
+        for name, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            result[name] = self.percentile(q)
+        return result
+
+
+# --- PROVEEDORES ---
+
+class ChatProvider:
+    """
+    Cliente de una API de chat compatible con OpenAI (/chat/completions).
+
+    Usa una requests.Session propia con pool de conexiones keep-alive, así las
+    llamadas consecutivas reutilizan la conexión TLS en lugar de abrir una nueva.
+    `base_url` es configurable (p. ej. un servidor local de pruebas).
+    """
+
+    def __init__(self, name, base_url, api_key, model, timeout=30.0, pool_size=10,
+                 breaker=None, extra_payload=None):
+        self.name = name
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.extra_payload = extra_payload or {}
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = ProviderMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    def complete(self, system_prompt: str, prompt: str) -> str:
+        """Llamada directa (sin breaker ni métricas). Lanza ProviderError si falla."""
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            **self.extra_payload,
+        }
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            content = response.json()['choices'][0]['message']['content']
+        except requests.Timeout as e:
+            raise ProviderError('timeout', str(e)) from e
+        except requests.HTTPError as e:
+            raise ProviderError(f"http_{e.response.status_code // 100}xx", str(e)) from e
+        except requests.ConnectionError as e:
+            raise ProviderError('connection', str(e)) from e
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ProviderError('bad_response', f"Respuesta inesperada: {e}") from e
+        # Un 200 sin texto (filtro de contenido, cuota agotada en algunos proveedores) también es un fallo
+        if not content or not content.strip():
+            raise ProviderError('empty', "Respuesta vacía")
+        return content
+
+    def call(self, system_prompt: str, prompt: str) -> str:
+        """complete() registrando latencia, errores y el resultado en el circuit breaker."""
+        started = time.perf_counter()
+        try:
+            text = self.complete(system_prompt, prompt)
+        except Exception as e:
+            self.metrics.record_error(getattr(e, 'kind', 'error'))
+            self.breaker.record_failure()
+            logger.error(f"Error con {self.name}: {e}")
+            raise
+        self.metrics.record_success((time.perf_counter() - started) * 1000)
+        self.breaker.record_success()
+        return text
+
+    def stats(self):
+        return dict(self.metrics.snapshot(), name=self.name, configured=self.configured,
+                    breaker=self.breaker.state, breaker_opened=self.breaker.opened)
+
+
+# --- ROUTER ---
+
+class _Attempt:
+    """Una llamada lanzada por el router; `started_at` se fija cuando un hilo del pool la empieza."""
+
+    def __init__(self, provider, hedge):
+        self.provider = provider
+        self.hedge = hedge
+        self.started_at = None
+
+
+class ProviderRouter:
+    """
+    Reparte una petición entre proveedores en orden de preferencia.
+
+    - Se salta los proveedores sin clave o con el circuito abierto.
+    - Si uno falla (o responde vacío), se lanza el siguiente al momento.
+    - Cobertura (hedging): si uno no ha respondido en su p95 histórico (o en
+      `default_hedge_delay` mientras no hay muestras), se lanza también el siguiente
+      y gana la primera respuesta válida. La llamada perdedora termina en segundo
+      plano y solo alimenta las métricas.
+
+    El pool tiene un hilo por proveedor para cada una de las `concurrency`
+    peticiones simultáneas previstas, así que normalmente ninguna llamada espera
+    en cola. Si aun así espera (picos por encima de lo previsto), el plazo de
+    cobertura cuenta desde que la llamada empieza de verdad, no desde que se encola:
+    la cola no se confunde con un proveedor lento ni dispara coberturas que solo
+    añadirían más trabajo a la cola.
+    """
+
+    def __init__(self, providers, hedging=True, default_hedge_delay=5.0, min_hedge_delay=0.2,
+                 min_samples=20, concurrency=16, max_workers=None):
+        self.providers = list(providers)
+        self.hedging = hedging
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        max_workers = max_workers or concurrency * max(1, len(self.providers))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='provider')
+
+    def hedge_delay(self, provider):
+        """Segundos que se espera a `provider` antes de lanzar el siguiente."""
+        if not self.hedging:
+            return None
+        p95 = provider.metrics.percentile(0.95, min_samples=self.min_samples)
+        delay = self.default_hedge_delay if p95 is None else p95 / 1000
+        return min(max(delay, self.min_hedge_delay), provider.timeout)
+
+    def _run(self, attempt, system_prompt, prompt):
+        attempt.started_at = time.monotonic()
+        return attempt.provider.call(system_prompt, prompt)
+
+    def _hedge_timeout(self, attempt):
+        """Cuánto esperar antes de cubrir `attempt` (si aún está en cola, se vuelve a mirar en breve)."""
+        if attempt.started_at is None:
+            return self.min_hedge_delay
+        return max(0.0, attempt.started_at + self.hedge_delay(attempt.provider) - time.monotonic())
+
+    def complete(self, system_prompt: str, prompt: str) -> Optional[str]:
+        """Respuesta del primer proveedor que conteste bien, o None si ninguno lo consigue."""
+        candidates = iter(p for p in self.providers if p.configured)
+        in_flight = {}
+        launched = []
+
+        def launch_next(hedge):
+            for provider in candidates:
+                if not provider.breaker.allow():
+                    continue
+                if hedge:
+                    provider.metrics.record_hedge()
+                attempt = _Attempt(provider, hedge)
+                in_flight[self._executor.submit(self._run, attempt, system_prompt, prompt)] = attempt
+                launched.append(attempt)
+                return True
+            return False
+
+        if not launch_next(hedge=False):
+            return None
+        exhausted = False  # sin más candidatos: ya no hay con qué cubrir
+        while in_flight:
+            last = launched[-1]
+            timeout = self._hedge_timeout(last) if self.hedging and not exhausted else None
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if last.started_at is not None and time.monotonic() - last.started_at >= self.hedge_delay(last.provider):
+                    # El último lanzado tarda más que su p95: cobertura con el siguiente
+                    exhausted = not launch_next(hedge=True)
+                continue
+            for future in done:
+                attempt = in_flight.pop(future)
+                if future.exception() is None:
+                    if attempt.hedge:
+                        attempt.provider.metrics.record_hedge(won=True)
+                    return future.result()
+                # Falló: el siguiente proveedor entra ya, sin esperar a ningún plazo
+                if not launch_next(hedge=False):
+                    exhausted = True
+        return None
+
+    def stats(self):
+        return [provider.stats() for provider in self.providers]
@@ -6,27 +6,84 @@ from typing import List, Dict
 import PyPDF2
 import docx
 import logging
+import threading
+import time
+from collections import defaultdict
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 import numpy as np
-import faiss
+from modules.vector_index import VectorIndex
+from config import Config
+
+EMBEDDING_DIMENSION = 384  # all-MiniLM-L6-v2
+# Cuántos fragmentos se piden por documento esperado al agrupar resultados en query()
+CHUNKS_PER_RESULT = 4
 
 class RAGSystem:
     def __init__(self, db_path='instance/legal_db.db'):
         self.db_path = db_path
         self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        self.index = None
-        self.documents = []
+        # Un índice por usuario (tenant): cada consulta recorre solo los vectores de su dueño.
+        # Los ids de los vectores son los ids de las filas de fragmento en rag_documents.
+        self.tenants = None
+        self.documents = {}  # id de fragmento -> metadatos (incluye doc_id, el documento padre)
+        # MiniLM trunca a 256 tokens: cada fragmento debe caber entero en esa ventana
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=Config.RAG_CHUNK_SIZE, chunk_overlap=Config.RAG_CHUNK_OVERLAP
+        )
+        self._lock = threading.RLock()
         self._init_vector_db()
+        self._start_compaction(Config.RAG_COMPACTION_INTERVAL)
     
     def _init_vector_db(self):
         """Inicializa la base de datos vectorial"""
         try:
-            # Dimensiones del embedding (384 para all-MiniLM-L6-v2)
-            self.index = faiss.IndexFlatL2(384)
+            # El tipo de índice (Flat, IVF, HNSW, IVF-PQ) sale de Config.VECTOR_INDEX_TYPE
+            self._ensure_schema()
+            self.tenants = {}
             self._load_documents()
         except Exception as e:
             logging.error(f"Error inicializando vector DB: {e}")
-            self.index = None
+            self.tenants = None
+
+    def _ensure_schema(self):
+        """
+        Cada documento es una fila padre (sin embedding) y N filas de fragmento con
+        parent_id y chunk_index. Las bases antiguas reciben las columnas nuevas; sus
+        filas sin parent_id se siguen tratando como documentos de un solo fragmento.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rag_documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                content TEXT,
+                embedding BLOB,
+                user_id INTEGER,
+                doc_type TEXT,
+                source TEXT,
+                uploaded_at TEXT,
+                is_active INTEGER DEFAULT 1,
+                parent_id INTEGER,
+                chunk_index INTEGER
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(rag_documents)')}
+        for column in ('parent_id', 'chunk_index'):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE rag_documents ADD COLUMN {column} INTEGER')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rag_documents_parent ON rag_documents (parent_id)')
+        conn.commit()
+        conn.close()
+
+    def _new_tenant_index(self):
+        return VectorIndex.from_config(EMBEDDING_DIMENSION, use_ids=True)
+
+    def _tenant_index(self, user_id):
+        index = self.tenants.get(user_id)
+        if index is None:
+            index = self.tenants[user_id] = self._new_tenant_index()
+        return index
     
     def _load_documents(self):
         """Carga documentos desde la base de datos"""
@@ -34,89 +91,121 @@ class RAGSystem:
             conn = sqlite3.connect(self.db_path)
             c = conn.cursor()
             
+            # Solo las filas con embedding (fragmentos y documentos antiguos de una sola fila)
             c.execute('''
-                SELECT id, title, content, embedding, user_id, doc_type, source 
+                SELECT id, COALESCE(parent_id, id), COALESCE(chunk_index, 0),
+                       title, content, embedding, user_id, doc_type, source 
                 FROM rag_documents 
-                WHERE is_active = 1
+                WHERE is_active = 1 AND embedding IS NOT NULL
             ''')
             
-            documents = []
-            embeddings = []
+            documents = {}
+            per_user = defaultdict(lambda: ([], []))  # user_id -> (ids, embeddings)
             
             for row in c.fetchall():
-                doc_id, title, content, embedding_blob, user_id, doc_type, source = row
+                chunk_id, doc_id, chunk_index, title, content, embedding_blob, user_id, doc_type, source = row
                 
                 # Convertir blob a numpy array
-                if embedding_blob:
-                    embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-                    embeddings.append(embedding)
+                ids, embeddings = per_user[user_id]
+                ids.append(chunk_id)
+                embeddings.append(np.frombuffer(embedding_blob, dtype=np.float32))
                 
-                documents.append({
-                    'id': doc_id,
+                documents[chunk_id] = {
+                    'id': chunk_id,
+                    'doc_id': doc_id,
+                    'chunk_index': chunk_index,
                     'title': title,
                     'content': content,
                     'user_id': user_id,
                     'type': doc_type,
                     'source': source
-                })
+                }
             
-            if embeddings:
-                embeddings_matrix = np.vstack(embeddings)
-                self.index.reset()
-                self.index.add(embeddings_matrix)
+            tenants = {}
+            for user_id, (ids, embeddings) in per_user.items():
+                index = self._new_tenant_index()
+                index.add_with_ids(np.vstack(embeddings), np.array(ids, dtype=np.int64))
+                tenants[user_id] = index
             
-            self.documents = documents
+            with self._lock:
+                self.tenants = tenants
+                self.documents = documents
             conn.close()
             
         except Exception as e:
             logging.error(f"Error cargando documentos: {e}")
     
     def add_document(self, file, user_id: int, doc_type: str = 'general') -> Dict:
-        """Añade un documento al sistema RAG"""
+        """Añade un documento al sistema RAG, dividido en fragmentos"""
         try:
             # Extraer texto según el tipo de archivo
             text = self._extract_text(file)
             if not text:
                 return {'success': False, 'error': 'No se pudo extraer texto'}
             
-            # Generar embedding
-            embedding = self.model.encode(text)
+            chunks = [chunk for chunk in self.splitter.split_text(text) if chunk.strip()]
+            if not chunks:
+                return {'success': False, 'error': 'No se pudo extraer texto'}
             
-            # Guardar en base de datos
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
+            # Generar embeddings por lotes
+            start = time.perf_counter()
+            embeddings = self.model.encode(
+                chunks, batch_size=Config.RAG_ENCODE_BATCH_SIZE, convert_to_numpy=True
+            ).astype(np.float32)
             
-            c.execute('''
-                INSERT INTO rag_documents 
-                (title, content, embedding, user_id, doc_type, source, uploaded_at, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 1)
-            ''', (
-                file.filename,
-                text[:100000],  # Limitar tamaño
-                embedding.tobytes(),
-                user_id,
-                doc_type,
-                'upload',
-                datetime.now().isoformat()
-            ))
-            
-            doc_id = c.lastrowid
-            conn.commit()
-            conn.close()
+            # Guardar en base de datos: fila padre + fragmentos en una sola transacción
+            uploaded_at = datetime.now().isoformat()
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    c = conn.cursor()
+                    c.execute('''
+                        INSERT INTO rag_documents 
+                        (title, content, embedding, user_id, doc_type, source, uploaded_at, is_active)
+                        VALUES (?, '', NULL, ?, ?, ?, ?, 1)
+                    ''', (file.filename, user_id, doc_type, 'upload', uploaded_at))
+                    doc_id = c.lastrowid
+                    
+                    c.executemany('''
+                        INSERT INTO rag_documents 
+                        (title, content, embedding, user_id, doc_type, source, uploaded_at, is_active, parent_id, chunk_index)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+                    ''', [
+                        (file.filename, chunk, embedding.tobytes(), user_id, doc_type, 'upload', uploaded_at, doc_id, i)
+                        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+                    ])
+                    chunk_ids = [row[0] for row in c.execute(
+                        'SELECT id FROM rag_documents WHERE parent_id = ? ORDER BY chunk_index', (doc_id,)
+                    )]
+            finally:
+                conn.close()
+            elapsed = time.perf_counter() - start
+            chunks_per_sec = len(chunks) / elapsed if elapsed > 0 else float(len(chunks))
+            logging.info(f"RAG: '{file.filename}' indexado en {len(chunks)} fragmentos ({chunks_per_sec:.1f} fragmentos/s)")
             
-            # Actualizar índice en memoria
-            if self.index is not None:
-                self.index.add(embedding.reshape(1, -1))
-                self.documents.append({
-                    'id': doc_id,
-                    'title': file.filename,
-                    'content': text,
-                    'user_id': user_id,
-                    'type': doc_type,
-                    'source': 'upload'
-                })
+            # Actualizar el índice del usuario en memoria
+            if self.tenants is not None:
+                with self._lock:
+                    self._tenant_index(user_id).add_with_ids(embeddings, chunk_ids)
+                    for i, (chunk_id, chunk) in enumerate(zip(chunk_ids, chunks)):
+                        self.documents[chunk_id] = {
+                            'id': chunk_id,
+                            'doc_id': doc_id,
+                            'chunk_index': i,
+                            'title': file.filename,
+                            'content': chunk,
+                            'user_id': user_id,
+                            'type': doc_type,
+                            'source': 'upload'
+                        }
             
-            return {'success': True, 'id': doc_id, 'title': file.filename}
+            return {
+                'success': True,
+                'id': doc_id,
+                'title': file.filename,
+                'chunks': len(chunks),
+                'chunks_per_sec': round(chunks_per_sec, 1)
+            }
             
         except Exception as e:
             logging.error(f"Error añadiendo documento: {e}")
@@ -168,45 +257,59 @@ class RAGSystem:
             return ""
     
     def query(self, query_text: str, user_id: int, limit: int = 3) -> List[Dict]:
-        """Busca documentos relevantes para la consulta"""
-        if self.index is None or not self.documents:
+        """Busca los documentos del usuario más relevantes para la consulta"""
+        if self.tenants is None:
+            return []
+        
+        index = self.tenants.get(user_id)
+        if index is None or index.live_count == 0:
             return []
         
         try:
             # Generar embedding para la consulta
             query_embedding = self.model.encode(query_text).reshape(1, -1)
             
-            # Buscar documentos similares
-            distances, indices = self.index.search(query_embedding, limit * 2)
+            # Solo se recorre el índice del usuario. Varios fragmentos pueden ser del mismo
+            # documento: se amplía k hasta reunir `limit` documentos distintos (si existen).
+            k = min(limit * CHUNKS_PER_RESULT, index.live_count)
+            while True:
+                distances, ids = index.search(query_embedding, k)
+                grouped = self._group_by_document(distances[0], ids[0])
+                if len(grouped) >= limit or k >= index.live_count:
+                    break
+                k = min(k * 2, index.live_count)
             
-            # Filtrar por usuario y preparar resultados
             results = []
-            seen_ids = set()
-            
-            for idx in indices[0]:
-                if idx < len(self.documents):
-                    doc = self.documents[idx]
-                    
-                    # Filtrar por usuario y evitar duplicados
-                    if (doc['user_id'] == user_id and 
-                        doc['id'] not in seen_ids and 
-                        len(results) < limit):
-                        
-                        results.append({
-                            'id': doc['id'],
-                            'title': doc['title'],
-                            'content': doc['content'][:1000] + '...' if len(doc['content']) > 1000 else doc['content'],
-                            'type': doc['type'],
-                            'source': doc['source'],
-                            'relevance': float(1 - distances[0][idx])  # Convertir distancia a similitud
-                        })
-                        seen_ids.add(doc['id'])
+            for doc_id, (distance, chunks) in list(grouped.items())[:limit]:
+                first = chunks[0]
+                # Los fragmentos coincidentes, en el orden en que aparecen en el documento
+                content = "\n...\n".join(chunk['content'] for chunk in sorted(chunks, key=lambda ch: ch['chunk_index']))
+                results.append({
+                    'id': doc_id,
+                    'title': first['title'],
+                    'content': content[:1000] + '...' if len(content) > 1000 else content,
+                    'type': first['type'],
+                    'source': first['source'],
+                    'relevance': float(1 - distance)  # Convertir distancia a similitud
+                })
             
             return results
             
         except Exception as e:
             logging.error(f"Error en query RAG: {e}")
             return []
+
+    def _group_by_document(self, distances, ids) -> Dict:
+        """Agrupa los fragmentos por documento padre, conservando el orden por relevancia."""
+        grouped = {}
+        for distance, chunk_id in zip(distances, ids):
+            chunk = self.documents.get(int(chunk_id))
+            if chunk is None:
+                continue
+            if chunk['doc_id'] not in grouped:
+                grouped[chunk['doc_id']] = (distance, [])
+            grouped[chunk['doc_id']][1].append(chunk)
+        return grouped
     
     def delete_document(self, doc_id: int, user_id: int) -> bool:
         """Elimina un documento del sistema RAG"""
@@ -214,22 +317,71 @@ class RAGSystem:
             conn = sqlite3.connect(self.db_path)
             c = conn.cursor()
             
+            # El documento y todos sus fragmentos
+            chunk_ids = [row[0] for row in c.execute(
+                'SELECT id FROM rag_documents WHERE (id = ? OR parent_id = ?) AND user_id = ? '
+                'AND is_active = 1 AND embedding IS NOT NULL',
+                (doc_id, doc_id, user_id)
+            )]
             c.execute(
-                'UPDATE rag_documents SET is_active = 0 WHERE id = ? AND user_id = ?',
-                (doc_id, user_id)
+                'UPDATE rag_documents SET is_active = 0 WHERE (id = ? OR parent_id = ?) AND user_id = ?',
+                (doc_id, doc_id, user_id)
             )
             
             conn.commit()
             conn.close()
             
-            # Actualizar en memoria
-            self.documents = [doc for doc in self.documents if doc['id'] != doc_id]
-            
-            # Reconstruir índice (simplificado - en producción sería más eficiente)
-            self._load_documents()
+            # Actualizar en memoria: borrado lógico en el índice del usuario, sin reconstruir nada.
+            # La compactación en segundo plano elimina los vectores físicamente después.
+            if chunk_ids and self.tenants is not None:
+                with self._lock:
+                    index = self.tenants.get(user_id)
+                    if index is not None:
+                        index.remove_ids(chunk_ids)
+                    for chunk_id in chunk_ids:
+                        self.documents.pop(chunk_id, None)
             
             return True
             
         except Exception as e:
             logging.error(f"Error eliminando documento: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    # --- Compactación en segundo plano ---
+
+    def _start_compaction(self, interval):
+        if interval <= 0:
+            return
+        self._compaction_stop = threading.Event()
+        thread = threading.Thread(target=self._compaction_loop, args=(interval,),
+                                  name="rag-compaction", daemon=True)
+        thread.start()
+
+    def _compaction_loop(self, interval):
+        while not self._compaction_stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"Error compactando índices RAG: {e}")
+
+    def compact(self) -> int:
+        """Elimina físicamente los vectores borrados y libera los embeddings de las filas inactivas."""
+        if self.tenants is None:
+            return 0
+        removed = 0
+        for user_id, index in list(self.tenants.items()):
+            if index.tombstones:
+                removed += index.compact()
+            if index.ntotal == 0:
+                with self._lock:
+                    if index.ntotal == 0 and self.tenants.get(user_id) is index:
+                        del self.tenants[user_id]
+
+        if removed:
+            # Las filas siguen en SQLite (borrado lógico), pero su embedding ya no se usa
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('UPDATE rag_documents SET embedding = NULL WHERE is_active = 0 AND embedding IS NOT NULL')
+            conn.commit()
+            conn.close()
+            logging.info(f"Compactación RAG: {removed} vectores eliminados")
+        return removed
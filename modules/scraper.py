@@ -1,12 +1,78 @@
-import requests
-from bs4 import BeautifulSoup
-import json
 import re
-from datetime import datetime
 import logging
+import threading
+from lxml import html as lxml_html
+from config import Config
+from modules.http_fetcher import Fetcher, HttpCache
+
+MAX_LAW_TEXT_CHARS = 50000  # Límite de caracteres del texto de una ley
+
+# --- DESCARGAS (compartidas por el proceso) ---
+# Una sesión keep-alive, caché en disco con ETag/Last-Modified y límite de
+# peticiones simultáneas por host, para todas las instancias de LegalScraper.
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            cache = HttpCache(Config.SCRAPER_CACHE_DIR, default_ttl=Config.SCRAPER_CACHE_TTL) if Config.SCRAPER_CACHE_DIR else None
+            _fetcher = Fetcher(
+                cache=cache,
+                per_host_limit=Config.SCRAPER_PER_HOST_LIMIT,
+                max_workers=Config.SCRAPER_MAX_WORKERS,
+                timeout=Config.SCRAPER_TIMEOUT,
+            )
+        return _fetcher
+
+# --- EXTRACCIÓN CON LXML ---
+# XPath equivalentes a los selectores CSS de antes (lxml no trae cssselect).
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+SEARCH_RESULT_XPATH = f"//*[{_has_class('resultado-busqueda')}]"
+RESULT_TITLE_XPATH = f".//*[{_has_class('titulo')}]//a"
+RESULT_DATE_XPATH = f".//*[{_has_class('fecha')}]"
+RESULT_SUMMARY_XPATH = f".//*[{_has_class('texto')}]"
+# En orden de preferencia: '#textoxslt', '.articulado', '.disposicion', 'main article', '.contenido'
+CONTENT_XPATHS = [
+    "//*[@id='textoxslt']",
+    f"//*[{_has_class('articulado')}]",
+    f"//*[{_has_class('disposicion')}]",
+    "//main//article",
+    f"//*[{_has_class('contenido')}]",
+]
+UNWANTED_XPATH = f".//*[{_has_class('skip')} or {_has_class('anuncio')} or {_has_class('publicidad')}]"
+TEXT_NODES_XPATH = ".//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]"
+
+def parse_html(result):
+    """Árbol lxml de una FetchResult (bytes + codificación de la respuesta)."""
+    parser = lxml_html.HTMLParser(encoding=result.encoding)
+    return lxml_html.document_fromstring(result.content, parser=parser)
+
+def _first(node, xpath):
+    found = node.xpath(xpath)
+    return found[0] if found else None
+
+def extract_text(node, limit=None) -> str:
+    """Como get_text(separator='\\n', strip=True) de BeautifulSoup, pero deja de leer al llegar a `limit`."""
+    parts, total = [], 0
+    for piece in node.xpath(TEXT_NODES_XPATH):
+        piece = piece.strip()
+        if not piece:
+            continue
+        parts.append(piece)
+        total += len(piece) + 1
+        if limit is not None and total > limit:
+            break
+    text = '\n'.join(parts)
+    return text[:limit] if limit is not None else text
 
 class LegalScraper:
-    def __init__(self):
+    def __init__(self, fetcher=None):
+        self.fetcher = fetcher or get_fetcher()
         self.sources = {
             'boe': {
                 'url': 'https://www.boe.es/buscar/',
@@ -21,12 +87,12 @@ class LegalScraper:
                 'params': {'texto': '', 'tipo': 'all'}
             }
         }
-    
+
     def search_legislation(self, query: str, source: str = 'boe') -> list:
         """Busca legislación en fuentes oficiales"""
         if source not in self.sources:
             return []
-        
+
         try:
             if source == 'boe':
                 return self._search_boe(query)
@@ -37,40 +103,40 @@ class LegalScraper:
         except Exception as e:
             logging.error(f"Error en scraper {source}: {e}")
             return []
-    
+
+    def search_all(self, query: str, sources=None) -> dict:
+        """Busca en varias fuentes a la vez (por defecto, todas). Devuelve {fuente: resultados}."""
+        sources = [s for s in (sources or self.sources) if s in self.sources]
+        futures = {source: self.fetcher.submit(self.search_legislation, query, source) for source in sources}
+        return {source: future.result() for source, future in futures.items()}
+
     def _search_boe(self, query: str) -> list:
         """Busca en el Boletín Oficial del Estado"""
         results = []
         params = self.sources['boe']['params'].copy()
         params['q'] = query
-        
+
         try:
-            response = requests.get(
-                self.sources['boe']['url'], 
-                params=params,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.select('.resultado-busqueda')
-            
+            response = self.fetcher.fetch(self.sources['boe']['url'], params=params)
+            tree = parse_html(response)
+            items = tree.xpath(SEARCH_RESULT_XPATH)
+
             for item in items[:5]:  # Limitar a 5 resultados
-                title_elem = item.select_one('.titulo a')
-                if not title_elem:
+                title_elem = _first(item, RESULT_TITLE_XPATH)
+                if title_elem is None:
                     continue
-                    
-                title = title_elem.get_text(strip=True)
-                link = title_elem['href']
+
+                title = extract_text(title_elem).replace('\n', '')
+                link = title_elem.get('href', '')
                 if not link.startswith('http'):
                     link = 'https://www.boe.es' + link
-                
-                date_elem = item.select_one('.fecha')
-                date = date_elem.get_text(strip=True) if date_elem else 'Fecha no disponible'
-                
-                summary_elem = item.select_one('.texto')
-                summary = summary_elem.get_text(strip=True) if summary_elem else ''
-                
+
+                date_elem = _first(item, RESULT_DATE_XPATH)
+                date = extract_text(date_elem).replace('\n', '') if date_elem is not None else 'Fecha no disponible'
+
+                summary_elem = _first(item, RESULT_SUMMARY_XPATH)
+                summary = extract_text(summary_elem).replace('\n', '') if summary_elem is not None else ''
+
                 results.append({
                     'title': title,
                     'link': link,
@@ -78,61 +144,62 @@ class LegalScraper:
                     'summary': summary,
                     'source': 'BOE'
                 })
-                
+
         except Exception as e:
             logging.error(f"Error scraping BOE: {e}")
-        
+
         return results
-    
+
     def _search_europa(self, query: str) -> list:
         """Busca en la legislación europea"""
         # Implementación similar para EUR-Lex
         # (Código simplificado por brevedad)
         return []
-    
+
     def _search_congreso(self, query: str) -> list:
         """Busca iniciativas parlamentarias"""
         # Implementación similar para Congreso de los Diputados
         # (Código simplificado por brevedad)
         return []
-    
+
     def get_law_text(self, url: str) -> str:
         """Obtiene el texto completo de una ley"""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Eliminar elementos no deseados
-            for elem in soup.select('.skip, .anuncio, .publicidad'):
-                elem.decompose()
-            
-            # Extraer el texto principal
-            text = ''
-            content_selectors = [
-                '#textoxslt', 
-                '.articulado', 
-                '.disposicion',
-                'main article',
-                '.contenido'
-            ]
-            
-            for selector in content_selectors:
-                content = soup.select_one(selector)
-                if content:
-                    text = content.get_text(separator='\n', strip=True)
-                    break
-            
-            if not text:
-                text = soup.get_text(separator='\n', strip=True)
-            
-            # Limitar tamaño y limpiar texto
-            text = text[:50000]  # Límite de caracteres
-            text = re.sub(r'\n\s*\n', '\n\n', text)  # Eliminar líneas vacías múltiples
-            
-            return text
-            
+            return self.extract_law_text(self.fetcher.fetch(url))
         except Exception as e:
             logging.error(f"Error obteniendo texto de ley: {e}")
-            return f"Error al obtener el texto: {str(e)}"
\ No newline at end of file
+            return f"Error al obtener el texto: {str(e)}"
+
+    def get_law_texts(self, urls: list) -> list:
+        """Como get_law_text para varias URLs, descargadas en paralelo (mismo orden)."""
+        texts = []
+        for url, result in zip(urls, self.fetcher.fetch_many(urls)):
+            if isinstance(result, Exception):
+                logging.error(f"Error obteniendo texto de ley {url}: {result}")
+                texts.append(f"Error al obtener el texto: {str(result)}")
+            else:
+                texts.append(self.extract_law_text(result))
+        return texts
+
+    def extract_law_text(self, response, limit=MAX_LAW_TEXT_CHARS) -> str:
+        """Texto principal de una página de ley ya descargada (FetchResult). limit=None: completo."""
+        tree = parse_html(response)
+
+        # Eliminar elementos no deseados
+        for elem in tree.xpath(UNWANTED_XPATH):
+            elem.drop_tree()
+
+        # Extraer el texto principal: solo se recorre el primer contenedor que exista
+        text = ''
+        for xpath in CONTENT_XPATHS:
+            content = _first(tree, xpath)
+            if content is not None:
+                text = extract_text(content, limit=limit)
+                break
+
+        if not text:
+            text = extract_text(tree, limit=limit)
+
+        text = re.sub(r'\n\s*\n', '\n\n', text)  # Eliminar líneas vacías múltiples
+
+        return text
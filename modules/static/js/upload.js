@@ -8,46 +8,62 @@ document.addEventListener('DOMContentLoaded', () => {
     
     if (!uploadForm) return;
 
-    let progressInterval;
-    let statusInterval;
+    let pollInterval;
 
-    const statuses = [
-        "Iniciando extracción de texto...",
-        "Analizando estructura del documento...",
-        "Chunking semántico en proceso...",
-        "Generando vectores de alta dimensión...",
-        "Indexando en base de datos FAISS...",
-        "Optimizando el índice para búsqueda...",
-        "Finalizando proceso..."
-    ];
+    const setProgress = (progress, status) => {
+        progressBar.style.width = `${progress}%`;
+        progressPercentage.innerText = `${Math.floor(progress)}%`;
+        loadingStatus.innerText = status;
+    };
 
-    const startProgressSimulation = () => {
-        let progress = 0;
-        let statusIndex = 0;
-        
-        // Actualizar el texto de estado periódicamente
-        loadingStatus.innerText = statuses[statusIndex];
-        statusInterval = setInterval(() => {
-            statusIndex = (statusIndex + 1) % statuses.length;
-            loadingStatus.innerText = statuses[statusIndex];
-        }, 2000);
+    // Progreso real del trabajo de ingesta: extracción 10%, embeddings hasta 90%, persistencia 100%
+    const renderJob = (job) => {
+        if (job.status === 'queued') {
+            setProgress(0, "En cola, esperando a que termine otra carga...");
+        } else if (job.extracted === 0) {
+            setProgress(5, "Extrayendo artículos del documento...");
+        } else if (job.persisted === 0) {
+            const embedded = job.embedded / job.extracted;
+            setProgress(10 + 80 * embedded, `Generando vectores: ${job.embedded} de ${job.extracted} artículos...`);
+        } else {
+            setProgress(100, `Indexados ${job.persisted} artículos.`);
+        }
+    };
 
-        // Actualizar la barra de progreso de forma no lineal
-        progressInterval = setInterval(() => {
-            if (progress < 50) {
-                progress += Math.random() * 5; // Avance rápido al inicio
-            } else if (progress < 90) {
-                progress += Math.random() * 1.5; // Avance lento en la parte media
-            } else if (progress < 99) {
-                progress += 0.1; // Avance muy lento al final
-            }
-            
-            if (progress > 99) progress = 99; // No pasar del 99% hasta que termine
+    const finish = (message) => {
+        clearInterval(pollInterval);
+        setTimeout(() => {
+            loadingOverlay.style.display = 'none';
+            alert(message);
+            uploadForm.reset();
+        }, 1000); // Pequeña pausa para que el usuario vea el estado final
+    };
 
-            progressBar.style.width = `${progress}%`;
-            progressPercentage.innerText = `${Math.floor(progress)}%`;
+    const fail = (message) => {
+        clearInterval(pollInterval);
+        loadingOverlay.style.display = 'none';
+        alert(`Error: ${message}`);
+    };
 
-        }, 300); // Intervalo de actualización
+    const pollJob = (statusUrl) => {
+        pollInterval = setInterval(async () => {
+            try {
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+                if (!response.ok) {
+                    throw new Error(job.message || 'No se pudo consultar el estado de la carga.');
+                }
+                renderJob(job);
+                if (job.status === 'done') {
+                    setProgress(100, "¡Proceso completado!");
+                    finish(`Éxito: ¡Archivo "${job.filename}" cargado y procesado exitosamente!`);
+                } else if (job.status === 'error') {
+                    fail(`Error al procesar el archivo: ${job.error}`);
+                }
+            } catch (error) {
+                fail(error.message);
+            }
+        }, 1000);
     };
 
     uploadForm.addEventListener('submit', async (event) => {
@@ -59,10 +75,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         loadingOverlay.style.display = 'flex';
-        progressBar.style.width = '0%';
-        progressPercentage.innerText = '0%';
-
-        startProgressSimulation(); // Inicia la simulación
+        setProgress(0, "Subiendo archivo...");
 
         const formData = new FormData(uploadForm);
         
@@ -74,29 +87,20 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const result = await response.json();
 
-            if (response.ok) {
-                // Al terminar, forzamos el 100% y mostramos el mensaje final
-                clearInterval(progressInterval);
-                clearInterval(statusInterval);
-                progressBar.style.width = '100%';
-                progressPercentage.innerText = '100%';
-                loadingStatus.innerText = "¡Proceso completado!";
-                
-                setTimeout(() => {
-                    loadingOverlay.style.display = 'none';
-                    alert(`Éxito: ${result.message}`);
-                    uploadForm.reset();
-                }, 1000); // Pequeña pausa para que el usuario vea el 100%
+            if (!response.ok) {
+                throw new Error(result.message || 'Ocurrió un error desconocido.');
+            }
 
+            if (result.status === 'duplicate') {
+                setProgress(100, "Documento ya cargado.");
+                finish(result.message);
             } else {
-                throw new Error(result.message || 'Ocurrió un error desconocido.');
+                // La respuesta llega al instante; el procesamiento sigue en el servidor
+                pollJob(result.status_url);
             }
 
         } catch (error) {
-            clearInterval(progressInterval);
-            clearInterval(statusInterval);
-            loadingOverlay.style.display = 'none';
-            alert(`Error: ${error.message}`);
+            fail(error.message);
         }
     });
 });
\ No newline at end of file
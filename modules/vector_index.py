@@ -0,0 +1,313 @@
+import math
+import threading
+
+import faiss
+import numpy as np
+
+from config import Config
+
+# Tipos de índice soportados por la fábrica
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq')
+
+
+def build_index(kind, dimension, nlist=None, hnsw_m=32, pq_m=16, pq_bits=8, ef_construction=80):
+    """
+    Fábrica de índices FAISS (métrica L2):
+      flat      búsqueda exacta por fuerza bruta (coste lineal con el corpus)
+      ivf_flat  particiona en `nlist` celdas y solo visita `nprobe` (requiere entrenamiento)
+      hnsw      grafo navegable, sin entrenamiento; se ajusta con efSearch
+      ivf_pq    IVF + cuantización de producto: mucha menos memoria, algo menos de recall
+    """
+    if kind == 'flat':
+        return faiss.IndexFlatL2(dimension)
+    if kind == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if kind in ('ivf_flat', 'ivf_pq'):
+        if not nlist:
+            raise ValueError(f"El índice '{kind}' necesita nlist.")
+        quantizer = faiss.IndexFlatL2(dimension)
+        if kind == 'ivf_flat':
+            return faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        if dimension % pq_m:
+            raise ValueError(f"pq_m={pq_m} debe dividir la dimensión {dimension}.")
+        return faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits)
+    raise ValueError(f"Tipo de índice desconocido: '{kind}'. Opciones: {', '.join(INDEX_TYPES)}")
+
+
+def needs_training(kind):
+    return kind in ('ivf_flat', 'ivf_pq')
+
+
+def min_training_vectors(kind):
+    """PQ con 8 bits entrena 256 centroides por subcuantizador: FAISS pide ~39 puntos por centroide."""
+    return 39 * 256 if kind == 'ivf_pq' else 0
+
+
+def auto_nlist(n_vectors):
+    """Regla habitual: ~4·sqrt(N) celdas, con al menos 39 vectores de entrenamiento por celda."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _unwrap(index):
+    """Quita envoltorios (IndexIDMap/IndexIDMap2) y devuelve el índice base con su tipo real."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """Aplica los parámetros de búsqueda al índice que corresponda (IVF: nprobe, HNSW: efSearch)."""
+    base = _unwrap(index)
+    if isinstance(base, faiss.IndexIVF) and nprobe:
+        base.nprobe = min(nprobe, base.nlist)
+    if isinstance(base, faiss.IndexHNSW) and ef_search:
+        base.hnsw.efSearch = ef_search
+
+
+def index_kind(index):
+    """Tipo (de INDEX_TYPES) de un índice FAISS ya construido o cargado."""
+    index = _unwrap(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat'
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    return 'flat'
+
+
+class VectorIndex:
+    """
+    Índice vectorial configurable con entrenamiento automático.
+
+    Los tipos IVF no se pueden usar hasta entrenarlos, y entrenarlos con pocos
+    vectores da malas particiones. Por eso el índice empieza como Flat (exacto) y,
+    cuando acumula `train_threshold` vectores, entrena el tipo configurado con ellos
+    y migra. Expone la misma interfaz que usamos de FAISS: add, search, ntotal, d.
+
+    Si el índice subyacente está mapeado en memoria (solo lectura), la primera
+    escritura hace antes una copia privada.
+
+    Con use_ids=True el índice se envuelve en IndexIDMap2: cada vector lleva un id
+    estable (p. ej. el id de la fila en SQLite) que es lo que devuelve search().
+    En ese modo remove_ids() es O(1): marca los ids como borrados (tombstones) y
+    search() los excluye con un IDSelector; compact() los elimina físicamente.
+    """
+
+    def __init__(self, dimension, kind='flat', nlist=0, nprobe=16, hnsw_m=32, ef_search=64,
+                 pq_m=16, train_threshold=20000, index=None, shared=False, use_ids=False):
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice desconocido: '{kind}'. Opciones: {', '.join(INDEX_TYPES)}")
+        self.dimension = dimension
+        self.kind = kind
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.train_threshold = max(train_threshold, 1)
+        self.shared = shared
+        self.use_ids = use_ids
+        self._lock = threading.RLock()
+        self._tombstones = set()
+        self._exclude = None  # IDSelector cacheado con los tombstones actuales
+        self.index = index if index is not None else self._empty()
+        apply_search_params(self.index, self.nprobe, self.ef_search)
+
+    @classmethod
+    def from_config(cls, dimension, index=None, shared=False, use_ids=False):
+        return cls(
+            dimension,
+            kind=Config.VECTOR_INDEX_TYPE,
+            nlist=Config.VECTOR_INDEX_NLIST,
+            nprobe=Config.VECTOR_INDEX_NPROBE,
+            hnsw_m=Config.VECTOR_INDEX_HNSW_M,
+            ef_search=Config.VECTOR_INDEX_EF_SEARCH,
+            pq_m=Config.VECTOR_INDEX_PQ_M,
+            train_threshold=Config.VECTOR_INDEX_TRAIN_THRESHOLD,
+            index=index,
+            shared=shared,
+            use_ids=use_ids,
+        )
+
+    def _wrap(self, index):
+        return faiss.IndexIDMap2(index) if self.use_ids else index
+
+    def _empty(self):
+        # Los tipos que requieren entrenamiento arrancan en Flat hasta tener datos suficientes
+        if needs_training(self.kind):
+            return self._wrap(faiss.IndexFlatL2(self.dimension))
+        return self._wrap(build_index(self.kind, self.dimension, hnsw_m=self.hnsw_m))
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def live_count(self):
+        """Vectores que search() puede devolver (sin contar los borrados pendientes de compactar)."""
+        return self.index.ntotal - len(self._tombstones)
+
+    @property
+    def tombstones(self):
+        return len(self._tombstones)
+
+    @property
+    def d(self):
+        return self.index.d
+
+    @property
+    def is_migrated(self):
+        """True si el índice ya es del tipo configurado (no el Flat provisional)."""
+        return index_kind(self.index) == self.kind
+
+    def _ensure_writable(self):
+        if self.shared:
+            # clone_index seguiría apuntando al mmap; serializar fuerza una copia propia
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            apply_search_params(self.index, self.nprobe, self.ef_search)
+            self.shared = False
+
+    def _maybe_train(self):
+        threshold = max(self.train_threshold, min_training_vectors(self.kind))
+        if not needs_training(self.kind) or self.is_migrated or self.index.ntotal < threshold:
+            return
+        if self.use_ids:
+            vectors = _unwrap(self.index).reconstruct_n(0, self.index.ntotal)
+            ids = faiss.vector_to_array(faiss.downcast_index(self.index).id_map)
+        else:
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        nlist = self.nlist or auto_nlist(len(vectors))
+        print(f"-> [VectorIndex] Entrenando índice '{self.kind}' (nlist={nlist}) con {len(vectors)} vectores...")
+        target = self._wrap(build_index(self.kind, self.dimension, nlist=nlist, pq_m=self.pq_m))
+        target.train(vectors)
+        if self.use_ids:
+            target.add_with_ids(vectors, ids)
+        else:
+            target.add(vectors)
+        apply_search_params(target, self.nprobe, self.ef_search)
+        self.index = target
+
+    def add(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        with self._lock:
+            self._ensure_writable()
+            self.index.add(vectors)
+            self._maybe_train()
+
+    def add_with_ids(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        ids = np.ascontiguousarray(ids, dtype='int64')
+        with self._lock:
+            self._ensure_writable()
+            self.index.add_with_ids(vectors, ids)
+            self._maybe_train()
+
+    def remove_ids(self, ids):
+        """
+        Borrado lógico: los ids dejan de aparecer en search() al instante, sin tocar el índice.
+        Sin use_ids los ids son posiciones; se ocultan igual, pero compact() no los
+        elimina (desplazaría las posiciones de los vectores posteriores).
+        """
+        with self._lock:
+            self._tombstones.update(int(i) for i in ids)
+            self._exclude = None
+
+    def _search_params(self, k, widen=False):
+        """Parámetros de búsqueda: exclusión de tombstones y, si widen, nprobe/efSearch ampliados."""
+        exclude = self._exclude
+        if exclude is None and self._tombstones:
+            # Se guardan las dos piezas: el IDSelectorNot no mantiene viva la que envuelve
+            batch = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype='int64'))
+            exclude = self._exclude = (batch, faiss.IDSelectorNot(batch))
+        if exclude is None and not widen:
+            return None
+
+        base = _unwrap(self.index)
+        if widen and isinstance(base, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=base.nlist)
+        elif widen and isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, 4 * k))
+        elif isinstance(base, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=base.nprobe)
+        elif isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=base.hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters()
+        if exclude is not None:
+            params.sel = exclude[1]
+        return params
+
+    def search(self, queries, k):
+        """
+        Busca los k vecinos (excluyendo los borrados). Si un índice aproximado
+        devuelve menos de k resultados existiendo suficientes vectores (celdas IVF
+        poco pobladas, efSearch < k), se repite la búsqueda con parámetros más
+        amplios para completar los k.
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        params = self._search_params(k)
+        distances, ids = self.index.search(queries, k, params=params)
+        expected = min(k, self.live_count)
+        if expected and (ids[:, :expected] == -1).any():
+            params = self._search_params(k, widen=True)
+            if params is not None:
+                distances, ids = self.index.search(queries, k, params=params)
+        return distances, ids
+
+    def compact(self):
+        """
+        Elimina físicamente los vectores marcados como borrados. Trabaja sobre una
+        copia y la sustituye al final, así que las búsquedas concurrentes no se bloquean.
+        Devuelve cuántos vectores se eliminaron.
+        """
+        with self._lock:
+            if not self._tombstones or not self.use_ids:
+                return 0
+            removed = np.fromiter(self._tombstones, dtype='int64')
+            ids = faiss.vector_to_array(faiss.downcast_index(self.index).id_map)
+            if isinstance(_unwrap(self.index), faiss.IndexHNSW):
+                # HNSW no admite remove_ids: se reconstruye con los vectores vivos
+                keep = ~np.isin(ids, removed)
+                vectors = _unwrap(self.index).reconstruct_n(0, self.index.ntotal)
+                target = self._empty()
+                if keep.any():
+                    target.add_with_ids(vectors[keep], ids[keep])
+            else:
+                # Se borra sobre una copia propia (el índice puede estar mapeado en memoria)
+                target = faiss.deserialize_index(faiss.serialize_index(self.index))
+                target.remove_ids(faiss.IDSelectorBatch(removed))
+                base = _unwrap(target)
+                if isinstance(base, faiss.IndexIVF):
+                    # IVF borra de sus listas pero no renumera sus ids internos, mientras que
+                    # IndexIDMap2 sí compacta el id_map (los ids quedarían desplazados): se
+                    # renumeran en las listas conservando los códigos, sin recodificar el PQ
+                    renumber = np.cumsum(~np.isin(ids, removed)) - 1
+                    invlists = base.invlists
+                    for list_no in range(base.nlist):
+                        size = invlists.list_size(list_no)
+                        if not size:
+                            continue
+                        internal = renumber[faiss.rev_swig_ptr(invlists.get_ids(list_no), size)]
+                        codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size).copy()
+                        invlists.update_entries(list_no, 0, size, faiss.swig_ptr(internal), faiss.swig_ptr(codes))
+            apply_search_params(target, self.nprobe, self.ef_search)
+            self.index = target
+            self.shared = False
+            self._tombstones.clear()
+            self._exclude = None
+            return len(removed)
+
+    def reconstruct_n(self, start, count):
+        return self.index.reconstruct_n(start, count)
+
+    def reset(self):
+        with self._lock:
+            self.index = self._empty()
+            self.shared = False
+            self._tombstones.clear()
+            self._exclude = None
+            apply_search_params(self.index, self.nprobe, self.ef_search)
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# --- CLIENTES DE SALIDA ---
+# El worker envía la respuesta por la API del canal en lugar de devolverla en el
+# cuerpo del webhook, así el webhook puede responder 200 de inmediato.
+
+class TwilioOutboundClient:
+    """Envía mensajes de WhatsApp a través de la API REST de Twilio."""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send(self, chat_id, text: str):
+        self.client.messages.create(from_=self.from_number, to=chat_id, body=text)
+
+
+class TelegramOutboundClient:
+    """Envía mensajes con un telegram.Bot, usando un event loop propio por hilo worker."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._local = threading.local()
+
+    def _loop(self):
+        loop = getattr(self._local, 'loop', None)
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._local.loop = loop
+        return loop
+
+    def send(self, chat_id, text: str):
+        """Envía el mensaje y devuelve su message_id (necesario para editarlo después)."""
+        message = self._loop().run_until_complete(self.bot.send_message(chat_id=chat_id, text=text))
+        return message.message_id
+
+    def edit(self, chat_id, message_id, text: str):
+        self._loop().run_until_complete(
+            self.bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+        )
+
+
+class FakeOutboundClient:
+    """
+    Cliente de salida en memoria para pruebas sin red: guarda (chat_id, texto) en
+    self.sent. Las ediciones sustituyen el texto del mensaje (su message_id es la
+    posición en self.sent) y quedan además registradas en self.edits.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.edits = []
+        self._cond = threading.Condition()
+
+    def send(self, chat_id, text: str):
+        with self._cond:
+            self.sent.append((chat_id, text))
+            self._cond.notify_all()
+            return len(self.sent) - 1
+
+    def edit(self, chat_id, message_id, text: str):
+        with self._cond:
+            self.sent[message_id] = (chat_id, text)
+            self.edits.append((chat_id, message_id, text))
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        """Espera hasta que se hayan enviado al menos `count` mensajes."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.sent) >= count, timeout=timeout)
+
+
+# --- DESPACHADOR ---
+
+_STOP = object()
+
+
+class WebhookDispatcher:
+    """
+    Cola de trabajo acotada, en proceso, atendida por un pool de hilos.
+
+    Cada chat se asigna siempre al mismo worker (por hash del chat_id), por lo que
+    sus mensajes se procesan en orden de llegada. Si la cola del worker está llena
+    el mensaje se rechaza (contrapresión) en lugar de bloquear el webhook.
+    Los reintentos del proveedor (mismo message_id) se descartan.
+    """
+
+    def __init__(self, name: str, handler: Callable, outbound, workers: int = 4,
+                 max_queue_size: int = 200, dedupe_size: int = 2048):
+        self.name = name
+        self.handler = handler
+        self.outbound = outbound
+        self.workers = max(1, workers)
+        per_worker = max(1, max_queue_size // self.workers)
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._seen_ids = OrderedDict()
+        self._dedupe_size = dedupe_size
+        self._lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0, 'rejected': 0, 'duplicates': 0,
+            'processed': 0, 'failed': 0, 'in_flight': 0,
+            'max_queue_depth': 0, 'total_wait_s': 0.0, 'total_process_s': 0.0,
+        }
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, args=(self._queues[i],),
+                                 name=f"{name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"-> [Dispatcher:{name}] {self.workers} workers iniciados (cola máx. {per_worker * self.workers}).")
+
+    def _shard(self, chat_id) -> queue.Queue:
+        return self._queues[zlib.crc32(str(chat_id).encode('utf-8')) % self.workers]
+
+    def submit(self, chat_id, text: str, message_id: Optional[str] = None) -> str:
+        """Encola un mensaje. Devuelve 'queued', 'duplicate' o 'rejected'."""
+        with self._lock:
+            if message_id is not None:
+                if message_id in self._seen_ids:
+                    self._metrics['duplicates'] += 1
+                    return 'duplicate'
+                self._seen_ids[message_id] = True
+                if len(self._seen_ids) > self._dedupe_size:
+                    self._seen_ids.popitem(last=False)
+
+        try:
+            self._shard(chat_id).put_nowait((chat_id, text, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._metrics['rejected'] += 1
+                # Permitimos que el reintento del proveedor vuelva a intentarlo.
+                if message_id is not None:
+                    self._seen_ids.pop(message_id, None)
+            logger.warning(f"[Dispatcher:{self.name}] Cola llena, mensaje de {chat_id} rechazado.")
+            return 'rejected'
+
+        with self._lock:
+            self._metrics['submitted'] += 1
+            depth = self.queue_depth()
+            if depth > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = depth
+        return 'queued'
+
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def _worker(self, work_queue: queue.Queue):
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                work_queue.task_done()
+                return
+            chat_id, text, enqueued_at = item
+            started = time.monotonic()
+            with self._lock:
+                self._metrics['in_flight'] += 1
+                self._metrics['total_wait_s'] += started - enqueued_at
+            ok = True
+            try:
+                answer = self.handler(chat_id, text)
+                if answer:
+                    self.outbound.send(chat_id, answer)
+            except Exception as e:
+                ok = False
+                logger.error(f"[Dispatcher:{self.name}] Error procesando mensaje de {chat_id}: {e}")
+            finally:
+                with self._lock:
+                    self._metrics['in_flight'] -= 1
+                    self._metrics['processed' if ok else 'failed'] += 1
+                    self._metrics['total_process_s'] += time.monotonic() - started
+                work_queue.task_done()
+
+    def join(self):
+        """Bloquea hasta que todas las colas se hayan vaciado (útil en pruebas)."""
+        for q in self._queues:
+            q.join()
+
+    def shutdown(self, wait: bool = True):
+        for q in self._queues:
+            q.put(_STOP)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            m = dict(self._metrics)
+        done = m['processed'] + m['failed']
+        return {
+            'name': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue_depth(),
+            'queue_capacity': sum(q.maxsize for q in self._queues),
+            'submitted': m['submitted'],
+            'rejected': m['rejected'],
+            'duplicates': m['duplicates'],
+            'processed': m['processed'],
+            'failed': m['failed'],
+            'in_flight': m['in_flight'],
+            'max_queue_depth': m['max_queue_depth'],
+            'avg_wait_ms': (m['total_wait_s'] / done * 1000) if done else 0.0,
+            'avg_process_ms': (m['total_process_s'] / done * 1000) if done else 0.0,
+        }
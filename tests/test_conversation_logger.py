@@ -0,0 +1,50 @@
+from modules.bot.conversation_logger import ConversationLogger
+
+
+class FlakyDb:
+    """Falla los primeros `batch_failures` lotes y cualquier fila cuyo texto sea 'roto'."""
+
+    def __init__(self, batch_failures=0, reject_batches=False):
+        self.batch_failures = batch_failures
+        self.reject_batches = reject_batches
+        self.rows = []
+
+    def write(self, sql, params=(), many=False):
+        if many:
+            if self.reject_batches or self.batch_failures:
+                self.batch_failures -= 1
+                raise RuntimeError('database is locked')
+            self.rows.extend(params)
+        else:
+            if params[2] == 'roto':
+                raise RuntimeError('CHECK constraint failed')
+            self.rows.append(params)
+
+
+def make_logger(db, **kwargs):
+    return ConversationLogger(db=db, batch_size=10, flush_interval=0.01, retry_delay=0, **kwargs)
+
+
+def test_failed_batch_is_retried():
+    db = FlakyDb(batch_failures=2)
+    logger = make_logger(db)
+    for i in range(3):
+        logger.log(-100123, 'user', f'mensaje {i}')
+    logger.flush()
+    logger.shutdown()
+    assert [row[2] for row in db.rows] == ['mensaje 0', 'mensaje 1', 'mensaje 2']
+    stats = logger.stats()
+    assert stats['retries'] == 2 and stats['dropped'] == 0
+
+
+def test_rows_are_written_one_by_one_after_the_retries():
+    db = FlakyDb(reject_batches=True)
+    logger = make_logger(db, write_retries=1)
+    for text in ('uno', 'roto', 'tres'):
+        logger.log(1, 'user', text)
+    logger.flush()
+    logger.shutdown()
+    assert [row[2] for row in db.rows] == ['uno', 'tres']
+    stats = logger.stats()
+    assert stats['dropped'] == 1
+    assert stats['logged'] == 3
@@ -0,0 +1,79 @@
+import pytest
+from flask import Flask
+
+from config import Config
+from modules.db import get_db
+from modules.auth.models import init_db
+from modules.main.conversations import list_chats
+from modules.main.routes import main_bp
+
+INSERT_SQL = "INSERT INTO conversations (chat_id, sender, message_text, timestamp) VALUES (?, ?, ?, ?)"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'app.db'))
+    yield get_db()
+    get_db().close_all()
+
+
+def _all_pages(limit):
+    chats, cursor = list_chats(limit=limit)
+    pages = [chats]
+    while cursor:
+        chats, cursor = list_chats(before=cursor, limit=limit)
+        pages.append(chats)
+    return pages
+
+
+def test_list_chats_reads_the_per_chat_summary(db):
+    init_db()
+    rows = [(chat_id, 'user', f"chat {chat_id} mensaje {n}", f"2026-01-{chat_id + 1:02d} 10:00:{n:02d}")
+            for chat_id in range(7) for n in range(chat_id + 1)]
+    db.write(INSERT_SQL, rows, many=True)
+    # Llega tarde un mensaje con hora anterior: cuenta, pero no pasa a ser el último
+    db.write(INSERT_SQL, (6, 'bot', 'mensaje atrasado', '2026-01-01 00:00:00'))
+
+    pages = _all_pages(limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    chats = [chat for page in pages for chat in page]
+    assert [chat['chat_id'] for chat in chats] == [6, 5, 4, 3, 2, 1, 0]
+    assert chats[0] == {'chat_id': 6, 'message_count': 8, 'last_at': '2026-01-07 10:00:06',
+                        'last_message': 'chat 6 mensaje 6'}
+    assert [chat['message_count'] for chat in chats[1:]] == [6, 5, 4, 3, 2, 1]
+
+    plan = db.query_all('EXPLAIN QUERY PLAN SELECT chat_id FROM stats_chats ORDER BY last_at DESC, chat_id DESC')
+    assert not any('conversations' in row['detail'] for row in plan)
+
+
+def test_existing_database_is_backfilled(db):
+    db.write('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)')
+    db.write('CREATE TABLE query_log (id INTEGER PRIMARY KEY, user_id INTEGER, question TEXT, timestamp DATETIME)')
+    db.write('CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, '
+             'sender TEXT NOT NULL, message_text TEXT NOT NULL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)')
+    db.write(INSERT_SQL, [(1, 'user', 'hola', '2026-01-01 09:00:00'),
+                          (2, 'user', 'buenas', '2026-01-02 09:00:00'),
+                          (1, 'bot', 'adiós', '2026-01-03 09:00:00')], many=True)
+
+    chats, cursor = list_chats()
+    assert cursor is None
+    assert [(chat['chat_id'], chat['message_count'], chat['last_message']) for chat in chats] == [
+        (1, 2, 'adiós'), (2, 1, 'buenas')]
+    # A partir de aquí lo mantiene el trigger
+    db.write(INSERT_SQL, (2, 'bot', 'respuesta', '2026-01-04 09:00:00'))
+    assert [chat['chat_id'] for chat in list_chats()[0]] == [2, 1]
+
+
+def test_messages_api_accepts_negative_group_ids(db):
+    init_db()
+    db.write(INSERT_SQL, [(-100123, 'user', 'hola grupo', '2026-01-01 09:00:00'),
+                          (-100123, 'bot', 'hola', '2026-01-01 09:00:01')], many=True)
+    app = Flask(__name__)
+    app.config['LOGIN_DISABLED'] = True
+    app.register_blueprint(main_bp)
+
+    response = app.test_client().get('/api/conversations/-100123/messages')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['chat_id'] == -100123
+    assert [message['message_text'] for message in body['messages']] == ['hola grupo', 'hola']
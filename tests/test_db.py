@@ -0,0 +1,33 @@
+import threading
+
+from modules.db import Database
+
+
+def _use(db):
+    db.write('CREATE TABLE IF NOT EXISTS t (x INTEGER)')
+    db.write('INSERT INTO t VALUES (1)')
+
+
+def test_connections_of_finished_threads_are_closed(tmp_path):
+    db = Database(str(tmp_path / 'app.db'))
+    for _ in range(20):
+        thread = threading.Thread(target=_use, args=(db,))
+        thread.start()
+        thread.join()
+    # Solo queda la del último hilo; se cierra al abrir la siguiente
+    assert len(db._connections) == 1
+    assert db.query_one('SELECT COUNT(*) FROM t')[0] == 20
+    assert len(db._connections) == 1
+    db.close_all()
+
+
+def test_close_connection(tmp_path):
+    db = Database(str(tmp_path / 'app.db'))
+    first = db.connection()
+    assert db.connection() is first
+    db.close_connection()
+    assert db._connections == {}
+    second = db.connection()
+    assert second is not first
+    assert second.execute('SELECT 1').fetchone()[0] == 1
+    db.close_all()
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip('langchain_core')
+
+from modules.assistant import embeddings as embeddings_module
+from modules.assistant.embeddings import BatchedEmbeddings
+
+
+class ApiError(Exception):
+    """Como google.api_core.exceptions: el código HTTP en `code`."""
+
+    def __init__(self, code, message='error'):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeInner:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(embeddings_module.time, 'sleep', lambda seconds: None)
+
+
+def make(inner, **kwargs):
+    return BatchedEmbeddings(inner, 'modelo', requests_per_minute=60000, **kwargs)
+
+
+@pytest.mark.parametrize('error', [ApiError(400), ApiError(401), ApiError(403), ValueError('entrada mal formada')])
+def test_permanent_errors_are_not_retried(error):
+    inner = FakeInner(errors=[error])
+    client = make(inner)
+    with pytest.raises(type(error)):
+        client.embed_query('hola')
+    assert inner.calls == 1
+    assert client.stats()['retries'] == 0
+    assert client.stats()['permanent_errors'] == 1
+
+
+@pytest.mark.parametrize('error', [ApiError(429), ApiError(503), TimeoutError('lento'), ConnectionError('red'),
+                                   type('ResourceExhausted', (Exception,), {})('cuota')])
+def test_transient_errors_are_retried(error):
+    inner = FakeInner(errors=[error, error])
+    client = make(inner)
+    assert client.embed_query('hola') == [4.0, 1.0]
+    assert inner.calls == 3
+    assert client.stats()['retries'] == 2
+
+
+def test_transient_errors_give_up_after_max_retries():
+    inner = FakeInner(errors=[ApiError(500)] * 10)
+    with pytest.raises(ApiError):
+        make(inner, max_retries=2).embed_query('hola')
+    assert inner.calls == 3
+
+
+def test_query_cache_is_a_bounded_lru():
+    inner = FakeInner()
+    client = make(inner, query_cache_size=2)
+    client.embed_query('a')
+    client.embed_query('bb')
+    client.embed_query('a')    # 'a' pasa a ser la más reciente
+    client.embed_query('ccc')  # sale 'bb'
+    assert len(client._query_cache) == 2
+    assert inner.calls == 3
+    client.embed_query('a')
+    assert inner.calls == 3
+    client.embed_query('bb')
+    assert inner.calls == 4
+    assert client.stats()['cache_hits'] == 2
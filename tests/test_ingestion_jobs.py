@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+
+from modules.db import Database
+from modules.documents.jobs import IngestionJobs, DONE, ERROR
+
+
+class FakeProcessor:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def process_document(self, file_path, filename, progress=None):
+        self.calls.append(filename)
+        progress('extracted', 3)
+        self.release.wait(5)
+        progress('embedded', 3)
+        progress('persisted', 3)
+        return 3
+
+
+def make_jobs(tmp_path, processor, **kwargs):
+    return IngestionJobs(processor, db=Database(str(tmp_path / 'jobs.db')), **kwargs)
+
+
+def _wait_done(jobs, job_id):
+    jobs.shutdown(wait=True)
+    return jobs.get(job_id)
+
+
+def test_same_content_from_another_user_gets_its_own_job(tmp_path):
+    processor = FakeProcessor()
+    jobs = make_jobs(tmp_path, processor)
+
+    first = jobs.submit('/tmp/a.pdf', 'contrato.pdf', 'abc', owner='1')
+    again = jobs.submit('/tmp/a.pdf', 'contrato.pdf', 'abc', owner='1')
+    other = jobs.submit('/tmp/b.pdf', 'copia.pdf', 'abc', owner='2')
+    other_again = jobs.submit('/tmp/b.pdf', 'copia.pdf', 'abc', owner='2')
+
+    assert again['id'] == first['id']
+    assert other['id'] != first['id']
+    assert other_again['id'] == other['id']
+    assert jobs.get(other['id'])['owner'] == '2'
+    assert jobs.get(other['id'])['filename'] == 'copia.pdf'
+
+    processor.release.set()
+    done = _wait_done(jobs, first['id'])
+    followed = jobs.get(other['id'])
+    # Un solo procesamiento; el seguidor refleja el resultado
+    assert processor.calls == ['contrato.pdf']
+    assert done['status'] == followed['status'] == DONE
+    assert followed['persisted'] == 3
+    assert followed['finished_at'] is not None
+    assert jobs.find_duplicate('abc') == ('contrato.pdf', None)
+
+
+def test_follower_sees_progress_of_the_running_job(tmp_path):
+    processor = FakeProcessor()
+    jobs = make_jobs(tmp_path, processor)
+    first = jobs.submit('/tmp/a.pdf', 'a.pdf', 'abc', owner='1')
+    deadline = time.monotonic() + 5
+    while jobs.get(first['id'])['extracted'] != 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    other = jobs.submit('/tmp/a.pdf', 'a.pdf', 'abc', owner='2')
+    assert jobs.get(other['id'])['extracted'] == 3
+    processor.release.set()
+    assert _wait_done(jobs, other['id'])['status'] == DONE
+
+
+def test_other_workers_see_jobs_and_ingested_documents(tmp_path):
+    processor = FakeProcessor()
+    jobs = make_jobs(tmp_path, processor)
+    other_worker = make_jobs(tmp_path, FakeProcessor())  # otro proceso de gunicorn, misma base de datos
+
+    first = jobs.submit('/tmp/a.pdf', 'a.pdf', 'abc', owner='1')
+    assert other_worker.get(first['id'])['status'] in ('queued', 'running')
+    assert other_worker.find_duplicate('abc') == (None, first['id'])
+    follower = other_worker.submit('/tmp/a.pdf', 'a.pdf', 'abc', owner='2')
+    assert follower['id'] != first['id']
+
+    processor.release.set()
+    _wait_done(jobs, first['id'])
+    assert processor.calls == ['a.pdf']
+    assert other_worker.get(follower['id'])['status'] == DONE
+    assert other_worker.find_duplicate('abc') == ('a.pdf', None)
+
+
+def test_stale_job_does_not_block_a_new_upload(tmp_path):
+    processor = FakeProcessor()
+    processor.release.set()
+    jobs = make_jobs(tmp_path, processor, stale_after=60)
+    # Trabajo de un worker que murió a medias
+    jobs.db.write("INSERT INTO ingestion_jobs (id, filename, sha256, status, created_at, updated_at) "
+                  "VALUES ('muerto', 'a.pdf', 'abc', 'running', '2024-01-01T00:00:00', ?)", (time.time() - 120,))
+    job = jobs.submit('/tmp/a.pdf', 'a.pdf', 'abc', owner='1')
+    assert job['id'] != 'muerto'
+    assert jobs.get('muerto')['status'] == ERROR
+    assert _wait_done(jobs, job['id'])['status'] == DONE
+
+
+def test_legacy_hashes_file_is_imported(tmp_path):
+    legacy = tmp_path / 'ingested_hashes.json'
+    legacy.write_text(json.dumps({'abc': 'viejo.pdf'}), encoding='utf-8')
+    jobs = make_jobs(tmp_path, FakeProcessor(), legacy_hashes_path=str(legacy))
+    assert jobs.find_duplicate('abc') == ('viejo.pdf', None)
@@ -0,0 +1,57 @@
+import os
+
+from modules.assistant import knowledge_base as kb_module
+from modules.assistant.knowledge_base import KnowledgeBase, index_fingerprint
+
+
+def make_kb(tmp_path, loads):
+    """KnowledgeBase cuyo _load devuelve (o lanza) lo siguiente de `loads`; revisa el disco en cada get()."""
+    kb = KnowledgeBase(str(tmp_path), embedding_factory=lambda: None, model_name='modelo', check_interval=0)
+
+    def load():
+        result = loads.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    kb._load = load
+    return kb
+
+
+def test_fingerprint_skips_files_that_vanish(tmp_path, monkeypatch):
+    (tmp_path / 'index.faiss').write_bytes(b'x')
+    (tmp_path / 'index.pkl').write_bytes(b'y')
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        if str(path).endswith('index.pkl'):
+            raise FileNotFoundError(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(kb_module.os, 'stat', stat)
+    assert index_fingerprint(str(tmp_path)).startswith('index.faiss:1:')
+
+
+def test_fingerprint_error_keeps_the_current_index(tmp_path, monkeypatch):
+    kb = make_kb(tmp_path, ['indice'])
+    assert kb.get() == 'indice'
+
+    def broken(path):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(kb_module, 'index_fingerprint', broken)
+    assert kb.get() == 'indice'
+
+
+def test_failed_reload_is_retried(tmp_path):
+    (tmp_path / 'index.faiss').write_bytes(b'v1')
+    kb = make_kb(tmp_path, ['v1', ValueError('a medio escribir'), 'v2'])
+    assert kb.get() == 'v1'
+
+    (tmp_path / 'index.faiss').write_bytes(b'v2 parcial')
+    assert kb.get() == 'v1'
+    assert kb.last_error == 'a medio escribir'
+
+    # Mismos archivos en disco, pero la carga anterior falló: se vuelve a intentar
+    assert kb.get() == 'v2'
+    assert kb.last_error is None
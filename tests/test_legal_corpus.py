@@ -0,0 +1,87 @@
+import pytest
+
+from modules.assistant import rag_processor
+from modules.http_fetcher import FetchResult
+from modules.legal_corpus import LegalCorpus
+from modules.scraper import LegalScraper
+
+
+def law_html(n, articles):
+    body = ''.join(f'<p>Artículo {a}. Texto {a} de la ley {n}.</p>' for a in range(1, articles + 1))
+    return f'<html><body><div id="textoxslt"><h3>Ley {n}/2024</h3>{body}</div></body></html>'.encode('utf-8')
+
+
+class FakeFetcher:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch_many(self, urls):
+        return [FetchResult(url, 200, self.pages[url], 'utf-8') for url in urls]
+
+
+class FakeProcessor:
+    """Índice en memoria con la interfaz de RAGProcessor que usa el corpus; falla en la subida `fail_on`."""
+
+    def __init__(self, fail_on=None):
+        self.texts = []
+        self.retired = set()
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def add_articles(self, articles):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError('disco lleno')
+        first = len(self.texts)
+        self.texts.extend(text for text, _ in articles)
+        return range(first, len(self.texts))
+
+    def retire(self, positions):
+        self.retired |= set(positions)
+
+    def visible(self):
+        return [text for pos, text in enumerate(self.texts) if pos not in self.retired]
+
+
+URLS = ['https://www.boe.es/buscar/act.php?id=BOE-A-2024-1', 'https://www.boe.es/buscar/act.php?id=BOE-A-2024-2']
+
+
+def make_corpus(tmp_path, processor):
+    scraper = LegalScraper(fetcher=FakeFetcher({URLS[0]: law_html(1, 3), URLS[1]: law_html(2, 3)}))
+    return LegalCorpus(str(tmp_path), scraper=scraper, processor=processor, push_batch=2)
+
+
+def test_failed_push_leaves_no_duplicates(tmp_path):
+    processor = FakeProcessor(fail_on=3)
+    # Tandas: [ley1 art1, art2], [ley1 art3, ley2 art1], [ley2 art2, art3] <- falla
+    with pytest.raises(RuntimeError):
+        make_corpus(tmp_path, processor).crawl(URLS)
+    assert processor.retired == {3}  # ley2 art1: subido, pero su ley no se confirmó
+
+    corpus = make_corpus(tmp_path, processor)
+    assert list(corpus.laws) == [URLS[0]]
+    report = corpus.crawl(URLS)
+    assert report['unchanged'] == 1 and report['updated'] == 1
+    visible = processor.visible()
+    assert len(visible) == len(set(visible)) == 6
+    assert corpus.uncommitted == {}
+
+
+def test_positions_of_a_crawl_that_died_are_retired_next_time(tmp_path):
+    processor = FakeProcessor()
+    corpus = make_corpus(tmp_path, processor)
+    # Como si el proceso hubiera muerto tras subir dos artículos de la ley 2
+    corpus.uncommitted = {URLS[1]: [7, 8]}
+    corpus._save_manifest()
+
+    make_corpus(tmp_path, processor).crawl(URLS)
+    assert processor.retired == {7, 8}
+    assert make_corpus(tmp_path, processor).uncommitted == {}
+
+
+def test_without_a_processor_it_opens_its_own(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_processor, 'RAGProcessor', FakeProcessor)
+    corpus = LegalCorpus(str(tmp_path), scraper=LegalScraper(fetcher=FakeFetcher({URLS[0]: law_html(1, 2)})))
+    assert isinstance(corpus.processor, FakeProcessor)
+    corpus.crawl(URLS[:1])
+    assert len(corpus.processor.visible()) == 2
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from modules.legal_matcher import LegalTopicMatcher, fold, trie_regex
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return LegalTopicMatcher()
+
+
+@pytest.mark.parametrize('prompt', [
+    'Necesito un abogado',
+    'Tengo una duda sobre un contrato',
+    '¿Es legal lo que hace mi casero?',
+    'PRISIÓN PROVISIONAL sin fianza, es normal?',
+    'prision provisional sin fianza',                  # sin tilde
+    'indemnizacion por danos en accidente de trafico',  # sin tildes ni ñ
+    'Me han mandado los contratos por correo',         # plural en -s
+    '¿Qué dicen las leyes sobre esto?',                # plural en -es
+    'Busco abogados especialistas',
+    'Sus derechos como inquilino',
+    'Firmé un contrato laboral temporal',
+    'Hay contratos laborales abusivos',                 # plural del término compuesto
+    'quiero registrar la marca de mi empresa',
+    'la ley.',                                          # término seguido de puntuación
+])
+def test_legal_terms_match(matcher, prompt):
+    assert matcher(prompt)
+
+
+@pytest.mark.parametrize('prompt', [
+    '¿Cómo demandar a mi vecino?',
+    '¿Qué debo hacer para proceder?',
+    'Quiero redactar mi testamento',
+    '¿Cuánto tarda un juicio?',
+    '¿Qué derechos tengo?',
+])
+def test_legal_patterns_match(matcher, prompt):
+    assert matcher(prompt)
+
+
+@pytest.mark.parametrize('prompt', [
+    'Cuéntame una leyenda de dragones',   # "ley" dentro de otra palabra
+    'quiero marcar un gol',               # "marca"
+    'la civilización maya',               # "civil"
+    'comprueba si el servidor responde',  # "prueba", por delante
+    'me encanta la poderosa música',      # "poder"
+    'Recomiéndame una receta de cocina con pollo',
+    'Hola, ¿qué tal estás hoy?',
+])
+def test_other_prompts_do_not_match(matcher, prompt):
+    assert not matcher(prompt)
+
+
+def test_custom_terms_and_trie():
+    assert trie_regex(['contrato', 'contrato laboral']) == r'c[oó][nñ]tr[aá]t[oó](?:\ l[aá]b[oó]r[aá]l)?'
+    custom = LegalTopicMatcher(terms=['Usucapión'], patterns=[])
+    assert custom('¿se puede alegar usucapion?')
+    assert custom('las usucapiones')
+    assert not custom('contrato')
+    assert fold('Prisión') == 'prision'
+
+
+def test_embedding_fallback_only_without_a_term():
+    calls = []
+
+    def encoder(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype='float32')
+
+    fallback = LegalTopicMatcher(encoder=encoder, threshold=0.9)
+    assert fallback('Necesito un abogado')
+    assert calls == []
+    assert fallback('me han echado del trabajo')
+    assert len(calls) == 2  # prototipos (una vez) + el prompt
@@ -0,0 +1,143 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules.provider_router import ChatProvider, CircuitBreaker, ProviderError, ProviderRouter
+
+
+class StubProvider(ChatProvider):
+    """Proveedor sin red: tarda `delay` segundos y devuelve `answer` (o lanza `error`)."""
+
+    def __init__(self, name, answer=None, delay=0.0, error=None, breaker=None):
+        super().__init__(name, 'http://stub.invalid', 'key', 'model', timeout=5.0, breaker=breaker)
+        self.answer = answer if answer is not None else f"respuesta de {name}"
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def complete(self, system_prompt, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise ProviderError(self.error, f"{self.name} falló")
+        return self.answer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def chat_server():
+    """Servidor /chat/completions local; `content` es lo que devuelve como respuesta."""
+    state = {'content': 'hola'}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = json.dumps({'choices': [{'message': {'content': state['content']}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_falls_back_to_the_next_provider_on_error():
+    primary = StubProvider('primary', error='http_5xx')
+    backup = StubProvider('backup')
+    router = ProviderRouter([primary, backup], hedging=False)
+
+    assert router.complete('sistema', 'pregunta') == 'respuesta de backup'
+    assert primary.metrics.errors == {'http_5xx': 1}
+    assert ProviderRouter([StubProvider('a', error='timeout')], hedging=False).complete('s', 'p') is None
+
+
+def test_empty_completion_is_a_breaker_failure(chat_server):
+    url, state = chat_server
+    state['content'] = '  '
+    primary = ChatProvider('primary', url, 'key', 'model', breaker=CircuitBreaker(failure_threshold=2))
+    backup = StubProvider('backup')
+    router = ProviderRouter([primary, backup], hedging=False)
+
+    for _ in range(2):
+        assert router.complete('sistema', 'pregunta') == 'respuesta de backup'
+    assert primary.metrics.errors == {'empty': 2}
+    assert primary.breaker.state == CircuitBreaker.OPEN
+
+    state['content'] = 'hola'
+    assert ChatProvider('ok', url, 'key', 'model').complete('sistema', 'pregunta') == 'hola'
+
+
+def test_hedge_wins_when_the_primary_is_slow():
+    primary = StubProvider('primary', delay=1.0)
+    backup = StubProvider('backup', delay=0.01)
+    router = ProviderRouter([primary, backup], default_hedge_delay=0.05, min_hedge_delay=0.05)
+
+    started = time.perf_counter()
+    assert router.complete('sistema', 'pregunta') == 'respuesta de backup'
+    assert time.perf_counter() - started < 0.5
+    assert backup.metrics.hedges == 1
+    assert backup.metrics.hedge_wins == 1
+
+
+def test_queue_time_does_not_count_against_the_hedge_delay():
+    primary = StubProvider('primary', delay=0.01)
+    backup = StubProvider('backup')
+    router = ProviderRouter([primary, backup], default_hedge_delay=0.1, min_hedge_delay=0.05, max_workers=1)
+    # El único hilo del pool está ocupado: la llamada al primario espera en cola más que el plazo
+    router._executor.submit(time.sleep, 0.4)
+
+    assert router.complete('sistema', 'pregunta') == 'respuesta de primary'
+    assert backup.calls == 0
+    assert backup.metrics.hedges == 0
+
+
+def test_pool_is_sized_from_the_expected_concurrency():
+    router = ProviderRouter([StubProvider('a'), StubProvider('b')], concurrency=8)
+    assert router._executor._max_workers == 16
+
+
+def test_breaker_opens_then_half_opens_with_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=clock)
+    primary = StubProvider('primary', error='http_5xx', breaker=breaker)
+    backup = StubProvider('backup')
+    router = ProviderRouter([primary, backup], hedging=False)
+
+    router.complete('sistema', 'pregunta')
+    router.complete('sistema', 'pregunta')
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 1
+    # Abierto: el primario ni se intenta
+    assert router.complete('sistema', 'pregunta') == 'respuesta de backup'
+    assert primary.calls == 2
+
+    clock.now = 30.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # una sola llamada de prueba a la vez
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+    clock.now = 60.0
+    primary.error = None
+    assert router.complete('sistema', 'pregunta') == 'respuesta de primary'
+    assert breaker.state == CircuitBreaker.CLOSED
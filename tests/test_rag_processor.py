@@ -0,0 +1,87 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from config import Config
+from modules.assistant import rag_processor
+from modules.assistant.rag_processor import RAGProcessor, VECTOR_DIMENSION
+
+
+class FakeModel:
+    """Embeddings deterministas (hash del texto): sin descargar el modelo real."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            seed = int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+            vectors.append(np.random.default_rng(seed).standard_normal(VECTOR_DIMENSION))
+        return np.array(vectors, dtype='float32')
+
+
+@pytest.fixture
+def make_processor(tmp_path, monkeypatch):
+    # Cada RAGProcessor abre su propio descriptor para el flock: dos instancias
+    # sobre el mismo directorio se comportan como dos workers de gunicorn
+    monkeypatch.setattr(rag_processor, 'STORE_PATH', str(tmp_path))
+    monkeypatch.setattr(rag_processor, 'SentenceTransformer', FakeModel)
+    monkeypatch.setattr(Config, 'RAG_QUERY_MAX_WAIT_MS', 0)
+    monkeypatch.setattr(Config, 'VECTOR_INDEX_TYPE', 'flat')
+    return RAGProcessor
+
+
+def _texts(processor):
+    return [processor._chunk(i)[0] for i in range(processor.index.ntotal)]
+
+
+def test_processes_sharing_a_store_get_distinct_positions(make_processor):
+    app, crawler = make_processor(), make_processor()
+    assert app.add_articles([("subida de la app", "a.pdf")]) == range(0, 1)
+    assert crawler.add_articles([("artículo del corpus", "ley")]) == range(1, 2)
+    assert app.add_articles([("otra subida", "b.pdf")]) == range(2, 3)
+
+    restarted = make_processor()
+    assert _texts(restarted) == ["subida de la app", "artículo del corpus", "otra subida"]
+    assert _texts(app) == _texts(restarted)
+
+
+def test_checkpoint_of_another_process_is_picked_up(make_processor, monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_CHECKPOINT_SEGMENTS', 2)
+    first, second = make_processor(), make_processor()
+    first.add_articles([("uno", "a")])
+    # El segundo ve el segmento del primero: con el suyo son 2 y hace checkpoint
+    second.add_articles([("dos", "b")])
+    assert second.wal.segments() == []
+    assert second.wal.checkpoint == {"seq": 2, "ntotal": 2}
+
+    # El primero no tiene "dos" en memoria y su segmento ya no existe: recarga desde disco
+    assert first.add_articles([("tres", "c")]) == range(2, 3)
+    assert _texts(first) == ["uno", "dos", "tres"]
+    first.checkpoint()
+    assert _texts(make_processor()) == ["uno", "dos", "tres"]
+
+
+def test_searches_see_uploads_from_other_processes(make_processor, monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_SYNC_INTERVAL', 0)
+    reader, writer = make_processor(), make_processor()
+    reader.add_articles([("contrato de arrendamiento", "a")])
+    writer.add_articles([("despido improcedente", "b")])
+
+    context = reader.get_relevant_context("despido improcedente", top_k=1)
+    assert context == "Fuente: b::despido improcedente"
+
+
+def test_retire_merges_positions_retired_by_other_processes(make_processor):
+    app, crawler = make_processor(), make_processor()
+    app.add_articles([("uno", "a"), ("dos", "a"), ("tres", "a")])
+    crawler.retire([0])
+    # Sin sincronizar antes, la app reescribiría retired.json solo con la suya
+    app.retire([1])
+    assert app.retired == {0, 1}
+
+    restarted = make_processor()
+    assert restarted.retired == {0, 1}
+    assert restarted.get_relevant_context("uno", top_k=3) == "Fuente: a::tres"
@@ -0,0 +1,175 @@
+import re
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules.http_fetcher import Fetcher, HttpCache
+from modules.scraper import LegalScraper, MAX_LAW_TEXT_CHARS
+
+
+def law_page(n, articles=400):
+    """Página con la estructura de una ley del BOE: #textoxslt, publicidad, scripts, menú y pie."""
+    body = []
+    for a in range(1, articles + 1):
+        text = ' '.join(['contrato', 'arrendamiento', 'plazo', 'obligación'][(a + i) % 4] for i in range(60))
+        body.append(f'<p class="articulo">Artículo {a}.</p>\n<p class="parrafo">{text}.</p>')
+        if a % 50 == 0:
+            body.append('<div class="publicidad">Anuncio que no debe salir</div>')
+    return f'''<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Ley {n}/2024</title>
+<script>var tracking = "no debe salir";</script><style>.x{{color:red}}</style></head>
+<body><div class="skip">Saltar al contenido</div><nav>{'<a href="#">menú</a>' * 20}</nav>
+<div id="textoxslt"><h3>Ley {n}/2024, de prueba</h3>{''.join(body)}<script>no debe salir</script></div>
+<footer>{'<p>pie</p>' * 10}</footer></body></html>'''.encode('utf-8')
+
+
+def search_page(query, n=8):
+    items = ''.join(f'''<li class="resultado-busqueda"><p class="titulo"><a href="/doc/{i}">Ley {i}/2024 sobre {query}</a></p>
+<p class="fecha"> 0{i % 9 + 1}/01/2024 </p><p class="texto">Resumen de la ley {i} sobre {query}.</p></li>''' for i in range(n))
+    return f'<html><body><ul>{items}</ul></body></html>'.encode('utf-8')
+
+
+class FixtureServer:
+    """Servidor local con ETag/Last-Modified; cuenta respuestas y el máximo de peticiones simultáneas."""
+
+    def __init__(self, latency=0.0):
+        self.hits = {'200': 0, '304': 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(latency)
+                    self._respond()
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def _respond(self):
+                match = re.match(r'/doc/(\d+)', self.path)
+                if match:
+                    body = law_page(int(match.group(1)))
+                elif self.path.startswith('/buscar/'):
+                    body = search_page(re.search(r'q=([^&]*)', self.path).group(1))
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    with server.lock:
+                        server.hits['304'] += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                with server.lock:
+                    server.hits['200'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fixtures():
+    server = FixtureServer()
+    yield server
+    server.close()
+
+
+def make_scraper(fixtures, cache_dir, ttl=0, per_host_limit=4):
+    fetcher = Fetcher(cache=HttpCache(str(cache_dir), default_ttl=ttl), per_host_limit=per_host_limit, max_workers=8)
+    scraper = LegalScraper(fetcher=fetcher)
+    scraper.sources['boe']['url'] = fixtures.base + '/buscar/'
+    return scraper
+
+
+def test_law_text_matches_beautifulsoup(fixtures, tmp_path):
+    bs4 = pytest.importorskip('bs4')
+    page = law_page(3)
+    soup = bs4.BeautifulSoup(page.decode('utf-8'), 'html.parser')
+    for elem in soup.select('.skip, .anuncio, .publicidad, script'):
+        elem.decompose()
+    expected = soup.select_one('#textoxslt').get_text(separator='\n', strip=True)[:MAX_LAW_TEXT_CHARS]
+
+    text = make_scraper(fixtures, tmp_path).get_law_text(f"{fixtures.base}/doc/3")
+    assert text == expected
+    assert text.startswith('Ley 3/2024, de prueba\nArtículo 1.')
+    assert 'no debe salir' not in text
+    assert len(text) == MAX_LAW_TEXT_CHARS
+
+
+def test_cache_revalidates_with_etag_and_serves_fresh_entries(fixtures, tmp_path):
+    urls = [f"{fixtures.base}/doc/{i}" for i in range(6)]
+    cold = make_scraper(fixtures, tmp_path, ttl=0).get_law_texts(urls)
+    assert fixtures.hits == {'200': 6, '304': 0}
+
+    scraper = make_scraper(fixtures, tmp_path, ttl=0)
+    assert scraper.get_law_texts(urls) == cold
+    assert fixtures.hits == {'200': 6, '304': 6}
+    assert scraper.fetcher.stats()['revalidated'] == 6
+
+    # Dentro de la vigencia no se llega a la red
+    scraper = make_scraper(fixtures, tmp_path, ttl=3600)
+    assert scraper.get_law_texts(urls) == cold
+    assert fixtures.hits == {'200': 6, '304': 6}
+    assert scraper.fetcher.stats()['fresh_hits'] == 6
+
+
+def test_errors_keep_their_position(fixtures, tmp_path):
+    urls = [f"{fixtures.base}/doc/1", f"{fixtures.base}/no-existe", f"{fixtures.base}/doc/2"]
+    texts = make_scraper(fixtures, tmp_path).get_law_texts(urls)
+    assert texts[0].startswith('Ley 1/2024')
+    assert texts[1].startswith('Error al obtener el texto: 404')
+    assert texts[2].startswith('Ley 2/2024')
+
+
+def test_per_host_limit(tmp_path):
+    server = FixtureServer(latency=0.05)
+    try:
+        scraper = make_scraper(server, tmp_path, per_host_limit=2)
+        scraper.get_law_texts([f"{server.base}/doc/{i}" for i in range(8)])
+        assert server.max_in_flight == 2
+    finally:
+        server.close()
+
+
+def test_search_boe_results(fixtures, tmp_path):
+    results = make_scraper(fixtures, tmp_path).search_all('arrendamiento')
+    assert set(results) == {'boe', 'europa', 'congreso'}
+    boe = results['boe']
+    assert len(boe) == 5
+    assert boe[0] == {
+        'title': 'Ley 0/2024 sobre arrendamiento',
+        'link': 'https://www.boe.es/doc/0',
+        'date': '01/01/2024',
+        'summary': 'Resumen de la ley 0 sobre arrendamiento.',
+        'source': 'BOE',
+    }
@@ -0,0 +1,53 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from modules.assistant.segment_log import SegmentLog, fcntl
+
+
+def _append_many(directory, worker, count):
+    log = SegmentLog(directory)
+    for i in range(count):
+        with log.locked():
+            log.append(np.full((1, 4), worker, dtype='float32'), [[f"w{worker}-{i}", "fuente"]])
+
+
+@pytest.mark.skipif(fcntl is None, reason="sin flock no hay bloqueo entre procesos")
+def test_concurrent_processes_never_reuse_a_seq(tmp_path):
+    directory = str(tmp_path / 'wal')
+    SegmentLog(directory)
+    ctx = multiprocessing.get_context('fork')
+    processes = [ctx.Process(target=_append_many, args=(directory, worker, 15)) for worker in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(30)
+        assert p.exitcode == 0
+
+    log = SegmentLog(directory)
+    assert log.segments() == list(range(1, 61))
+    records = [record[0] for _, _, segment in log.pending() for record in segment]
+    assert sorted(records) == sorted(f"w{w}-{i}" for w in range(4) for i in range(15))
+
+
+def test_seq_comes_from_disk_not_from_memory(tmp_path):
+    directory = str(tmp_path / 'wal')
+    first, second = SegmentLog(directory), SegmentLog(directory)
+    with first.locked():
+        assert first.append(np.zeros((1, 4), dtype='float32'), [["a", "x"]]) == 1
+    with second.locked():
+        assert second.append(np.zeros((1, 4), dtype='float32'), [["b", "x"]]) == 2
+    with first.locked():
+        first.commit_checkpoint(2, 2)
+    with second.locked():
+        assert second.append(np.zeros((1, 4), dtype='float32'), [["c", "x"]]) == 3
+    assert [seq for seq, _, _ in SegmentLog(directory).pending()] == [3]
+
+
+def test_non_blocking_lock_reports_contention(tmp_path):
+    log = SegmentLog(str(tmp_path / 'wal'))
+    with log.locked() as held:
+        assert held
+        with log.locked(blocking=False) as other:
+            assert other is (fcntl is None)
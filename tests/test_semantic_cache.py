@@ -0,0 +1,49 @@
+import numpy as np
+
+from modules.assistant.semantic_cache import SemanticCache
+
+
+def _vector(i, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i % dim] = 1.0
+    v[(i + 1) % dim] = 0.1 * i
+    return v
+
+
+def test_restart_restores_the_newest_entries(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = SemanticCache(max_entries=10, db_path=db_path)
+    for i in range(10):
+        cache.put(f"pregunta {i}", _vector(i), f"respuesta {i}")
+    cache._db.execute('UPDATE semantic_cache SET created_at = created_at + CAST(substr(key, 10) AS REAL)')
+    cache._db.commit()
+
+    restored = SemanticCache(max_entries=3, threshold=1.01, db_path=db_path)
+    assert [restored.get(f"pregunta {i}", _vector(i)) for i in (7, 8, 9)] == ['respuesta 7', 'respuesta 8', 'respuesta 9']
+    assert restored.get("pregunta 0", _vector(0)) is None
+    # El orden LRU se conserva: la más antigua de las restauradas es la primera en salir
+    restored.put("pregunta nueva", _vector(3), "nueva")
+    assert list(restored._entries) == ['pregunta 8', 'pregunta 9', 'pregunta nueva']
+
+
+def test_version_fn_is_throttled(monkeypatch):
+    calls = []
+    version = ['v1']
+
+    def version_fn():
+        calls.append(1)
+        return version[0]
+
+    clock = [100.0]
+    monkeypatch.setattr('modules.assistant.semantic_cache.time.monotonic', lambda: clock[0])
+    cache = SemanticCache(version_fn=version_fn, check_interval=5.0)
+    cache.put("hola", _vector(0), "respuesta")
+    for _ in range(50):
+        assert cache.get("hola", _vector(0)) == "respuesta"
+    assert len(calls) == 1  # solo la del constructor
+
+    version[0] = 'v2'
+    clock[0] += 5.0
+    assert cache.get("hola", _vector(0)) is None
+    assert len(calls) == 2
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from modules.bot.streaming import TelegramStreamer, FakeStreamingLLM
+from modules.webhook_dispatcher import FakeOutboundClient
+
+
+class FakeClock:
+    """Reloj simulado: sleep() solo avanza la hora, así las pruebas no esperan."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TimedOutbound(FakeOutboundClient):
+    """Anota la hora de cada edición; las `rate_limits` primeras fallan con un RetryAfter simulado."""
+
+    def __init__(self, clock, rate_limits=0):
+        super().__init__()
+        self.clock = clock
+        self.rate_limits = rate_limits
+        self.edit_times = []
+
+    def edit(self, chat_id, message_id, text):
+        if self.rate_limits:
+            self.rate_limits -= 1
+            error = Exception('Flood control exceeded')
+            error.retry_after = timedelta(seconds=3)
+            raise error
+        self.edit_times.append(self.clock())
+        super().edit(chat_id, message_id, text)
+
+
+def _stream(text, token_delay, rate_limits=0, **kwargs):
+    clock = FakeClock()
+    outbound = TimedOutbound(clock, rate_limits=rate_limits)
+    llm = FakeStreamingLLM(text, token_delay=token_delay, sleep=clock.sleep)
+    streamer = TelegramStreamer(outbound, 7, edit_interval=1.0, clock=clock, sleep=clock.sleep, **kwargs)
+    result = streamer.run(llm.stream('pregunta'))
+    return result, streamer, outbound, clock
+
+
+def test_edits_are_throttled_to_the_interval():
+    text = 'Primera frase corta. ' + ' '.join(f'palabra{i}' for i in range(80))
+    result, streamer, outbound, clock = _stream(text, token_delay=0.1)
+
+    assert result == text
+    assert outbound.sent == [(7, text)]
+    # Primer mensaje en cuanto hay una frase: tras 3 trozos, no al final
+    assert streamer.first_message_at < 0.5
+    gaps = [b - a for a, b in zip(outbound.edit_times, outbound.edit_times[1:])]
+    assert all(gap >= 1.0 - 1e-9 for gap in gaps)
+    # ~8 s de generación: alrededor de una edición por segundo, no una por trozo
+    assert 6 <= streamer.edits <= 10
+
+
+def test_long_answer_is_split_into_messages_of_4096():
+    text = ' '.join(f'palabra{i % 100:02d}' for i in range(1500))  # ~15000 caracteres
+    result, streamer, outbound, _ = _stream(text, token_delay=0.0)
+
+    assert result == text
+    pages = [page for _, page in outbound.sent]
+    assert len(pages) == 4
+    assert all(0 < len(page) <= 4096 for page in pages)
+    # Los cortes caen en espacios: ninguna palabra queda partida entre mensajes
+    assert ' '.join(pages) == text
+    assert streamer.messages == 4
+
+
+def test_final_flush_waits_for_the_interval_and_shows_the_whole_answer():
+    text = 'Hola. ' + ' '.join(f'palabra{i}' for i in range(20))
+    # Todo llega de golpe: las ediciones intermedias se saltan, pero la final no
+    result, streamer, outbound, clock = _stream(text, token_delay=0.0)
+
+    assert outbound.sent == [(7, text)]
+    assert streamer.edits == 1
+    assert outbound.edit_times == [1.0]
+    assert clock.now == 1.0
+
+
+def test_final_flush_retries_after_rate_limit():
+    text = 'Hola. ' + ' '.join(f'palabra{i}' for i in range(20))
+    result, streamer, outbound, clock = _stream(text, token_delay=0.0, rate_limits=1)
+
+    assert outbound.sent == [(7, text)]
+    assert streamer.rate_limited == 1
+    assert streamer.edit_errors == 0
+    # Espera el intervalo, recibe RetryAfter de 3 s y vuelve a intentarlo
+    assert outbound.edit_times == [4.0]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from modules.vector_index import VectorIndex, index_kind
+
+DIMENSION = 16
+
+
+def _build(kind):
+    # ivf_pq necesita ~39·256 vectores para entrenar sus subcuantizadores
+    n = 10000 if kind == 'ivf_pq' else 1000
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, DIMENSION)).astype('float32')
+    ids = np.arange(n, dtype='int64') * 10 + 7
+    index = VectorIndex(DIMENSION, kind=kind, nlist=16, nprobe=16, pq_m=4,
+                        train_threshold=500, use_ids=True)
+    index.add_with_ids(vectors, ids)
+    assert index_kind(index.index) == kind
+    return index, vectors, ids
+
+
+@pytest.mark.parametrize('kind', ['flat', 'ivf_flat', 'hnsw', 'ivf_pq'])
+def test_compact_keeps_ids(kind):
+    index, vectors, ids = _build(kind)
+    removed = ids[:10]
+    index.remove_ids(removed)
+    queries = vectors[[20, 500, 900]]
+
+    _, before = index.search(queries, 5)
+    assert index.compact() == len(removed)
+    _, after = index.search(queries, 5)
+
+    assert index.ntotal == len(ids) - len(removed)
+    assert index.tombstones == 0
+    assert not np.isin(after, removed).any()
+    np.testing.assert_array_equal(before, after)
+    # Cada vector se encuentra a sí mismo con su id estable (p. ej. 5007, no 5107)
+    np.testing.assert_array_equal(after[:, 0], ids[[20, 500, 900]])
+
+
+@pytest.mark.parametrize('kind', ['flat', 'ivf_flat', 'hnsw', 'ivf_pq'])
+def test_add_after_compact(kind):
+    index, vectors, ids = _build(kind)
+    index.remove_ids(ids[:10])
+    index.compact()
+
+    extra = np.random.default_rng(1).standard_normal((5, DIMENSION)).astype('float32')
+    index.add_with_ids(extra, np.arange(5, dtype='int64') + 10 ** 6)
+    _, found = index.search(np.vstack([extra, vectors[[500]]]), 1)
+    np.testing.assert_array_equal(found[:, 0], [10 ** 6, 10 ** 6 + 1, 10 ** 6 + 2, 10 ** 6 + 3, 10 ** 6 + 4, ids[500]])
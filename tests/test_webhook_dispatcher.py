@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+
+import pytest
+
+from modules.webhook_dispatcher import WebhookDispatcher, FakeOutboundClient
+
+
+@pytest.fixture
+def make_dispatcher():
+    dispatchers = []
+
+    def make(handler, **kwargs):
+        dispatcher = WebhookDispatcher('test', handler=handler, outbound=FakeOutboundClient(), **kwargs)
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.shutdown(wait=False)
+
+
+def test_submit_acks_before_the_handler_finishes(make_dispatcher):
+    release = threading.Event()
+
+    def slow_handler(chat_id, text):
+        release.wait(5)
+        return f"eco: {text}"
+
+    dispatcher = make_dispatcher(slow_handler, workers=2)
+    start = time.monotonic()
+    status = dispatcher.submit('chat-1', 'hola', message_id='m1')
+    elapsed = time.monotonic() - start
+
+    assert status == 'queued'
+    assert elapsed < 0.1
+    assert dispatcher.outbound.sent == []
+
+    release.set()
+    assert dispatcher.outbound.wait_for(1)
+    assert dispatcher.outbound.sent == [('chat-1', 'eco: hola')]
+
+
+def test_full_queue_rejects_and_allows_provider_retry(make_dispatcher):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_handler(chat_id, text):
+        started.set()
+        release.wait(5)
+        return text
+
+    dispatcher = make_dispatcher(blocking_handler, workers=1, max_queue_size=2)
+    assert dispatcher.submit('chat', 'm0', message_id='0') == 'queued'
+    assert started.wait(5)  # m0 ya está en el worker; la cola queda vacía
+    assert dispatcher.submit('chat', 'm1', message_id='1') == 'queued'
+    assert dispatcher.submit('chat', 'm2', message_id='2') == 'queued'
+    assert dispatcher.submit('chat', 'm3', message_id='3') == 'rejected'
+    assert dispatcher.stats()['rejected'] == 1
+
+    release.set()
+    dispatcher.join()
+    # El rechazo no cuenta como visto: el reintento del proveedor entra
+    assert dispatcher.submit('chat', 'm3', message_id='3') == 'queued'
+    dispatcher.join()
+    assert [text for _, text in dispatcher.outbound.sent] == ['m0', 'm1', 'm2', 'm3']
+
+
+def test_messages_of_a_chat_are_processed_in_order(make_dispatcher):
+    handled = []
+    lock = threading.Lock()
+    rng = random.Random(0)
+
+    def handler(chat_id, text):
+        time.sleep(rng.random() / 1000)
+        with lock:
+            handled.append((chat_id, text))
+        return None
+
+    dispatcher = make_dispatcher(handler, workers=4, max_queue_size=400)
+    chats = [f"chat-{i}" for i in range(6)]
+    for n in range(20):
+        for chat in chats:
+            assert dispatcher.submit(chat, str(n)) == 'queued'
+    dispatcher.join()
+
+    assert len(handled) == 120
+    for chat in chats:
+        assert [text for c, text in handled if c == chat] == [str(n) for n in range(20)]
+
+
+def test_duplicate_updates_are_dropped(make_dispatcher):
+    calls = []
+    dispatcher = make_dispatcher(lambda chat_id, text: calls.append(text) or text, workers=2)
+
+    assert dispatcher.submit('chat', 'hola', message_id=42) == 'queued'
+    assert dispatcher.submit('chat', 'hola', message_id=42) == 'duplicate'
+    assert dispatcher.submit('chat', 'otra', message_id=43) == 'queued'
+    dispatcher.join()
+
+    assert calls == ['hola', 'otra']
+    assert dispatcher.stats()['duplicates'] == 1
+    assert len(dispatcher.outbound.sent) == 2